@@ -0,0 +1,5 @@
+# Générateurs d'arrière-plans pour les widgets EcoLyon (Incity & Lyon).
+#
+# Le moteur headless (engine.py) et la CLI (generate.py) n'importent jamais
+# customtkinter : ils tournent sur une machine de build sans affichage.
+#   python -m GEN.generate incity --all --reference incity.png
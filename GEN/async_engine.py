@@ -0,0 +1,184 @@
+import asyncio
+import os
+import threading
+import time
+
+from .scheduler import DEFAULT_MAX_IN_FLIGHT
+from .variants import plan_derivations
+
+
+class AsyncGenerationEngine:
+    """Variante asyncio du moteur : toutes les requêtes partent d'un seul thread.
+
+    S'appuie sur `client.aio` (surface async de google.genai) et partage la
+    cible, le client, le cache et la référence du GenerationEngine fourni.
+    Un sémaphore borne le nombre de requêtes en vol ; des centaines de
+    variantes peuvent attendre dans la boucle sans coûter un thread chacune.
+    """
+
+    def __init__(self, engine, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.engine = engine
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._semaphore = None
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+
+    def set_max_in_flight(self, value):
+        """Appliqué aux requêtes qui n'ont pas encore pris de place"""
+        self.max_in_flight = max(1, int(value))
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._reset_semaphore)
+        else:
+            self._semaphore = None
+
+    def _reset_semaphore(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def generate(self, filename, prompt_details):
+        """Génère une image. Retourne le chemin écrit, ou None en cas d'échec."""
+        engine = self.engine
+        start = time.perf_counter()
+        path = None
+        try:
+            path = await self._generate(filename, prompt_details)
+            return path
+        finally:
+            if engine.tracer is not None:
+                engine.tracer.record("job", filename, start, time.perf_counter(), ok=path is not None)
+
+    async def _generate(self, filename, prompt_details):
+        engine = self.engine
+        with engine.span("prepare", filename):
+            job = await asyncio.to_thread(engine.prepare, filename, prompt_details)
+        with engine.span("cache", filename):
+            if await asyncio.to_thread(engine.from_cache, job):
+                return job.path
+        return await self._request(job)
+
+    async def _request(self, job):
+        engine = self.engine
+        filename = job.filename
+        try:
+            client = engine.client
+            # Envoi éventuel de la référence (Files API) hors de la boucle
+            with engine.span("reference", filename):
+                await asyncio.to_thread(engine.reference_content)
+        except Exception as e:
+            engine.log(f"Erreur Client: {e}")
+            return None
+
+        attempts = {}
+        while True:
+            with engine.span("breaker_wait", filename):
+                await engine.breaker.wait_async()
+            if self._semaphore is None:
+                self._reset_semaphore()
+            queued_at = time.perf_counter()
+            async with self._semaphore:
+                if engine.tracer is not None:
+                    engine.tracer.record("queue", filename, queued_at, time.perf_counter())
+                engine.log(f"Génération: {filename}...")
+                engine.emit("request", filename=filename)
+                try:
+                    with engine.span("serialize", filename):
+                        request = engine.request_args(job)
+                    with engine.span("request", filename, attempt=sum(attempts.values()) + 1):
+                        response = await client.aio.models.generate_content(**request)
+                    # L'écriture disque ne doit pas bloquer la boucle
+                    with engine.span("save", filename):
+                        path = await asyncio.to_thread(engine.save_response, job, response)
+                except Exception as e:
+                    delay = engine.handle_failure(job, e, attempts)
+                else:
+                    engine.breaker.record_success()
+                    return path
+            # Le backoff se fait hors sémaphore : la place est rendue aux autres
+            if delay is None:
+                return None
+            with engine.span("backoff", filename, delay=delay):
+                await asyncio.sleep(delay)
+
+    async def generate_best_of(self, filename, prompt_details, best_of, cue_color=None):
+        """N candidats en parallèle (dans la limite du sémaphore), le mieux noté est gardé"""
+        engine = self.engine
+        job = await asyncio.to_thread(engine.prepare, filename, prompt_details)
+        if await asyncio.to_thread(engine.from_cache, job):
+            return job.path
+
+        async def candidate(index):
+            candidate_job = engine.candidate_job(job, index)
+            os.makedirs(os.path.dirname(candidate_job.path), exist_ok=True)
+            start = time.perf_counter()
+            path = await self._request(candidate_job)
+            if engine.tracer is not None:
+                engine.tracer.record("job", candidate_job.filename, start, time.perf_counter(), ok=path is not None)
+            return path
+
+        paths = await asyncio.gather(*(candidate(index) for index in range(1, best_of + 1)))
+        return await asyncio.to_thread(engine.pick_best, job, paths, cue_color)
+
+    async def run(self, variants, on_complete=None, best_of=1, derive=False):
+        """Génère toutes les variantes. `on_complete(variant, path)` est appelé
+        à chaque fin (path = None en cas d'échec). Retourne les échecs.
+
+        Avec `derive`, comme GenerationEngine.run : les couleurs déclinables
+        sont dérivées localement (dans un thread) depuis leur base."""
+        derived = {}
+        if derive:
+            variants, derived = plan_derivations(self.engine.target.matrix, variants)
+
+        async def one(variant):
+            if best_of > 1:
+                path = await self.generate_best_of(variant.filename, variant.prompt, best_of, variant.cue)
+            else:
+                path = await self.generate(variant.filename, variant.prompt)
+            results = [(variant, path)]
+            if variant.filename in derived:
+                results += await asyncio.to_thread(self.engine.derive, path, derived[variant.filename])
+            if on_complete is not None:
+                for done, done_path in results:
+                    on_complete(done, done_path)
+            return results
+
+        results = await asyncio.gather(*(one(variant) for variant in variants))
+        return [variant for batch in results for variant, path in batch if path is None]
+
+    async def aclose(self):
+        """Ferme le pool de connexions async (à appeler dans la boucle)"""
+        client = self.engine._client
+        if client is not None:
+            await client.aio.aclose()
+
+    # --- Intégration Tk : boucle asyncio dans un thread dédié ---
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def submit(self, filename, prompt_details, on_complete=None, best_of=1, cue_color=None):
+        """Planifie une génération depuis n'importe quel thread.
+
+        Retourne un concurrent.futures.Future. `on_complete(filename, path)`
+        est appelé depuis le thread de la boucle : côté Tk, repasser par
+        `after()` avant de toucher un widget.
+        """
+        async def job():
+            if best_of > 1:
+                path = await self.generate_best_of(filename, prompt_details, best_of, cue_color)
+            else:
+                path = await self.generate(filename, prompt_details)
+            if on_complete is not None:
+                on_complete(filename, path)
+            return path
+
+        return asyncio.run_coroutine_threadsafe(job(), self._ensure_loop())
+
+    def close(self):
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
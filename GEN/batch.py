@@ -0,0 +1,300 @@
+"""Mode batch : tout un plan de génération soumis en un seul travail asynchrone (Batch API).
+
+Pour une régénération complète hors ligne, la Batch API traite les
+requêtes en différé (jusqu'à 24 h) à moitié prix, sans quota par minute.
+Les variantes déjà en cache sont servies localement ; les autres partent
+en un seul travail :
+
+  - `inline` : les requêtes dans l'appel (référence incluse à chaque fois),
+    tant que le tout reste sous INLINE_MAX_BYTES ;
+  - `file` : un fichier JSONL envoyé via la Files API, la référence n'y
+    figurant que par son URI (envoyée une fois).
+
+Le travail est suivi par interrogation périodique ; son nom, ses requêtes
+et les dérivations prévues (`--derive-led`) sont notés dans
+`<sortie>/.batch/` pour reprendre le suivi après une interruption
+(`--batch-resume`). Chaque réponse passe par le même `save_response` que le
+mode interactif (contrôle de dérive, cache, manifeste) puis par
+`on_complete` (post-traitement, export) ; les échecs sont rejoués en mode
+interactif.
+"""
+import io
+import json
+import os
+import time
+
+from .engine import MODEL_NAME
+from .fsutil import write_atomic
+from .scheduler import GenerationScheduler
+from .variants import Variant, plan_derivations
+
+BATCH_DIR = ".batch"
+# Au-delà, l'API refuse les requêtes inline : passage au fichier JSONL
+INLINE_MAX_BYTES = 20 * 1024 * 1024
+POLL_INTERVAL = 30.0
+
+DONE_STATES = {
+    "JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED", "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED",
+}
+
+
+def _state_name(state):
+    return getattr(state, "name", state)
+
+
+def _dump(model):
+    """Modèle google-genai -> JSON de l'API REST (camelCase, octets en base64)"""
+    return model.model_dump(mode="json", exclude_none=True, by_alias=True)
+
+
+class BatchRunner:
+    """Soumet, suit et dépouille un travail batch pour un GenerationEngine"""
+
+    def __init__(self, engine, mode="auto", poll_interval=POLL_INTERVAL, sleep=time.sleep):
+        self.engine = engine
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+        self._submitted_at = None
+
+    def state_path(self, name):
+        return os.path.join(self.engine.output_dir, BATCH_DIR, name.replace("/", "_") + ".json")
+
+    def run(self, variants, on_complete=None, scheduler=None, derive=False):
+        """Génère les variantes via un travail batch. Retourne les échecs (après rejeu interactif).
+
+        Avec `derive`, seules les bases partent dans le batch ; les couleurs
+        de LED en sont dérivées localement à la réception (cf. recolor.py).
+        """
+        derived, derived_failed = {}, []
+        if derive:
+            variants, derived = plan_derivations(self.engine.target.matrix, variants)
+            on_complete = self._with_derivations(derived, on_complete, derived_failed)
+        failed = self._run(variants, on_complete, scheduler, derived)
+        return failed + derived_failed
+
+    def _with_derivations(self, derived, on_complete, derived_failed):
+        """`on_complete` qui décline d'abord chaque base reçue, puis signale la base et ses dérivées"""
+
+        def complete(variant, path):
+            derivations = derived.get(variant.filename)
+            # Dérivation avant on_complete : un post-traitement pourrait remplacer la base
+            results = self.engine.derive(path, derivations) if derivations else []
+            if on_complete is not None:
+                on_complete(variant, path)
+            for derived_variant, derived_path in results:
+                if on_complete is not None:
+                    on_complete(derived_variant, derived_path)
+                if derived_path is None:
+                    derived_failed.append(derived_variant)
+
+        return complete
+
+    def _run(self, variants, on_complete=None, scheduler=None, derived=None):
+        pending = {}
+        for variant in variants:
+            job = self.engine.prepare(variant.filename, variant.prompt)
+            if self.engine.from_cache(job):
+                if on_complete is not None:
+                    on_complete(variant, job.path)
+                continue
+            pending[variant.filename] = (variant, job)
+        if not pending:
+            return []
+        name = self.submit(pending, derived)
+        return self.follow(name, pending, on_complete, scheduler)
+
+    def load_state(self, name):
+        with open(self.state_path(name), encoding="utf-8") as f:
+            return json.load(f)
+
+    def state_derivations(self, state):
+        """Dérivations notées à la soumission, relues depuis la matrice : ({base: [Derivation]}, [introuvables])"""
+        matrix = self.engine.target.matrix
+        variants = {variant.filename: variant for variant in matrix.variants()}
+        derived, missing = {}, []
+        for base_name, names in state.get("derived", {}).items():
+            for name in names:
+                variant = variants.get(name)
+                planned = matrix.group(variant.group).derivation(variant) if variant is not None else None
+                if planned is None or planned[0].filename != base_name:
+                    # La matrice a changé depuis la soumission
+                    self.engine.log(f"ERREUR {name}: dérivation de {base_name} absente de la matrice")
+                    missing.append(variant or Variant(None, name))
+                    continue
+                derived.setdefault(base_name, []).append(planned[1])
+        return derived, missing
+
+    def resume(self, name, on_complete=None, scheduler=None):
+        """Reprend le suivi d'un travail soumis lors d'une session précédente (dérivations comprises)"""
+        state = self.load_state(name)
+        variants = {variant.filename: variant for variant in self.engine.target.matrix.variants()}
+        pending = {}
+        for key, prompt_details in state["jobs"].items():
+            variant = variants.get(key) or Variant(None, key, prompt_details)
+            pending[key] = (variant, self.engine.prepare(key, prompt_details))
+        derived, derived_failed = self.state_derivations(state)
+        if derived:
+            on_complete = self._with_derivations(derived, on_complete, derived_failed)
+        failed = self.follow(name, pending, on_complete, scheduler)
+        return failed + derived_failed
+
+    # --- Soumission ---
+    def submit(self, pending, derived=None):
+        """Crée le travail batch. Retourne son nom."""
+        from google.genai import types
+
+        client = self.engine.client
+        mode = self.mode
+        if mode == "auto":
+            # Base64 : +33 % par copie inline de la référence
+            inline_size = len(self.engine.reference_bytes) * 4 // 3 * len(pending)
+            mode = "inline" if inline_size < INLINE_MAX_BYTES else "file"
+        display_name = f"{self.engine.target.name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        config = self.engine.generation_config()
+
+        with self.engine.span("batch_submit", "batch", mode=mode, requests=len(pending)):
+            if mode == "inline":
+                src = [types.InlinedRequest(contents=self.contents(job, self.engine.reference_part),
+                                            config=config, metadata={"key": key})
+                       for key, (_, job) in pending.items()]
+            else:
+                src = self.upload_requests(pending, config, display_name)
+            batch = client.batches.create(model=MODEL_NAME, src=src,
+                                          config=types.CreateBatchJobConfig(display_name=display_name))
+        self._submitted_at = time.perf_counter()
+        self.save_state(batch.name, mode, pending, derived)
+        self.engine.log(f"Batch soumis : {batch.name} ({len(pending)} requête(s), {mode})")
+        self.engine.emit("batch_submitted", name=batch.name, mode=mode, requests=len(pending))
+        return batch.name
+
+    def contents(self, job, reference):
+        from google.genai import types
+
+        return [types.Content(role="user", parts=[types.Part(text=job.prompt), reference])]
+
+    def upload_requests(self, pending, config, display_name):
+        """Écrit les requêtes en JSONL et l'envoie via la Files API. Retourne le nom du fichier."""
+        from google.genai import types
+
+        # La référence n'est envoyée qu'une fois ; chaque ligne ne porte que son URI.
+        # Les requêtes interactives (rejeu, exécutions suivantes) gardent leur propre réglage.
+        reference = self.engine.reference_content(upload=True)
+        lines = []
+        for key, (_, job) in pending.items():
+            lines.append(json.dumps({"key": key, "request": {
+                "contents": [_dump(content) for content in self.contents(job, reference)],
+                "generation_config": _dump(config),
+            }}))
+        uploaded = self.engine.client.files.upload(
+            file=io.BytesIO("\n".join(lines).encode("utf-8")),
+            config=types.UploadFileConfig(mime_type="jsonl", display_name=display_name),
+        )
+        return uploaded.name
+
+    def save_state(self, name, mode, pending, derived=None):
+        path = self.state_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Dérivées des bases en attente seulement : celles des bases en cache sont déjà faites
+        derived = {key: [d.variant.filename for d in derived[key]] for key in pending if key in (derived or {})}
+        # Seul moyen de reprendre un travail de plusieurs heures : jamais à moitié écrit
+        write_atomic(path, json.dumps({"name": name, "mode": mode, "target": self.engine.target.name,
+                                       "submitted_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                                       "jobs": {key: variant.prompt for key, (variant, _) in pending.items()},
+                                       "derived": derived},
+                                      indent=2, ensure_ascii=False))
+
+    # --- Suivi et résultats ---
+    def wait(self, name):
+        """Interroge le travail jusqu'à un état final. Retourne le BatchJob."""
+        last = None
+        with self.engine.span("batch_wait", "batch"):
+            while True:
+                try:
+                    batch = self.engine.client.batches.get(name=name)
+                except Exception as e:
+                    # Coupure réseau pendant une attente de plusieurs heures : on réessaie au tour suivant
+                    self.engine.log(f"Suivi du batch impossible ({e}), nouvel essai dans {self.poll_interval:.0f}s")
+                    self.sleep(self.poll_interval)
+                    continue
+                state = _state_name(batch.state)
+                if state != last:
+                    self.engine.log(f"Batch {name} : {state}")
+                    self.engine.emit("batch_state", name=name, state=state)
+                    last = state
+                if state in DONE_STATES:
+                    return batch
+                self.sleep(self.poll_interval)
+
+    def results(self, batch, keys):
+        """(clé, réponse ou None, erreur ou None) pour chaque requête, au fil de la lecture"""
+        from google.genai import types
+
+        dest = batch.dest
+        if dest is None:
+            return
+        if dest.inlined_responses:
+            for index, item in enumerate(dest.inlined_responses):
+                key = (item.metadata or {}).get("key") or keys[index]
+                if item.error is not None:
+                    yield key, None, f"{item.error.code}: {item.error.message}"
+                else:
+                    yield key, item.response, None
+        elif dest.file_name:
+            data = self.engine.client.files.download(file=dest.file_name)
+            for line in data.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("error"):
+                    error = record["error"]
+                    yield record["key"], None, f"{error.get('code')}: {error.get('message')}"
+                else:
+                    yield record["key"], types.GenerateContentResponse.model_validate(record["response"]), None
+
+    def follow(self, name, pending, on_complete=None, scheduler=None):
+        """Attend le travail, enregistre chaque image reçue, rejoue les échecs. Retourne les échecs."""
+        batch = self.wait(name)
+        received, retry = set(), []
+        for key, response, error in self.results(batch, list(pending)):
+            if key not in pending:
+                continue
+            variant, job = pending[key]
+            received.add(key)
+            path = None
+            if error is None:
+                try:
+                    path = self.engine.save_response(job, response)
+                except Exception as e:
+                    error = str(e)
+            self.record_job(key, path)
+            if path is None:
+                self.engine.log(f"ERREUR batch {key}: {error}")
+                retry.append(key)
+            elif on_complete is not None:
+                on_complete(variant, path)
+        retry += [key for key in pending if key not in received]
+        os.remove(self.state_path(name))
+        return self.replay([pending[key] for key in retry], on_complete, scheduler)
+
+    def record_job(self, key, path):
+        tracer = self.engine.tracer
+        if tracer is not None and self._submitted_at is not None:
+            tracer.record("job", key, self._submitted_at, time.perf_counter(), ok=path is not None, batch=True)
+
+    def replay(self, items, on_complete=None, scheduler=None):
+        """Rejoue en mode interactif (réessais, disjoncteur) ce que le batch n'a pas produit"""
+        if not items:
+            return []
+        self.engine.log(f"Rejeu interactif de {len(items)} image(s)")
+        scheduler = scheduler or GenerationScheduler()
+        futures = [(variant, scheduler.submit(self.engine.request, job)) for variant, job in items]
+        failed = []
+        for variant, future in futures:
+            path = future.result()
+            if on_complete is not None:
+                on_complete(variant, path)
+            if path is None:
+                failed.append(variant)
+        return failed
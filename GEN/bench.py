@@ -0,0 +1,433 @@
+"""Benchmark hors ligne du moteur, sans quota : un faux Gemini local remplace l'API.
+
+Le faux client répond à `generate_content` (sync et client.aio) avec une
+image toute prête, après une latence tirée d'une distribution ; il peut
+renvoyer des 503 et simuler un quota par minute (429 + retryDelay). Il
+tient aussi lieu de Batch API (`batches`, `files`) : un travail reste en
+file puis en cours pendant `--batch-latency`, et certaines de ses requêtes
+échouent selon `--error-rate`.
+Le temps est compressé par `--time-scale` : latences, backoffs, disjoncteur
+et quotas sont exprimés en secondes « réelles » puis accélérés. Les durées
+rapportées viennent d'une horloge virtuelle : chaque travail coûte les
+latences tirées par le faux client, les backoffs et attentes du
+disjoncteur (en secondes simulées), puis les travaux sont rejoués sur
+`--concurrency` places dans l'ordre de soumission. Le travail local
+(préparation, cache, contrôle de dérive, manifeste...) n'est pas
+accéléré : il est rapporté à part, en secondes réelles (colonne `local` :
+durée réelle du scénario au-delà des attentes simulées accélérées).
+
+    python -m GEN.bench
+    python -m GEN.bench --target lyon --concurrency 2 4 8 --async
+    python -m GEN.bench --latency lognormal:20,0.4 --error-rate 0.05 --quota-rpm 10 --json bench.json
+    python -m GEN.bench --batch --batch-mode file --error-rate 0.1
+"""
+import argparse
+import asyncio
+import heapq
+import io
+import json
+import math
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from google.genai import errors, types
+from PIL import Image, ImageDraw, ImageEnhance
+
+from .async_engine import AsyncGenerationEngine
+from .batch import BatchRunner
+from .cache import ResultCache
+from .engine import TARGETS, GenerationEngine
+from .profiles import MODEL_RESOLUTIONS
+from .retry import CircuitBreaker
+from .scheduler import GenerationScheduler
+from .trace import Tracer, percentile
+
+# Résultat d'un scénario : durées en secondes simulées, sauf `local` et `real` (secondes réelles)
+BenchResult = namedtuple("BenchResult", [
+    "target", "engine", "concurrency", "cache", "images", "failed", "requests", "errors_429", "errors_5xx",
+    "wall", "images_per_min", "p50", "p95", "p99", "local", "real",
+])
+
+
+def parse_latency(spec):
+    """"fixed:12", "uniform:8,20" ou "lognormal:15,0.35" (médiane, sigma) -> fonction de tirage"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"distribution inconnue : {spec}")
+
+
+def synthetic_reference(profile, path):
+    """Référence de synthèse au ratio du profil : un bâtiment (grille de fenêtres) sur du bruit"""
+    width, height = MODEL_RESOLUTIONS[profile.aspect_ratio]["2K"]
+    img = Image.effect_noise((width, height), 25).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    left, right = width * 3 // 10, width * 7 // 10
+    draw.rectangle((left, height // 6, right, height), fill=(70, 80, 95))
+    step = max(8, width // 60)
+    for y in range(height // 6 + step, height, step * 2):
+        for x in range(left + step, right - step, step * 2):
+            draw.rectangle((x, y, x + step, y + step), fill=(190, 200, 210))
+    img.save(path, format="JPEG", quality=90)
+    return path
+
+
+def canned_image(reference, profile, image_size="1K"):
+    """La référence, assombrie, à la résolution que renverrait le modèle (passe le contrôle de dérive)"""
+    width, height = MODEL_RESOLUTIONS[profile.aspect_ratio][image_size]
+    with Image.open(reference) as img:
+        img = ImageEnhance.Brightness(img.resize((width, height), Image.LANCZOS)).enhance(0.6)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+class FakeGemini:
+    """Faux client google.genai : surfaces `models`, `aio.models`, `files`, `batches`"""
+
+    def __init__(self, image_bytes, latency, error_rate=0.0, quota_rpm=None, time_scale=0.01, seed=0,
+                 batch_latency=600.0):
+        self.image_bytes = image_bytes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota_rpm = quota_rpm
+        self.time_scale = time_scale
+        self.batch_latency = batch_latency
+        self.requests = 0
+        # (prompt, latence en secondes simulées) de chaque appel generate_content
+        self.latencies = []
+        self.batch_keys = set()
+        self.errors_429 = 0
+        self.errors_5xx = 0
+        self._rng = random.Random(seed)
+        self._window = []
+        self._lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.aio = _FakeAio(self)
+        self.files = _FakeFiles()
+        self.batches = _FakeBatches(self)
+
+    def _draw(self, contents):
+        """Décide du sort d'une requête : (latence réelle, exception ou None)"""
+        delay, error = self._decide()
+        with self._lock:
+            self.latencies.append((contents[0], delay / self.time_scale))
+        return delay, error
+
+    def _decide(self):
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            delay = max(0.0, self.latency(self._rng)) * self.time_scale
+            if self.quota_rpm:
+                window = 60.0 * self.time_scale
+                self._window = [t for t in self._window if now - t < window]
+                if len(self._window) >= self.quota_rpm:
+                    self.errors_429 += 1
+                    # Délai en temps accéléré : c'est celui que le moteur attendra réellement
+                    retry_in = window - (now - self._window[0])
+                    return 0.02 * self.time_scale, errors.ClientError(429, {"error": {
+                        "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "quota",
+                        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                                     "retryDelay": f"{retry_in:.3f}s"}],
+                    }})
+                self._window.append(now)
+            if self._rng.random() < self.error_rate:
+                self.errors_5xx += 1
+                return delay / 2, errors.ServerError(503, {"error": {
+                    "code": 503, "status": "UNAVAILABLE", "message": "overloaded"}})
+        return delay, None
+
+    def _response(self):
+        part = types.Part.from_bytes(data=self.image_bytes, mime_type="image/jpeg")
+        return types.GenerateContentResponse(candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[part]), finish_reason="STOP")])
+
+    def close(self):
+        pass
+
+
+class _FakeModels:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def generate_content(self, model, contents, config=None):
+        delay, error = self.fake._draw(contents)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return self.fake._response()
+
+
+class _FakeAioModels(_FakeModels):
+    async def generate_content(self, model, contents, config=None):
+        delay, error = self.fake._draw(contents)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return self.fake._response()
+
+
+class _FakeAio:
+    def __init__(self, fake):
+        self.models = _FakeAioModels(fake)
+
+    async def aclose(self):
+        pass
+
+
+class _FakeFiles:
+    """Files API en mémoire"""
+
+    def __init__(self):
+        self.store = {}
+        self._lock = threading.Lock()
+
+    def upload(self, file, config=None):
+        data = file.read() if hasattr(file, "read") else open(file, "rb").read()
+        mime_type = getattr(config, "mime_type", None) or "application/octet-stream"
+        with self._lock:
+            name = f"files/fake-{len(self.store) + 1}"
+            self.store[name] = data
+        return types.File(name=name, uri=f"https://fake.invalid/{name}", mime_type=mime_type, size_bytes=len(data))
+
+    def download(self, file, config=None):
+        return self.store[getattr(file, "name", file)]
+
+    def delete(self, name, config=None):
+        self.store.pop(name, None)
+
+
+class _FakeBatches:
+    """Batch API locale : état calculé d'après l'heure, résultats inline ou JSONL selon la source"""
+
+    def __init__(self, fake):
+        self.fake = fake
+        self.jobs = {}
+
+    def create(self, model, src, config=None):
+        fake = self.fake
+        if isinstance(src, str):
+            keys = [json.loads(line)["key"] for line in fake.files.download(src).decode("utf-8").splitlines() if line]
+        else:
+            keys = [(request.metadata or {}).get("key") for request in src]
+        with fake._lock:
+            fake.requests += len(keys)
+            fake.batch_keys.update(keys)
+            outcomes = [fake._rng.random() >= fake.error_rate for _ in keys]
+            fake.errors_5xx += outcomes.count(False)
+        name = f"batches/fake-{len(self.jobs) + 1}"
+        latency = self.fake.batch_latency * self.fake.time_scale
+        self.jobs[name] = dict(keys=keys, outcomes=outcomes, file=isinstance(src, str),
+                               queued_until=time.monotonic() + latency * 0.2,
+                               done_at=time.monotonic() + latency, dest=None)
+        return types.BatchJob(name=name, display_name=getattr(config, "display_name", None),
+                              state="JOB_STATE_PENDING", model=model)
+
+    def _dest(self, job):
+        """Résultats produits une fois, à la fin du travail"""
+        fake = self.fake
+        error = types.JobError(code=503, message="overloaded")
+        if not job["file"]:
+            return types.BatchJobDestination(inlined_responses=[
+                types.InlinedResponse(response=fake._response(), metadata={"key": key}) if ok
+                else types.InlinedResponse(error=error, metadata={"key": key})
+                for key, ok in zip(job["keys"], job["outcomes"])])
+        response = fake._response().model_dump(mode="json", exclude_none=True, by_alias=True)
+        lines = [json.dumps({"key": key, "response": response} if ok else {"key": key, "error": error.model_dump()})
+                 for key, ok in zip(job["keys"], job["outcomes"])]
+        uploaded = fake.files.upload(io.BytesIO("\n".join(lines).encode("utf-8")))
+        return types.BatchJobDestination(file_name=uploaded.name)
+
+    def get(self, name, config=None):
+        job = self.jobs[name]
+        now = time.monotonic()
+        if now < job["queued_until"]:
+            return types.BatchJob(name=name, state="JOB_STATE_PENDING")
+        if now < job["done_at"]:
+            return types.BatchJob(name=name, state="JOB_STATE_RUNNING")
+        if job["dest"] is None:
+            job["dest"] = self._dest(job)
+        state = "JOB_STATE_SUCCEEDED" if all(job["outcomes"]) else "JOB_STATE_PARTIALLY_SUCCEEDED"
+        return types.BatchJob(name=name, state=state, dest=job["dest"])
+
+
+def scaled_engine(engine, time_scale):
+    """Accélère backoffs et disjoncteur du moteur comme le reste du temps simulé"""
+    engine.retry_policies = {kind: policy._replace(base_delay=policy.base_delay * time_scale,
+                                                   max_delay=policy.max_delay * time_scale)
+                             for kind, policy in engine.retry_policies.items()}
+    engine.breaker = CircuitBreaker(cooldown=30.0 * time_scale, max_cooldown=300.0 * time_scale)
+    return engine
+
+
+def replay(durations, concurrency, rpm=None, start=0.0):
+    """Horloge virtuelle : fin de chaque travail, servis dans l'ordre sur `concurrency` places"""
+    slots = [start] * concurrency
+    next_start = start
+    ends = []
+    for duration in durations:
+        begin = max(heapq.heappop(slots), next_start)
+        if rpm:
+            next_start = begin + 60.0 / rpm
+        heapq.heappush(slots, begin + duration)
+        ends.append(begin + duration)
+    return ends
+
+
+def simulated_costs(tracer, fake, variants, engine, time_scale, first_call=0):
+    """({fichier: secondes simulées de service}, attente du travail batch en secondes simulées)"""
+    prompts = {engine.build_prompt(variant.prompt): variant.filename for variant in variants}
+    service = {variant.filename: 0.0 for variant in variants}
+    for prompt, seconds in fake.latencies[first_call:]:
+        service[prompts[prompt]] += seconds
+    batch_wait = 0.0
+    for span in tracer.spans():
+        duration = span.end - span.start
+        if span.name == "backoff":
+            # Délai demandé, pas la durée mesurée (réveil du thread retardé par le GIL)
+            service[span.job] += span.args.get("delay", duration) / time_scale
+        elif span.name == "breaker_wait":
+            service[span.job] += duration / time_scale
+        elif span.name == "batch_wait":
+            batch_wait += duration / time_scale
+    return service, batch_wait
+
+
+def run_scenario(target, reference, fake, concurrency, cache_mode, use_async, time_scale, cache_dir, rpm=None,
+                 batch_mode=None):
+    """Génère toute la matrice de la cible avec le faux client. Retourne un BenchResult."""
+    cache = ResultCache(cache_dir) if cache_mode != "off" else None
+    tracer = Tracer()
+    with tempfile.TemporaryDirectory(prefix="bench-") as output_dir:
+        engine = GenerationEngine(target, api_key="bench", output_dir=output_dir, log=lambda message: None,
+                                  cache=cache, tracer=tracer, client=fake)
+        scaled_engine(engine, time_scale)
+        engine.load_reference(reference)
+        variants = list(target.matrix.variants())
+        requests, e429, e5xx = fake.requests, fake.errors_429, fake.errors_5xx
+        first_call, batch_keys = len(fake.latencies), set(fake.batch_keys)
+
+        start = time.perf_counter()
+        if batch_mode:
+            runner = BatchRunner(engine, mode=batch_mode, poll_interval=30.0 * time_scale)
+            failed = runner.run(variants, scheduler=GenerationScheduler(max_in_flight=concurrency))
+        elif use_async:
+            async def run():
+                async_engine = AsyncGenerationEngine(engine, max_in_flight=concurrency)
+                try:
+                    return await async_engine.run(variants)
+                finally:
+                    await async_engine.aclose()
+            failed = asyncio.run(run())
+        else:
+            scheduler = GenerationScheduler(max_in_flight=concurrency,
+                                            requests_per_minute=rpm / time_scale if rpm else None)
+            failed = engine.run(variants, scheduler)
+        real = time.perf_counter() - start
+        service, batch_wait = simulated_costs(tracer, fake, variants, engine, time_scale, first_call)
+        engine.close()
+
+    order = [variant.filename for variant in variants]
+    if batch_mode:
+        # Livrées à la fin du travail batch ; les échecs sont rejoués ensuite, en interactif
+        replayed = [filename for filename in order if service[filename] > 0]
+        ends = dict(zip(replayed, replay([service[f] for f in replayed], concurrency, start=batch_wait)))
+        in_batch = fake.batch_keys - batch_keys
+        latencies = [ends.get(f, batch_wait if f in in_batch else 0.0) for f in order]
+        wall = max(latencies, default=0.0)
+    else:
+        latencies = [service[filename] for filename in order]
+        ends = replay(latencies, concurrency, rpm if not use_async else None)
+        wall = max(ends, default=0.0)
+    latencies.sort()
+    # Ce que le travail local ajoute au temps réel, au-delà des attentes simulées (accélérées)
+    local = max(0.0, real - wall * time_scale)
+    done = len(variants) - len(failed)
+    return BenchResult(
+        target=target.name, engine=f"batch-{batch_mode}" if batch_mode else "async" if use_async else "threads",
+        concurrency=concurrency,
+        cache=cache_mode, images=done, failed=len(failed), requests=fake.requests - requests,
+        errors_429=fake.errors_429 - e429, errors_5xx=fake.errors_5xx - e5xx, wall=wall,
+        images_per_min=done * 60 / wall if wall else None, p50=percentile(latencies, 50),
+        p95=percentile(latencies, 95), p99=percentile(latencies, 99), local=local, real=real,
+    )
+
+
+def format_results(results):
+    lines = [f"{'cible':7} {'moteur':12} {'conc':>4} {'cache':5} {'ok':>4} {'éch':>4} {'req':>4} "
+             f"{'429':>4} {'5xx':>4} {'durée':>8} {'img/min':>8} {'p50':>7} {'p95':>7} {'p99':>7} "
+             f"{'local':>7} {'réel':>7}"]
+    for r in results:
+        # Sans attente simulée (cache chaud), le débit dépend du seul travail local : voir `local`
+        rate = f"{r.images_per_min:8.1f}" if r.images_per_min is not None else f"{'-':>8}"
+        lines.append(f"{r.target:7} {r.engine:12} {r.concurrency:4d} {r.cache:5} {r.images:4d} {r.failed:4d} "
+                     f"{r.requests:4d} {r.errors_429:4d} {r.errors_5xx:4d} {r.wall:7.1f}s {rate} "
+                     f"{r.p50:6.1f}s {r.p95:6.1f}s {r.p99:6.1f}s {r.local:6.2f}s {r.real:6.2f}s")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m GEN.bench", description="Benchmark hors ligne du moteur de génération.")
+    parser.add_argument("--target", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--cache", nargs="+", choices=("off", "cold", "warm"), default=["off", "warm"],
+                        help="off : sans cache ; cold : cache vide ; warm : cache déjà rempli")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="moteur asyncio au lieu des threads")
+    parser.add_argument("--batch", action="store_true", help="un seul travail Batch API (rejeu interactif des échecs)")
+    parser.add_argument("--batch-mode", choices=("auto", "inline", "file"), default="auto",
+                        help="requêtes inline ou fichier JSONL (défaut: selon la taille)")
+    parser.add_argument("--batch-latency", type=float, default=600.0,
+                        help="durée simulée d'un travail batch, en secondes (défaut: 600)")
+    parser.add_argument("--latency", default="lognormal:15,0.35",
+                        help="distribution de latence en secondes (fixed:S, uniform:A,B, lognormal:MÉDIANE,SIGMA)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proportion de réponses 503")
+    parser.add_argument("--quota-rpm", type=int, help="quota simulé : au-delà, 429 avec retryDelay")
+    parser.add_argument("--rpm", type=float, help="limite de requêtes par minute côté scheduler")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="facteur d'accélération du temps (défaut: 0.01)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="FICHIER", help="écrit les résultats en JSON (comparaison entre versions)")
+    args = parser.parse_args(argv)
+
+    latency = parse_latency(args.latency)
+    results = []
+    print(format_results([]), flush=True)
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        for name in args.target:
+            target = TARGETS[name]
+            # Référence synthétique : elle passe par la vraie préparation (reference.py)
+            reference = f"{workdir}/{name}-reference.jpg"
+            synthetic_reference(target.profile, reference)
+            image_bytes = canned_image(reference, target.profile)
+            for concurrency in args.concurrency:
+                for cache_mode in args.cache:
+                    cache_dir = f"{workdir}/cache-{name}-{concurrency}-{cache_mode}"
+                    fake = FakeGemini(image_bytes, latency, args.error_rate, args.quota_rpm,
+                                      args.time_scale, args.seed, args.batch_latency)
+                    batch_mode = args.batch_mode if args.batch else None
+                    if cache_mode == "warm":
+                        run_scenario(target, reference, fake, concurrency, cache_mode, args.use_async,
+                                     args.time_scale, cache_dir, args.rpm, batch_mode)
+                    result = run_scenario(target, reference, fake, concurrency, cache_mode, args.use_async,
+                                          args.time_scale, cache_dir, args.rpm, batch_mode)
+                    results.append(result)
+                    print(format_results([result]).splitlines()[-1], flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([r._asdict() for r in results], f, indent=2)
+    return 1 if any(r.failed for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
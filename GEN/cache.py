@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from .fsutil import write_atomic
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 Mo
+
+
+def cache_key(prompt, reference_bytes, model, aspect_ratio, image_size):
+    """Empreinte SHA-256 de tout ce qui détermine l'image générée"""
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        "prompt": prompt,
+        "model": model,
+        "aspect_ratio": aspect_ratio,
+        "image_size": image_size,
+    }, sort_keys=True).encode("utf-8"))
+    h.update(hashlib.sha256(reference_bytes).digest())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Cache disque des images générées, adressé par contenu.
+
+    Chaque entrée est un fichier `<clé>` ; l'heure de modification sert
+    d'horodatage LRU. Au-delà de `max_bytes`, les entrées les moins
+    récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Chemin de l'entrée en cache, ou None. Un accès la rafraîchit (LRU)."""
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def copy_to(self, key, dest_path):
+        path = self.get(key)
+        if path is None:
+            return False
+        shutil.copyfile(path, dest_path)
+        return True
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(self._path(key), data)
+        self.evict()
+        return self._path(key)
+
+    def evict(self):
+        """Supprime les entrées les plus anciennes jusqu'à repasser sous max_bytes"""
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.startswith(".")]
+            except FileNotFoundError:
+                return
+            stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+            total = sum(size for _, size, _ in stats)
+            for _, size, path in sorted(stats):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
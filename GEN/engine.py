@@ -0,0 +1,605 @@
+import base64
+import contextlib
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+from PIL import Image
+
+from .cache import cache_key
+from .fsutil import write_atomic
+from .manifest import Inputs, Manifest, make_inputs
+from .profiles import MODEL_RESOLUTIONS, PROFILES, downscale, pick_image_size
+from .reference import prepare_reference
+from .retry import DEFAULT_POLICIES, CircuitBreaker, GeometryDriftError, check_response, classify, retry_delay
+from .scheduler import GenerationScheduler
+from .variants import MATRICES_DIR, load_matrix, plan_derivations
+
+MODEL_NAME = "gemini-3-pro-image-preview"
+
+# Pool HTTP partagé : les connexions TLS restent ouvertes d'une image à l'autre
+HTTP_LIMITS = dict(max_connections=16, max_keepalive_connections=8, keepalive_expiry=120)
+
+# Sous-dossier de sortie où restent les candidats non retenus en best-of-N
+CANDIDATES_DIR = "candidates"
+
+# Une cible = un widget : son prompt d'édition, son profil de sortie et son dossier,
+# tels que déclarés dans GEN/matrices/<nom>.json
+Target = namedtuple("Target", ["name", "prompt_template", "profile", "output_subdir", "matrix"])
+
+
+def load_target(name_or_path):
+    matrix = load_matrix(name_or_path)
+    return Target(
+        name=matrix.name,
+        prompt_template=matrix.base_prompt,
+        profile=PROFILES[matrix.profile],
+        output_subdir=matrix.output_dir,
+        matrix=matrix,
+    )
+
+
+INCITY = load_target("incity")
+LYON = load_target("lyon")
+
+TARGETS = {t.name: t for t in (INCITY, LYON)}
+
+# Une génération en cours : prompt complet, fichier de sortie et clé de cache
+Job = namedtuple("Job", ["filename", "prompt", "path", "key"])
+
+
+# Signatures des formats d'image que le modèle peut renvoyer
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+)
+
+
+def sniff_mime(data):
+    """Type MIME d'après les premiers octets, ou None si ce n'est pas une image connue"""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def create_client(api_key):
+    """Client Gemini unique par clé : un seul pool de connexions keep-alive"""
+    # Le SDK (~0,2 s d'import) n'est chargé qu'à la première génération
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    limits = httpx.Limits(**HTTP_LIMITS)
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        ),
+    )
+
+
+class GenerationEngine:
+    """Moteur de génération sans interface : référence + variantes -> fichiers PNG (CLI, apps Tk, bench)"""
+
+    def __init__(self, target, api_key, output_dir=None, log=print, cache=None, force=False,
+                 image_size=None, downscale=False, upload_reference=False, events=None,
+                 tracer=None, client=None, geometry_threshold=None, geometry_gate=True):
+        self.target = target
+        # Taille modèle la moins chère qui couvre le profil ; `downscale` réduit ensuite à la taille du widget
+        self.image_size = image_size or pick_image_size(target.profile)
+        self.downscale = downscale
+        self.api_key = api_key
+        self.output_dir = output_dir or os.path.join(os.getcwd(), target.output_subdir)
+        # Ce qui a produit chaque fichier du dossier (cf. manifest.py)
+        self.manifest = Manifest(self.output_dir)
+        self.log = log
+        self.events = events
+        self.tracer = tracer
+        gate = target.matrix.geometry_gate or {}
+        # Seuil explicite, sinon celui de la matrice ; None : aucun rejet
+        if not geometry_gate:
+            self.geometry_threshold = None
+        elif geometry_threshold is not None:
+            self.geometry_threshold = geometry_threshold
+        else:
+            self.geometry_threshold = gate.get("threshold")
+        self.geometry_mask = os.path.join(MATRICES_DIR, gate["mask"]) if gate.get("mask") else None
+        self.quality_gate = None
+        self.cache = cache
+        self.force = force
+        # Réessais par classe d'erreur (cf. retry.py) ; disjoncteur commun à toute la file
+        self.retry_policies = DEFAULT_POLICIES
+        self.breaker = CircuitBreaker()
+        self.reference_image_path = None
+        self.reference_bytes = None
+        self.pil_image = None
+        self.reference_mime_type = None
+        self._reference_part = None
+        self.upload_reference = upload_reference
+        self._uploaded = None
+        self._upload_lock = threading.Lock()
+        # Client injectable (ex: faux Gemini de bench.py), sinon créé une fois et partagé par les workers
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def reference_part(self):
+        """Part inline de la référence, construite au premier envoi (import du SDK)"""
+        if self._reference_part is None and self.reference_bytes is not None:
+            from google.genai import types
+
+            self._reference_part = types.Part.from_bytes(data=self.reference_bytes,
+                                                         mime_type=self.reference_mime_type)
+        return self._reference_part
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = create_client(self.api_key)
+            return self._client
+
+    def set_api_key(self, api_key):
+        """Change de clé API ; le client n'est recréé que si la clé change"""
+        with self._client_lock:
+            if api_key == self.api_key:
+                return
+            self.api_key = api_key
+            old_client, self._client = self._client, None
+        if old_client is not None:
+            self._delete_upload(old_client)
+            old_client.close()
+
+    def close(self):
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            self._delete_upload(client)
+            client.close()
+
+    def load_reference(self, path):
+        """Normalise la référence une fois pour toutes (cf. reference.py), prépare le contrôle de dérive"""
+        from .quality import GeometryGate
+
+        self.reference_image_path = path
+        # Au-delà de la résolution de sortie, le modèle ne tire rien d'une référence plus grande
+        max_side = max(MODEL_RESOLUTIONS[self.target.profile.aspect_ratio][self.image_size])
+        prepared = prepare_reference(path, max_side)
+        if len(prepared.data) != prepared.source_size:
+            self.log(f"Référence préparée : {prepared.width}x{prepared.height}, "
+                     f"{prepared.source_size // 1024} Ko -> {len(prepared.data) // 1024} Ko")
+        self.reference_bytes = prepared.data
+        self.pil_image = Image.open(io.BytesIO(prepared.data)).convert('RGB')
+        self.reference_mime_type = prepared.mime_type
+        self._reference_part = None
+        # Sans seuil, le contrôle ne rejette rien mais sert à noter les candidats best-of-N
+        self.quality_gate = GeometryGate(prepared.data, threshold=self.geometry_threshold,
+                                         mask=self.geometry_mask)
+        # Nouvelle référence : l'ancien fichier envoyé ne sert plus
+        if self._client is not None:
+            self._delete_upload(self._client)
+        return self.pil_image
+
+    def reference_content(self, upload=None):
+        """Part de la référence : URI du fichier envoyé une fois, sinon données inline.
+
+        `upload` force l'un ou l'autre pour cet appel (défaut: `upload_reference`).
+        Peut bloquer (envoi Files API) : à appeler hors de la boucle asyncio.
+        """
+        if not (self.upload_reference if upload is None else upload):
+            return self.reference_part
+        from google.genai import types
+
+        with self._upload_lock:
+            if self._uploaded is None:
+                try:
+                    self._uploaded = self.client.files.upload(
+                        file=io.BytesIO(self.reference_part.inline_data.data),
+                        config=types.UploadFileConfig(mime_type=self.reference_part.inline_data.mime_type),
+                    )
+                    self.log(f"Référence envoyée une fois : {self._uploaded.name}")
+                except Exception as e:
+                    # Vertex AI, quota Files API... : on repasse en inline pour la session
+                    self.log(f"Envoi de la référence impossible ({e}), données inline")
+                    self.upload_reference = False
+                    return self.reference_part
+            uploaded = self._uploaded
+        return types.Part.from_uri(file_uri=uploaded.uri, mime_type=uploaded.mime_type)
+
+    def _delete_upload(self, client):
+        # Les fichiers expirent d'eux-mêmes après 48 h : la suppression est une politesse
+        with self._upload_lock:
+            uploaded, self._uploaded = self._uploaded, None
+        if uploaded is None:
+            return
+        try:
+            client.files.delete(name=uploaded.name)
+        except Exception:
+            pass
+
+    def emit(self, kind, **data):
+        if self.events is not None:
+            self.events.emit(kind, **data)
+
+    def span(self, name, job, **args):
+        """Chronomètre une étape du travail `job` (sans tracer : ne fait rien)"""
+        if self.tracer is None:
+            return contextlib.nullcontext(args)
+        return self.tracer.span(name, job, **args)
+
+    def build_prompt(self, prompt_details):
+        return self.target.prompt_template.format(details=prompt_details)
+
+    def prepare(self, filename, prompt_details):
+        """Prompt final, chemin de sortie et clé de cache d'une variante"""
+        base_prompt = self.build_prompt(prompt_details)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        final_path = os.path.join(self.output_dir, filename)
+
+        key = None
+        if self.cache is not None:
+            key = cache_key(base_prompt, self.reference_bytes, MODEL_NAME,
+                            self.target.profile.aspect_ratio, self.image_size)
+        return Job(filename, base_prompt, final_path, key)
+
+    def from_cache(self, job):
+        """Copie le résultat en cache vers la sortie. Retourne True si trouvé."""
+        if job.key is None or self.force or not self.cache.copy_to(job.key, job.path):
+            return False
+        if self.downscale:
+            downscale(job.path, self.target.profile)
+        self.manifest.record(job.filename, job.path, self.inputs(job), "cache")
+        self.log(f"Cache: {job.filename}")
+        self.emit("job_done", filename=job.filename, source="cache")
+        return True
+
+    def inputs(self, job):
+        """Entrées d'un travail, telles qu'enregistrées dans le manifeste"""
+        return make_inputs(job.prompt, self.reference_bytes, MODEL_NAME,
+                           self.target.profile.aspect_ratio, self.image_size)
+
+    def plan(self, variants):
+        """Compare les variantes au manifeste du dossier de sortie. Retourne [PlanItem].
+
+        Sans référence chargée, son empreinte n'est pas comparée.
+        """
+        items = []
+        for variant in variants:
+            expected, derived_from = variant, None
+            entry = self.manifest.get(variant.filename)
+            planned = self.target.matrix.group(variant.group).derivation(variant)
+            # Une image dérivée localement dépend des entrées de sa base et des deux couleurs
+            if planned is not None and entry is not None and entry.get("derived_from"):
+                base, derivation = planned
+                expected = base
+                derived_from = {"filename": base.filename, "source_color": derivation.source_color,
+                                "target_color": derivation.target_color}
+            job = Job(expected.filename, self.build_prompt(expected.prompt), None, None)
+            items.append(self.manifest.status(variant, self.inputs(job), derived_from))
+        return items
+
+    def generation_config(self):
+        from google.genai import types
+
+        return types.GenerateContentConfig(
+            response_modalities=['IMAGE'],
+            image_config=types.ImageConfig(
+                aspect_ratio=self.target.profile.aspect_ratio,
+                image_size=self.image_size
+            )
+        )
+
+    def request_args(self, job):
+        """Arguments de generate_content, communs aux clients sync et async"""
+        return dict(
+            model=MODEL_NAME,
+            contents=[job.prompt, self.reference_content()],
+            config=self.generation_config()
+        )
+
+    def save_response(self, job, response):
+        """Écrit l'image de la réponse et retourne son chemin.
+
+        Les octets renvoyés par le modèle sont écrits tels quels (écriture
+        atomique), sans décodage : seul un post-traitement qui a besoin des
+        pixels (downscale) ouvre l'image.
+
+        Lève SafetyBlockError / NoImageError si la réponse ne contient pas d'image.
+        """
+        for part in response.parts or []:
+            if not part.inline_data or not part.inline_data.data:
+                continue
+            data = part.inline_data.data
+            # Parfois c'est du raw bytes, parfois b64 string
+            if isinstance(data, str):
+                data = base64.b64decode(data)
+            mime_type = sniff_mime(data)
+            if mime_type is None:
+                continue
+            drift = self.check_geometry(job, data)
+
+            write_atomic(job.path, data)
+            if job.key is not None:
+                self.cache.put(job.key, data)
+            if self.downscale:
+                with self.span("downscale", job.filename):
+                    downscale(job.path, self.target.profile)
+            # Les candidats best-of-N (candidates/) ne sont pas des sorties : pick_best enregistre le retenu
+            if os.path.dirname(job.path) == self.output_dir:
+                self.manifest.record(job.filename, job.path, self.inputs(job), "api", mime_type=mime_type)
+            self.log(f"OK: {job.filename} ({mime_type}, {len(data) // 1024} Ko)")
+            self.emit("job_done", filename=job.filename, source="api", mime_type=mime_type, bytes=len(data),
+                      drift=drift)
+            return job.path
+
+        check_response(response)
+
+    def check_geometry(self, job, data):
+        """Lève GeometryDriftError si l'image s'éloigne trop de la référence. Retourne la dérive."""
+        if self.quality_gate is None or self.quality_gate.threshold is None:
+            return None
+        with self.span("quality", job.filename):
+            report = self.quality_gate.check(data)
+        if report.passed:
+            return round(report.drift, 4)
+        # Gardée pour inspection, jamais mise en cache
+        rejected_dir = os.path.join(self.output_dir, "rejected")
+        os.makedirs(rejected_dir, exist_ok=True)
+        stem, ext = os.path.splitext(job.filename)
+        write_atomic(os.path.join(rejected_dir, f"{stem}-{report.drift:.2f}{ext}"), data)
+        self.emit("drift_rejected", filename=job.filename, drift=round(report.drift, 4), threshold=report.threshold)
+        raise GeometryDriftError(f"dérive géométrique {report.drift:.2f} > {report.threshold:.2f}")
+
+    def generate(self, filename, prompt_details, queued_at=None):
+        """Génère une image. Retourne le chemin écrit, ou None en cas d'échec.
+
+        `queued_at` (perf_counter à la mise en file) sert à mesurer l'attente.
+        """
+        start = time.perf_counter()
+        if queued_at is not None and self.tracer is not None:
+            self.tracer.record("queue", filename, queued_at, start)
+        path = None
+        try:
+            path = self._generate(filename, prompt_details)
+            return path
+        finally:
+            if self.tracer is not None:
+                self.tracer.record("job", filename, start, time.perf_counter(), ok=path is not None)
+
+    def _generate(self, filename, prompt_details):
+        with self.span("prepare", filename):
+            job = self.prepare(filename, prompt_details)
+        with self.span("cache", filename):
+            if self.from_cache(job):
+                return job.path
+        return self.request(job)
+
+    def request(self, job):
+        """Appels API (avec réessais) jusqu'à obtenir l'image de `job`. Retourne le chemin ou None."""
+        filename = job.filename
+        try:
+            client = self.client
+            with self.span("reference", filename):
+                self.reference_content()
+        except Exception as e:
+            self.log(f"Erreur Client: {e}")
+            return None
+
+        attempts = {}
+        while True:
+            with self.span("breaker_wait", filename):
+                self.breaker.wait()
+            self.log(f"Génération: {filename}...")
+            self.emit("request", filename=filename)
+            try:
+                with self.span("serialize", filename):
+                    request = self.request_args(job)
+                with self.span("request", filename, attempt=sum(attempts.values()) + 1):
+                    response = client.models.generate_content(**request)
+                with self.span("save", filename):
+                    path = self.save_response(job, response)
+            except Exception as e:
+                delay = self.handle_failure(job, e, attempts)
+                if delay is None:
+                    return None
+                with self.span("backoff", filename, delay=delay):
+                    time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return path
+
+    def handle_failure(self, job, exc, attempts):
+        """Classe l'erreur et retourne le délai avant réessai, ou None pour abandonner.
+
+        `attempts` compte les réessais déjà faits par classe d'erreur.
+        """
+        kind, retry_after = classify(exc)
+        opened = self.breaker.record_failure(kind, retry_after)
+        if opened:
+            self.log(f"Service dégradé : file en pause {opened:.0f}s")
+            self.emit("breaker_open", cooldown=opened)
+        attempt = attempts.get(kind, 0)
+        attempts[kind] = attempt + 1
+        delay = retry_delay(kind, attempt, retry_after, self.retry_policies)
+        if delay is None:
+            self.log(f"ERREUR ({kind}) {job.filename}: {exc}")
+            self.emit("job_failed", filename=job.filename, error=kind, detail=str(exc), attempts=dict(attempts))
+        else:
+            self.log(f"Réessai {job.filename} ({kind}, n°{attempt + 1}) dans {delay:.1f}s")
+            self.emit("retry", filename=job.filename, error=kind, attempt=attempt + 1, delay=round(delay, 3))
+        return delay
+
+    # --- Best-of-N ---
+    def candidate_job(self, job, index):
+        """Job du candidat n° `index` : écrit dans candidates/, jamais mis en cache"""
+        stem, ext = os.path.splitext(job.filename)
+        filename = f"{stem}.{index}{ext}"
+        return job._replace(filename=filename, path=os.path.join(self.output_dir, CANDIDATES_DIR, filename), key=None)
+
+    def generate_candidate(self, job, index, queued_at=None):
+        candidate = self.candidate_job(job, index)
+        os.makedirs(os.path.dirname(candidate.path), exist_ok=True)
+        start = time.perf_counter()
+        if queued_at is not None and self.tracer is not None:
+            self.tracer.record("queue", candidate.filename, queued_at, start)
+        path = None
+        try:
+            path = self.request(candidate)
+            return path
+        finally:
+            if self.tracer is not None:
+                self.tracer.record("job", candidate.filename, start, time.perf_counter(), ok=path is not None)
+
+    def pick_best(self, job, paths, cue_color=None):
+        """Note les candidats, copie le meilleur vers la sortie du job. Retourne son chemin ou None."""
+        paths = [path for path in paths if path]
+        if not paths:
+            self.log(f"ERREUR {job.filename}: aucun candidat exploitable")
+            return None
+        from .quality import score_candidate
+
+        with self.span("score", job.filename):
+            scored = sorted(((score_candidate(path, self.quality_gate, cue_color), path) for path in paths),
+                            key=lambda item: item[0].total, reverse=True)
+        best_score, best = scored[0]
+        with open(best, "rb") as f:
+            data = f.read()
+        write_atomic(job.path, data)
+        if job.key is not None:
+            self.cache.put(job.key, data)
+        os.unlink(best)
+        self.manifest.record(job.filename, job.path, self.inputs(job), "best_of", score=round(best_score.total, 4))
+        self.log(f"Meilleur de {len(scored)} : {job.filename} (score {best_score.total:.2f} ; "
+                 f"autres {', '.join(f'{score.total:.2f}' for score, _ in scored[1:]) or '-'})")
+        self.emit("best_of", filename=job.filename,
+                  scores=[dict(score._asdict(), path=os.path.basename(path)) for score, path in scored])
+        return job.path
+
+    def submit_best_of(self, scheduler, filename, prompt_details, best_of, cue_color=None):
+        """Lance `best_of` candidats dans la file du scheduler. Retourne un Future du chemin retenu.
+
+        Aucun worker n'attend les autres : le dernier candidat terminé fait le choix.
+        """
+        result = Future()
+        job = self.prepare(filename, prompt_details)
+        if self.from_cache(job):
+            result.set_result(job.path)
+            return result
+
+        queued_at = time.perf_counter()
+        futures = [scheduler.submit(self.generate_candidate, job, index, queued_at=queued_at)
+                   for index in range(1, best_of + 1)]
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                result.set_result(self.pick_best(job, [f.result() for f in futures], cue_color))
+            except Exception as e:
+                self.log(f"ERREUR {job.filename}: {e}")
+                result.set_result(None)
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        return result
+
+    def derive(self, base_path, derivations):
+        """Décline localement l'image de base (couleurs des LED). Retourne [(variante, chemin ou None)]."""
+        if base_path is None:
+            for derivation in derivations:
+                self.log(f"ERREUR {derivation.variant.filename}: base non générée")
+            return [(derivation.variant, None) for derivation in derivations]
+        # Import tardif : NumPy n'est nécessaire qu'en mode dérivé
+        from .recolor import derive_all
+        with self.span("derive", os.path.basename(base_path), count=len(derivations)) as span_args:
+            try:
+                results = derive_all(base_path, derivations, self.output_dir)
+                # Images produites hors des spans « job » : comptées dans le débit (Tracer.summary)
+                span_args["written"] = len(results)
+            except Exception as e:
+                self.log(f"ERREUR dérivation depuis {os.path.basename(base_path)}: {e}")
+                return [(derivation.variant, None) for derivation in derivations]
+        base = self.manifest.get(os.path.basename(base_path))
+        for (variant, path), derivation in zip(results, derivations):
+            if base is not None:
+                self.manifest.record(variant.filename, path, Inputs(*(base[field] for field in Inputs._fields)),
+                                     "derived", derived_from={"filename": os.path.basename(base_path),
+                                                              "source_color": derivation.source_color,
+                                                              "target_color": derivation.target_color})
+            self.log(f"Dérivé: {variant.filename} (depuis {os.path.basename(base_path)})")
+            self.emit("job_done", filename=variant.filename, path=path, source="derived",
+                      base=os.path.basename(base_path))
+        return results
+
+    def submit(self, scheduler, variant, best_of=1):
+        """Place une variante dans la file du scheduler. Retourne un Future."""
+        if best_of > 1:
+            return self.submit_best_of(scheduler, variant.filename, variant.prompt, best_of, variant.cue)
+        return scheduler.submit(self.generate, variant.filename, variant.prompt, queued_at=time.perf_counter())
+
+    def run(self, variants, scheduler=None, on_complete=None, best_of=1, derive=False):
+        """Génère une liste de variantes via le scheduler (borné). Retourne les échecs.
+
+        `on_complete(variant, path)` est appelé à chaque fin, depuis le thread
+        du worker (path = None en cas d'échec) ; run() ne rend la main qu'une
+        fois tous les appels terminés. Avec `derive`, seules les bases
+        des groupes déclinables sont demandées à l'API ; les autres couleurs en
+        sont dérivées localement dès que leur base est prête.
+        """
+        scheduler = scheduler or GenerationScheduler()
+        derived = {}
+        if derive:
+            variants, derived = plan_derivations(self.target.matrix, variants)
+        futures = []
+        for variant in variants:
+            future = self.submit(scheduler, variant, best_of)
+            futures.extend(self._chain_complete(future, variant, on_complete, derived.get(variant.filename)))
+        return [variant for variant, future in futures if future.result() is None]
+
+    def _chain_complete(self, base_future, variant, on_complete=None, derivations=None):
+        """[(variante, Future)] de la base et de ses dérivées, résolus une fois la dérivation
+        et tous les `on_complete` exécutés, dans le worker qui termine la base"""
+        if on_complete is None and not derivations:
+            return [(variant, base_future)]
+        futures = [(variant, Future())] + [(derivation.variant, Future()) for derivation in derivations or []]
+
+        def on_base_done(f):
+            results = [(variant, f.result())]
+            try:
+                # Dérivation avant on_complete : un post-traitement pourrait remplacer la base
+                if derivations:
+                    results += self.derive(results[0][1], derivations)
+                if on_complete is not None:
+                    for done, path in results:
+                        on_complete(done, path)
+            finally:
+                paths = {done.filename: path for done, path in results}
+                for done, future in futures:
+                    future.set_result(paths.get(done.filename))
+
+        base_future.add_done_callback(on_base_done)
+        return futures
+
+
+def select_variants(target, groups=None, names=None, where=None):
+    """Variantes d'une cible filtrées par groupe, par axe ({axe: [clés]}) et/ou
+    par nom de fichier (sans extension). Seules les cellules demandées sont développées."""
+    selected = []
+    for variant in target.matrix.variants(groups, where):
+        if names and os.path.splitext(variant.filename)[0] not in names:
+            continue
+        selected.append(variant)
+    return selected
@@ -0,0 +1,74 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_RUN_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "runs")
+
+# Un événement : messages de log (kind="log") ou faits structurés (job_done, retry...)
+Event = namedtuple("Event", ["time", "kind", "message", "data"])
+
+
+def run_log_path(target_name, directory=DEFAULT_RUN_LOG_DIR):
+    """Chemin d'un nouveau journal de session : <dossier>/<date>-<cible>.jsonl"""
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{target_name}.jsonl")
+
+
+class EventBus:
+    """Bus d'événements utilisable depuis n'importe quel thread.
+
+    `emit` ne touche jamais l'interface : les événements portant un message
+    sont mis en file et l'app Tk les vide par lots depuis sa boucle
+    (`drain`, sur un timer). Sans interface, `echo` (ex: print) reçoit
+    directement les messages. Chaque événement est aussi ajouté, en JSON,
+    au journal de session `run_log` s'il est fourni.
+    """
+
+    def __init__(self, run_log=None, echo=None):
+        self.echo = echo
+        self.run_log = run_log
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._file_lock = threading.Lock()
+        if run_log:
+            os.makedirs(os.path.dirname(os.path.abspath(run_log)), exist_ok=True)
+            self._file = open(run_log, "a", encoding="utf-8", buffering=1)
+
+    def emit(self, kind, message=None, **data):
+        event = Event(time.time(), kind, message, data)
+        if message is not None:
+            if self.echo is not None:
+                self.echo(message)
+            else:
+                self._queue.put(event)
+        if self._file is not None:
+            record = {"time": round(event.time, 6), "kind": kind, "thread": threading.current_thread().name}
+            if message is not None:
+                record["message"] = message
+            record.update(data)
+            line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            with self._file_lock:
+                if self._file is not None:
+                    self._file.write(line)
+
+    def log(self, message):
+        """Remplace `print`/`self.log` : sûr depuis les workers"""
+        self.emit("log", str(message))
+
+    def drain(self, limit=500):
+        """Retire jusqu'à `limit` événements en attente (thread de l'interface)"""
+        events = []
+        while len(events) < limit:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def close(self):
+        with self._file_lock:
+            f, self._file = self._file, None
+        if f is not None:
+            f.close()
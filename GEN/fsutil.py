@@ -0,0 +1,22 @@
+"""Écriture atomique des fichiers produits (images, cache, manifestes, catalogue).
+
+Le contenu est écrit dans un fichier temporaire du même dossier, puis
+renommé par-dessus la cible (`os.replace`) : un lecteur concurrent ou une
+interruption ne voient jamais de fichier à moitié écrit.
+"""
+import os
+import tempfile
+
+
+def write_atomic(path, data):
+    """Écrit `data` (octets, ou texte encodé en UTF-8) dans `path`, dont le dossier doit exister"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,165 @@
+"""Galerie des images déjà générées, pour comparer les variantes sans ouvrir le Finder.
+
+Grille virtuelle sur un Canvas : seules les lignes visibles (plus une de
+marge) ont des éléments dessinés et une PhotoImage ; les autres n'existent
+que comme positions dans la zone de défilement. Les miniatures viennent de
+thumbnails.ThumbnailLoader (pool en arrière-plan, LRU mémoire, cache
+disque) et sont posées au fil de l'eau par un timer Tk.
+"""
+import os
+import tkinter as tk
+
+import customtkinter as ctk
+from PIL import ImageTk
+
+from .thumbnails import THUMBNAIL_SIZE, ThumbnailLoader, list_images
+
+DRAIN_INTERVAL_MS = 50
+CELL_PADDING = 8
+LABEL_HEIGHT = 18
+BACKGROUND = "#1a1a1a"
+PLACEHOLDER = "#2b2b2b"
+
+
+class GalleryWindow(ctk.CTkToplevel):
+    """Fenêtre galerie d'un dossier de sortie ; `on_select(chemin)` au clic sur une miniature"""
+
+    def __init__(self, master, directory, order=(), on_select=None, loader=None):
+        super().__init__(master)
+        self.directory = directory
+        self.order = order
+        self.on_select = on_select
+        self.loader = loader or ThumbnailLoader()
+        self._own_loader = loader is None
+        self.paths = []
+        self.cells = {}  # index -> (ids du Canvas, PhotoImage ou None)
+        self.cell_w = THUMBNAIL_SIZE + CELL_PADDING * 2
+        self.cell_h = THUMBNAIL_SIZE + LABEL_HEIGHT + CELL_PADDING * 2
+        self.columns = 1
+
+        self.title(f"Galerie - {os.path.basename(directory)}")
+        self.geometry("900x700")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.grid(row=0, column=0, columnspan=2, sticky="ew", padx=10, pady=(10, 5))
+        self.info = ctk.CTkLabel(bar, text="", anchor="w")
+        self.info.pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(bar, text="Rafraîchir", width=100, command=self.reload).pack(side="right")
+
+        self.canvas = tk.Canvas(self, bg=BACKGROUND, highlightthickness=0)
+        self.canvas.grid(row=1, column=0, sticky="nsew", padx=(10, 0), pady=(0, 10))
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.grid(row=1, column=1, sticky="ns", padx=(0, 10), pady=(0, 10))
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+
+        self.canvas.bind("<Configure>", lambda e: self.layout())
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 1, "units"))
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.reload()
+        self.drain()
+
+    def reload(self):
+        """Relit le dossier (les images régénérées ont une nouvelle empreinte, donc une nouvelle miniature)"""
+        for index in list(self.cells):
+            self.remove_cell(index)
+        self.paths = list_images(self.directory, self.order)
+        self.info.configure(text=f"{len(self.paths)} image(s) dans {self.directory}")
+        self.layout()
+
+    def layout(self):
+        width = max(self.canvas.winfo_width(), self.cell_w)
+        columns = max(1, width // self.cell_w)
+        if columns != self.columns:
+            for index in list(self.cells):
+                self.remove_cell(index)
+            self.columns = columns
+        rows = -(-len(self.paths) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, width, rows * self.cell_h),
+                              yscrollincrement=self.cell_h // 4)
+        self.update_visible()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.update_visible()
+
+    def on_wheel(self, event):
+        # macOS : delta en crans ; Windows : multiples de 120
+        delta = event.delta if abs(event.delta) < 120 else event.delta // 120
+        self.yview("scroll", -delta, "units")
+
+    def visible_range(self):
+        """Indices des images dans les lignes visibles, avec une ligne de marge de chaque côté"""
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(0, int(top // self.cell_h) - 1)
+        last_row = int(bottom // self.cell_h) + 1
+        return range(first_row * self.columns, min(len(self.paths), (last_row + 1) * self.columns))
+
+    def update_visible(self):
+        visible = self.visible_range()
+        for index in list(self.cells):
+            if index not in visible:
+                self.remove_cell(index)
+        for index in visible:
+            if index not in self.cells:
+                self.add_cell(index)
+
+    def add_cell(self, index):
+        path = self.paths[index]
+        x = (index % self.columns) * self.cell_w + CELL_PADDING
+        y = (index // self.columns) * self.cell_h + CELL_PADDING
+        ids = [
+            self.canvas.create_rectangle(x, y, x + THUMBNAIL_SIZE, y + THUMBNAIL_SIZE, fill=PLACEHOLDER, width=0),
+            self.canvas.create_text(x + THUMBNAIL_SIZE // 2, y + THUMBNAIL_SIZE + LABEL_HEIGHT // 2,
+                                    text=os.path.splitext(os.path.basename(path))[0], fill="#cccccc",
+                                    font=("Helvetica", 10), width=THUMBNAIL_SIZE),
+        ]
+        for item in ids:
+            self.canvas.tag_bind(item, "<Button-1>", lambda e, p=path: self.select(p))
+        self.cells[index] = (ids, None)
+        image = self.loader.cached(path)
+        if image is not None:
+            self.show_thumbnail(index, image)
+        else:
+            self.loader.request(path)
+
+    def remove_cell(self, index):
+        ids, _ = self.cells.pop(index)
+        for item in ids:
+            self.canvas.delete(item)
+        self.loader.cancel(self.paths[index])
+
+    def show_thumbnail(self, index, image):
+        ids, _ = self.cells[index]
+        x = (index % self.columns) * self.cell_w + CELL_PADDING + THUMBNAIL_SIZE // 2
+        y = (index // self.columns) * self.cell_h + CELL_PADDING + THUMBNAIL_SIZE // 2
+        # PhotoImage créée ici, sur le thread Tk, et seulement pour une cellule visible
+        photo = ImageTk.PhotoImage(image)
+        item = self.canvas.create_image(x, y, image=photo)
+        self.canvas.tag_bind(item, "<Button-1>", lambda e, p=self.paths[index]: self.select(p))
+        self.cells[index] = (ids + [item], photo)
+
+    def drain(self):
+        ready = self.loader.drain()
+        if ready:
+            positions = {path: index for index, path in enumerate(self.paths)}
+            for thumbnail in ready:
+                index = positions.get(thumbnail.path)
+                if index in self.cells and thumbnail.image is not None and self.cells[index][1] is None:
+                    self.show_thumbnail(index, thumbnail.image)
+        self._drain_job = self.after(DRAIN_INTERVAL_MS, self.drain)
+
+    def select(self, path):
+        if self.on_select is not None:
+            self.on_select(path)
+
+    def close(self):
+        self.after_cancel(self._drain_job)
+        if self._own_loader:
+            self.loader.shutdown()
+        self.destroy()
@@ -0,0 +1,309 @@
+"""Génération headless des arrière-plans de widgets.
+
+Exemples :
+    python -m GEN.generate incity --all --reference incity.png
+    python -m GEN.generate lyon --group A --group F --reference lyon.png
+    python -m GEN.generate incity --only incity_night_cyan --reference incity.png
+    python -m GEN.generate lyon --where season=winter --where time=night --reference lyon.png
+    python -m GEN.generate lyon --all --reference lyon.png --trace lyon.trace.json
+    python -m GEN.generate incity --only incity_fete_lumieres_night --best-of 4 --reference incity.png
+    python -m GEN.generate incity --group night --group fullmoon --derive-led --reference incity.png
+    python -m GEN.generate lyon --list
+    python -m GEN.generate lyon --plan --reference lyon.png
+    python -m GEN.generate lyon --all --changed --reference lyon.png
+    python -m GEN.generate incity --required --changed --export-xcassets --reference incity.png
+    python -m GEN.generate lyon --all --batch --postprocess --reference lyon.png
+    python -m GEN.generate lyon --batch-resume batches/abc123 --reference lyon.png
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from .async_engine import AsyncGenerationEngine
+from .batch import POLL_INTERVAL, BatchRunner
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResultCache
+from .engine import TARGETS, GenerationEngine, select_variants
+from .manifest import MANIFEST_NAME, TO_BUILD
+from .events import DEFAULT_RUN_LOG_DIR, EventBus, run_log_path
+from .postprocess import PostProcessor
+from .profiles import IMAGE_SIZES
+from .variants import parse_where, plan_derivations
+from .scheduler import DEFAULT_MAX_IN_FLIGHT, GenerationScheduler
+from .swift_assets import present_names, produced_names, required_assets
+from .trace import Tracer
+from .xcassets import DEFAULT_CATALOG, CatalogExporter, find_sources
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m GEN.generate", description="Génère les images des widgets EcoLyon sans interface.")
+    parser.add_argument("target", choices=sorted(TARGETS), help="widget à générer")
+    parser.add_argument("--reference", help="image de référence (incity.png, lyon.png...)")
+    parser.add_argument("--upload-reference", action="store_true",
+                        help="envoie la référence une seule fois via la Files API (API Gemini, pas Vertex)")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY"),
+                        help="clé API Google (défaut: $GEMINI_API_KEY ou $GOOGLE_API_KEY)")
+    parser.add_argument("--output", help="dossier de sortie (défaut: ./output_incity ou ./output_lyon_gemini3)")
+    parser.add_argument("--all", action="store_true", help="génère toutes les variantes")
+    parser.add_argument("--group", action="append", help="génère un groupe (day, night, A, F...), répétable")
+    parser.add_argument("--only", action="append", help="génère une variante par nom (ex: incity_night_cyan), répétable")
+    parser.add_argument("--where", action="append", metavar="AXE=CLÉS",
+                        help="restreint un axe de la matrice (ex: season=winter,autumn), répétable")
+    parser.add_argument("--required", action="store_true",
+                        help="sélectionne les images exigées par les sources Swift du widget (cf. swift_assets.py)")
+    parser.add_argument("--list", action="store_true", help="liste les variantes et quitte")
+    parser.add_argument("--plan", action="store_true",
+                        help="compare la sélection (défaut: tout) au manifeste du dossier de sortie et quitte")
+    parser.add_argument("--changed", action="store_true",
+                        help="ne génère que les images manquantes, périmées ou corrompues d'après le manifeste")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help=f"nombre maximum d'appels API simultanés (défaut: {DEFAULT_MAX_IN_FLIGHT})")
+    parser.add_argument("--rpm", type=float, help="limite de requêtes par minute (quota API)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="utilise le moteur asyncio (client.aio) au lieu des threads")
+    parser.add_argument("--batch", action="store_true",
+                        help="soumet toute la sélection en un travail Batch API (différé, moitié prix)")
+    parser.add_argument("--batch-mode", choices=("auto", "inline", "file"), default="auto",
+                        help="requêtes inline ou fichier JSONL via la Files API (défaut: selon la taille)")
+    parser.add_argument("--batch-poll", type=float, default=POLL_INTERVAL, metavar="SECONDES",
+                        help=f"intervalle de suivi du travail batch (défaut: {POLL_INTERVAL:.0f})")
+    parser.add_argument("--batch-resume", metavar="NOM",
+                        help="reprend le suivi d'un travail batch déjà soumis (ex: batches/abc123)")
+    parser.add_argument("--image-size", choices=IMAGE_SIZES,
+                        help="taille demandée au modèle (défaut: la moins chère qui couvre le profil)")
+    parser.add_argument("--downscale", action="store_true",
+                        help="réduit localement chaque image à la taille finale du widget")
+    parser.add_argument("--postprocess", action="store_true",
+                        help="redimensionne et ré-encode chaque image au format/budget du profil (pool de processus)")
+    parser.add_argument("--workers", type=int, help="processus de post-traitement (défaut: nombre de CPU)")
+    parser.add_argument("--export-xcassets", nargs="?", const=DEFAULT_CATALOG, metavar="CATALOG",
+                        help="exporte les images en imagesets @1x/@2x/@3x (défaut: EcoLyonWidget/Assets.xcassets)")
+    parser.add_argument("--best-of", type=int, default=1, metavar="N",
+                        help="lance N candidats par variante et garde le mieux noté (fidélité + couleur)")
+    parser.add_argument("--derive-led", action="store_true",
+                        help="une image par série de LED (nuit, pleine lune), les autres couleurs dérivées localement")
+    parser.add_argument("--drift-threshold", type=float,
+                        help="seuil de dérive géométrique au-delà duquel une image est redemandée "
+                             "(défaut: matrice ; 0 : aucune dérive tolérée)")
+    parser.add_argument("--no-geometry-gate", action="store_true", help="désactive le contrôle de dérive géométrique")
+    parser.add_argument("--force", action="store_true", help="régénère même si le résultat est en cache")
+    parser.add_argument("--no-cache", action="store_true", help="désactive le cache de résultats")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="dossier du cache de résultats")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="taille maximale du cache en Mo (éviction LRU)")
+    parser.add_argument("--run-log", metavar="FICHIER",
+                        help=f"journal JSONL des événements de la session (défaut: {DEFAULT_RUN_LOG_DIR}/<date>-<cible>.jsonl)")
+    parser.add_argument("--trace", metavar="FICHIER",
+                        help="écrit la trace des étapes (chrome://tracing, ui.perfetto.dev)")
+    return parser.parse_args(argv)
+
+
+def progress_printer(total, postprocessor=None):
+    """Callback de fin de génération : affiche l'avancement et enchaîne le post-traitement"""
+    done = []
+    post_futures = []
+
+    def on_complete(variant, path):
+        done.append(variant)
+        status = "ok" if path else "échec"
+        print(f"[{len(done)}/{total}] {variant.filename} : {status}")
+        if path and postprocessor is not None:
+            post_futures.append(postprocessor.submit(path))
+
+    return on_complete, post_futures
+
+
+async def run_async(engine, variants, concurrency, on_complete, best_of=1, derive=False):
+    async_engine = AsyncGenerationEngine(engine, max_in_flight=concurrency)
+    try:
+        return await async_engine.run(variants, on_complete=on_complete, best_of=best_of, derive=derive)
+    finally:
+        await async_engine.aclose()
+
+
+def show_plan(args, target):
+    """Affiche, pour chaque variante sélectionnée, son état d'après le manifeste"""
+    variants = select_variants(target, groups=args.group, names=args.only, where=parse_where(args.where))
+    engine = GenerationEngine(target, args.api_key, output_dir=args.output, image_size=args.image_size,
+                              log=lambda message: None)
+    if args.reference:
+        engine.load_reference(args.reference)
+    else:
+        print("Sans --reference, les changements de référence ne sont pas détectés.", file=sys.stderr)
+    items = engine.plan(variants)
+    for item in items:
+        print(f"{item.status:9} {item.variant.filename:36} {item.reason or ''}".rstrip())
+    counts = {}
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    to_build = sum(counts.get(status, 0) for status in TO_BUILD)
+    print(f"{to_build} image(s) à générer sur {len(items)} ({os.path.join(engine.output_dir, MANIFEST_NAME)}) : "
+          + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return 0
+
+
+def check_required(target):
+    """Noms exigés par le widget ; None (après un message) si la matrice ne les produit pas tous"""
+    result = required_assets(target)
+    if result is None:
+        print(f"Aucune source Swift configurée pour {target.name} (swift_assets).", file=sys.stderr)
+        return None
+    not_generated = sorted(result.names - produced_names(target))
+    for name in not_generated:
+        print(f"ERREUR {name} : exigé par le widget, aucune variante de la matrice ne le produit", file=sys.stderr)
+    return None if not_generated else result.names
+
+
+def load_batch_variants(target, args):
+    """Variantes d'un travail batch soumis lors d'une session précédente, dérivées comprises,
+    et nombre de requêtes du travail"""
+    engine = GenerationEngine(target, args.api_key, output_dir=args.output, log=lambda message: None)
+    state = BatchRunner(engine).load_state(args.batch_resume)
+    names = set(state["jobs"]).union(*state.get("derived", {}).values())
+    return [variant for variant in target.matrix.variants() if variant.filename in names], len(state["jobs"])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    target = TARGETS[args.target]
+
+    required = None
+    if args.required or args.export_xcassets:
+        required = check_required(target)
+        if required is None:
+            return 2
+    if args.required:
+        args.only = (args.only or []) + sorted(required)
+
+    if args.list:
+        for variant in select_variants(target, groups=args.group, names=args.only, where=parse_where(args.where)):
+            cell = " ".join(f"{axis}={key}" for axis, key in variant.cell.items())
+            print(f"{variant.group:14} {variant.filename:36} {cell}")
+        return 0
+
+    if args.plan:
+        return show_plan(args, target)
+
+    if args.batch_resume:
+        # La sélection, la dérivation et le tri des images à refaire ont été faits à la soumission :
+        # les dérivations prévues sont relues de l'état du travail (cf. BatchRunner.resume)
+        args.batch = True
+        args.changed = args.derive_led = False
+    elif not (args.all or args.group or args.only or args.where):
+        print("Rien à générer : précisez --all, --required, --group, --where ou --only.", file=sys.stderr)
+        return 2
+    if not args.reference:
+        print("Image de référence manquante (--reference).", file=sys.stderr)
+        return 2
+    if not args.api_key:
+        print("Clé API manquante (--api-key ou $GEMINI_API_KEY).", file=sys.stderr)
+        return 2
+
+    variants = select_variants(target, groups=args.group, names=args.only, where=parse_where(args.where))
+    requests = len(variants)
+    if args.batch_resume:
+        # La sélection est celle du travail soumis, relue depuis son état
+        try:
+            variants, requests = load_batch_variants(target, args)
+        except FileNotFoundError:
+            print(f"Aucun travail batch {args.batch_resume} en attente.", file=sys.stderr)
+            return 2
+    if not variants:
+        print("Aucune variante ne correspond à la sélection.", file=sys.stderr)
+        return 2
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    events = EventBus(run_log=args.run_log or run_log_path(target.name), echo=print)
+    tracer = Tracer()
+    engine = GenerationEngine(target, args.api_key, output_dir=args.output, cache=cache, force=args.force,
+                              image_size=args.image_size, downscale=args.downscale,
+                              upload_reference=args.upload_reference, log=events.log, events=events,
+                              tracer=tracer, geometry_threshold=args.drift_threshold,
+                              geometry_gate=not args.no_geometry_gate)
+    engine.load_reference(args.reference)
+    if args.changed:
+        variants = [item.variant for item in engine.plan(variants) if item.status in TO_BUILD]
+        if not variants:
+            print(f"Tout est à jour dans {engine.output_dir}.")
+            engine.close()
+            events.close()
+            return 0
+        requests = len(variants)
+    if args.derive_led:
+        # Les bases manquantes sont ajoutées : le total peut dépasser la sélection
+        to_generate, derived = plan_derivations(target.matrix, variants)
+        requests = len(to_generate)
+        variants = to_generate + [d.variant for batch in derived.values() for d in batch]
+
+    scheduler = GenerationScheduler(max_in_flight=args.concurrency, requests_per_minute=args.rpm)
+
+    profile = target.profile
+    print(f"Génération {target.name} : {len(variants)} image(s) -> {engine.output_dir} "
+          f"({engine.image_size} -> {profile.width}x{profile.height}, {args.concurrency} en parallèle)")
+    if requests != len(variants):
+        print(f"  {requests} appel(s) API, {len(variants) - requests} image(s) dérivée(s) localement")
+    postprocessor = PostProcessor(target.profile, max_workers=args.workers) if args.postprocess else None
+    on_complete, post_futures = progress_printer(len(variants), postprocessor)
+    events.emit("run_start", target=target.name, variants=len(variants), concurrency=args.concurrency,
+                engine="batch" if args.batch else "async" if args.use_async else "threads",
+                image_size=engine.image_size)
+    failed = variants
+    post_errors = 0
+    try:
+        if args.batch:
+            runner = BatchRunner(engine, mode=args.batch_mode, poll_interval=args.batch_poll)
+            if args.batch_resume:
+                failed = runner.resume(args.batch_resume, on_complete, scheduler)
+            else:
+                failed = runner.run(variants, on_complete, scheduler, derive=args.derive_led)
+        elif args.use_async:
+            failed = asyncio.run(run_async(engine, variants, args.concurrency, on_complete, args.best_of,
+                                           args.derive_led))
+        else:
+            failed = engine.run(variants, scheduler, on_complete=on_complete, best_of=args.best_of,
+                                derive=args.derive_led)
+        for future in post_futures:
+            # Un encodage raté n'empêche pas d'enregistrer les autres
+            try:
+                with tracer.span("postprocess", "post-traitement"):
+                    processed = future.result()
+            except Exception as e:
+                print(f"  ERREUR post-traitement : {e}", file=sys.stderr)
+                post_errors += 1
+                continue
+            engine.manifest.update_output(os.path.basename(processed.source), processed.path)
+            print(f"  {os.path.basename(processed.path)} : {processed.size // 1024} Ko"
+                  + (f" (qualité {processed.quality})" if processed.quality else ""))
+    finally:
+        engine.close()
+        if postprocessor is not None:
+            postprocessor.shutdown()
+        print(tracer.summary(images=len(variants) - len(failed)))
+        events.emit("run_end", total=len(variants), failed=[v.filename for v in failed],
+                    stages=[stats._asdict() for stats in tracer.stage_stats()])
+        events.close()
+        if args.trace:
+            print(f"Trace : {tracer.export_chrome(args.trace)}")
+
+    if args.export_xcassets:
+        exporter = CatalogExporter(target.profile, args.export_xcassets, max_workers=args.workers)
+        results = exporter.export(find_sources(engine.output_dir, variants))
+        written = sum(1 for r in results if not r.skipped)
+        print(f"Export Xcode : {written} imageset(s) écrit(s), {len(results) - written} à jour.")
+        # Garde-fou avant une release : tout ce que le widget demande doit être dans le catalogue
+        absent = sorted(required - present_names(args.export_xcassets))
+        for name in absent:
+            print(f"  ERREUR {name} : exigé par le widget, absent de {args.export_xcassets}", file=sys.stderr)
+        if absent:
+            return 1
+
+    print(f"Terminé : {len(variants) - len(failed)}/{len(variants)} image(s) générée(s).")
+    for variant in failed:
+        print(f"  échec : {variant.filename}", file=sys.stderr)
+    if post_errors:
+        print(f"  {post_errors} post-traitement(s) en échec", file=sys.stderr)
+    return 1 if failed or post_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,24 @@
 import customtkinter as ctk
-from tkinter import filedialog, messagebox
 from PIL import Image
+from tkinter import filedialog, messagebox
 import os
+import sys
 import threading
-from google import genai
-from google.genai import types
+
+# Permet de lancer le script directement (python incity_generator.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GEN.engine import INCITY, GenerationEngine, select_variants
+from GEN.variants import plan_derivations
+from GEN.async_engine import AsyncGenerationEngine
+from GEN.cache import ResultCache
+from GEN.events import EventBus, run_log_path
+from GEN.postprocess import PostProcessor
+from GEN.scheduler import DEFAULT_MAX_IN_FLIGHT, GenerationScheduler
+from GEN.sections import OPEN_SECTIONS, LazySection, build_progressively
+from GEN.trace import Tracer
 
 # --- CONFIGURATION ---
+LOG_INTERVAL_MS = 100
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
@@ -19,6 +31,23 @@ class IncityGeneratorApp(ctk.CTk):
 
         self.reference_image_path = None
         self.pil_image = None
+        # Les workers publient sur le bus ; la boucle Tk vide la file par lots
+        self.events = EventBus(run_log=run_log_path(INCITY.name))
+        # Mesures par étape (cf. trace.py), résumées dans le journal chaque fois que la file se vide
+        self.tracer = Tracer()
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+        self.engine = GenerationEngine(INCITY, api_key=None, log=self.log, cache=ResultCache(), events=self.events,
+                                       tracer=self.tracer)
+        self.scheduler = GenerationScheduler(max_in_flight=DEFAULT_MAX_IN_FLIGHT)
+        self.async_engine = AsyncGenerationEngine(self.engine, max_in_flight=DEFAULT_MAX_IN_FLIGHT)
+        self.use_async = False
+        self.best_of = 1
+        self.derive_led = False
+        self.postprocessor = None
+        # Galerie des sorties : le chargeur de miniatures (et son LRU) survit à la fenêtre
+        self.gallery = None
+        self.thumbnails = None
 
         # --- LAYOUT ---
         self.grid_columnconfigure(1, weight=1)
@@ -52,6 +81,9 @@ class IncityGeneratorApp(ctk.CTk):
             hover_color="#1D4ED8"
         )
         self.load_btn.pack(pady=10, padx=15, fill="x")
+        self.gallery_btn = ctk.CTkButton(self.sidebar, text="Galerie des images générées", command=self.open_gallery,
+                                         fg_color="transparent", border_width=1)
+        self.gallery_btn.pack(pady=(0, 5), padx=15, fill="x")
 
         self.img_preview = ctk.CTkLabel(
             self.sidebar,
@@ -69,7 +101,70 @@ class IncityGeneratorApp(ctk.CTk):
         ctk.CTkLabel(self.settings_frame, text="Paramètres", font=ctk.CTkFont(weight="bold")).pack(pady=5)
         ctk.CTkLabel(self.settings_frame, text="Modèle: gemini-3-pro-image-preview").pack(pady=2)
         ctk.CTkLabel(self.settings_frame, text="Format: 1:1 (carré)").pack(pady=2)
-        ctk.CTkLabel(self.settings_frame, text="Résolution: 2K").pack(pady=2)
+        profile = self.engine.target.profile
+        ctk.CTkLabel(self.settings_frame, text=f"Résolution: {self.engine.image_size} -> {profile.width}x{profile.height}").pack(pady=2)
+
+        # Parallélisme : nombre maximum d'appels API simultanés
+        ctk.CTkLabel(self.settings_frame, text="Appels simultanés:").pack(pady=(8, 2))
+        self.concurrency_menu = ctk.CTkSegmentedButton(
+            self.settings_frame,
+            values=["1", "2", "4", "8"],
+            command=self.set_concurrency
+        )
+        self.concurrency_menu.set(str(DEFAULT_MAX_IN_FLIGHT))
+        self.concurrency_menu.pack(pady=(0, 8))
+
+        # Best-of-N : N candidats par image, le plus fidèle est gardé
+        ctk.CTkLabel(self.settings_frame, text="Candidats par image:").pack(pady=(0, 2))
+        self.best_of_menu = ctk.CTkSegmentedButton(
+            self.settings_frame,
+            values=["1", "2", "3", "4"],
+            command=self.set_best_of
+        )
+        self.best_of_menu.set("1")
+        self.best_of_menu.pack(pady=(0, 8))
+
+        # Moteur : un thread par appel en vol, ou une seule boucle asyncio
+        ctk.CTkLabel(self.settings_frame, text="Moteur:").pack(pady=(0, 2))
+        self.engine_menu = ctk.CTkSegmentedButton(
+            self.settings_frame,
+            values=["Threads", "Asyncio"],
+            command=self.set_engine_mode
+        )
+        self.engine_menu.set("Threads")
+        self.engine_menu.pack(pady=(0, 8))
+
+        # Cache : les variantes inchangées sont relues depuis le disque
+        self.force_check = ctk.CTkCheckBox(
+            self.settings_frame,
+            text="Forcer (ignorer le cache)",
+            command=self.toggle_force
+        )
+        self.force_check.pack(pady=(0, 8))
+
+        # Réduction locale à la taille réellement affichée par le widget
+        self.downscale_check = ctk.CTkCheckBox(
+            self.settings_frame,
+            text=f"Réduire à {profile.width}x{profile.height}",
+            command=self.toggle_downscale
+        )
+        self.downscale_check.pack(pady=(0, 8))
+
+        # Post-traitement : redimensionnement + encodage au budget du widget
+        self.postprocess_check = ctk.CTkCheckBox(
+            self.settings_frame,
+            text=f"Post-traitement ({profile.format}, {profile.max_bytes // 1024} Ko max)",
+            command=self.toggle_postprocess
+        )
+        self.postprocess_check.pack(pady=(0, 8))
+
+        # Séries LED (nuit, pleine lune) : 1 appel API, 4 couleurs dérivées localement
+        self.derive_check = ctk.CTkCheckBox(
+            self.settings_frame,
+            text="Couleurs LED dérivées localement",
+            command=self.toggle_derive
+        )
+        self.derive_check.pack(pady=(0, 8))
 
         # Console
         ctk.CTkLabel(self.sidebar, text="Logs:", anchor="w").pack(fill="x", padx=15, side="bottom", pady=(0,5))
@@ -81,12 +176,114 @@ class IncityGeneratorApp(ctk.CTk):
         self.main_panel.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
 
         self.create_buttons()
+        self.drain_logs()
         self.log("Système prêt.")
         self.log("Charger incity.png comme référence.")
 
     def log(self, message):
-        self.log_box.insert("end", f"> {message}\n")
-        self.log_box.see("end")
+        # Appelable depuis n'importe quel thread : rien ne touche Tk ici
+        self.events.log(message)
+
+    def drain_logs(self):
+        events = self.events.drain()
+        lines = "".join(f"> {event.message}\n" for event in events)
+        if lines:
+            self.log_box.insert("end", lines)
+            self.log_box.see("end")
+        self.after(LOG_INTERVAL_MS, self.drain_logs)
+
+    def set_concurrency(self, value):
+        self.scheduler.set_max_in_flight(int(value))
+        self.async_engine.set_max_in_flight(int(value))
+        self.log(f"Appels simultanés : {value}")
+
+    def set_best_of(self, value):
+        self.best_of = int(value)
+        self.log(f"Candidats par image : {value}")
+
+    def set_engine_mode(self, value):
+        self.use_async = value == "Asyncio"
+        self.log(f"Moteur : {value}")
+
+    def enqueue(self, filename, prompt_details, cue_color=None, derivations=None):
+        """Place une génération dans la file du moteur choisi.
+
+        `derivations` : couleurs à décliner localement une fois cette base prête.
+        """
+        # La base et chacune de ses dérivées passent par on_generation_done
+        self.track(1 + len(derivations or []))
+        on_complete = self.on_generation_done
+        if derivations:
+            on_complete = lambda name, path: self.on_base_done(name, path, derivations)
+        if self.use_async:
+            self.async_engine.submit(filename, prompt_details, on_complete=on_complete,
+                                     best_of=self.best_of, cue_color=cue_color)
+            return
+        if self.best_of > 1:
+            future = self.engine.submit_best_of(self.scheduler, filename, prompt_details, self.best_of, cue_color)
+        else:
+            future = self.scheduler.submit(self.engine.generate, filename, prompt_details)
+        future.add_done_callback(lambda f: on_complete(filename, f.result()))
+
+    def on_generation_done(self, filename, path):
+        # Appelé depuis un worker ou la boucle asyncio : self.log passe par le bus
+        if path is None:
+            self.log(f"Échec : {filename}")
+        elif self.postprocessor is not None:
+            try:
+                future = self.postprocessor.submit(path)
+            except RuntimeError:
+                # Post-traitement décoché pendant la génération
+                self.log(f"Post-traitement ignoré : {filename}")
+            else:
+                future.add_done_callback(self.on_postprocess_done)
+        self.track(-1)
+
+    def track(self, count):
+        """Sorties attendues (+) ou reçues (-) ; file vidée : résumé des mesures dans le journal"""
+        with self.pending_lock:
+            self.pending += count
+            if self.pending == 0:
+                # Sous le verrou : une génération lancée entre-temps n'est pas effacée du tracer
+                self.log(f"File vidée, mesures par étape :\n{self.tracer.summary()}")
+                self.tracer.clear()
+
+    def on_base_done(self, filename, path, derivations):
+        # Thread dédié : ni un worker du scheduler ni la boucle asyncio ne restent bloqués.
+        # La base n'est post-traitée qu'après la dérivation (le post-traitement peut la remplacer).
+        def derive():
+            results = self.engine.derive(path, derivations)
+            self.on_generation_done(filename, path)
+            for variant, derived_path in results:
+                self.on_generation_done(variant.filename, derived_path)
+
+        threading.Thread(target=derive, daemon=True).start()
+
+    def on_postprocess_done(self, future):
+        try:
+            processed = future.result()
+        except Exception as e:
+            self.log(f"ERREUR post-traitement: {e}")
+            return
+        self.engine.manifest.update_output(os.path.basename(processed.source), processed.path)
+        self.log(f"Post: {os.path.basename(processed.path)} ({processed.size // 1024} Ko)")
+
+    def toggle_postprocess(self):
+        if self.postprocess_check.get():
+            self.postprocessor = PostProcessor(self.engine.target.profile)
+        else:
+            if self.postprocessor is not None:
+                self.postprocessor.shutdown()
+            self.postprocessor = None
+
+    def toggle_derive(self):
+        self.derive_led = bool(self.derive_check.get())
+
+    def toggle_force(self):
+        self.engine.force = bool(self.force_check.get())
+
+    def toggle_downscale(self):
+        self.engine.downscale = bool(self.downscale_check.get())
 
     def load_image(self):
         try:
@@ -97,7 +294,7 @@ class IncityGeneratorApp(ctk.CTk):
             if not file_path: return
 
             self.reference_image_path = file_path
-            self.pil_image = Image.open(file_path).convert('RGB')
+            self.pil_image = self.engine.load_reference(file_path)
 
             # Preview carré
             preview_img = ctk.CTkImage(
@@ -111,105 +308,71 @@ class IncityGeneratorApp(ctk.CTk):
         except Exception as e:
             self.log(f"ERREUR CHARGEMENT: {e}")
 
-    def generate_task(self, filename, prompt_details):
-        """Génération en arrière-plan"""
-        api_key = self.api_entry.get().strip()
-
-        try:
-            client = genai.Client(api_key=api_key)
-        except Exception as e:
-            self.log(f"Erreur Client: {e}")
+    def open_gallery(self):
+        """Miniatures des images du dossier de sortie, dans l'ordre de la matrice"""
+        if self.gallery is not None and self.gallery.winfo_exists():
+            self.gallery.reload()
+            self.gallery.focus()
             return
-
-        # PROMPT DE BASE - Préserve la structure de la tour Incity
-        base_prompt = (
-            "Using the provided image of the Incity tower in Lyon, modify ONLY the atmosphere and lighting. "
-            f"{prompt_details}. "
-            "CRITICAL: Keep the EXACT same tower geometry, proportions, camera angle, and claymorphism 3D style. "
-            "The tower structure, windows pattern, and architectural details must remain IDENTICAL. "
-            "Only change: sky color, lighting direction, weather effects, and LED colors on the tower facade."
-        )
-
-        self.log(f"Génération: {filename}...")
-
-        output_dir = os.path.join(os.getcwd(), "output_incity")
-        os.makedirs(output_dir, exist_ok=True)
-        final_path = os.path.join(output_dir, filename)
-
+        # Galerie et miniatures ne sont importées qu'à la première ouverture
+        from GEN.gallery import GalleryWindow
+        from GEN.thumbnails import ThumbnailLoader
+
+        if self.thumbnails is None:
+            self.thumbnails = ThumbnailLoader()
+        order = [os.path.splitext(variant.filename)[0] for variant in INCITY.matrix.variants()]
+        self.gallery = GalleryWindow(self, self.engine.output_dir, order, on_select=self.show_output,
+                                     loader=self.thumbnails)
+
+    def show_output(self, path):
+        # Clic dans la galerie : l'image générée remplace l'aperçu de la barre latérale
         try:
-            response = client.models.generate_content(
-                model="gemini-3-pro-image-preview",
-                contents=[base_prompt, self.pil_image],
-                config=types.GenerateContentConfig(
-                    response_modalities=['IMAGE'],
-                    image_config=types.ImageConfig(
-                        aspect_ratio="1:1",  # FORMAT CARRÉ
-                        image_size="2K"
-                    )
-                )
-            )
+            with Image.open(path) as img:
+                image = img.convert("RGB")
+        except OSError as e:
+            self.log(f"ERREUR LECTURE: {e}")
+            return
+        preview_img = ctk.CTkImage(light_image=image, dark_image=image, size=(200, 200))
+        self.img_preview.configure(image=preview_img, text="")
+        self.log(f"Sortie : {os.path.basename(path)}")
 
-            image_saved = False
-
-            if response.parts:
-                for part in response.parts:
-                    if part.inline_data:
-                        img_bytes = part.inline_data.data
-
-                        try:
-                            if hasattr(part, "as_image"):
-                                img = part.as_image()
-                                img.save(final_path)
-                                image_saved = True
-                                break
-                        except:
-                            pass
-
-                        if not image_saved:
-                            import base64
-                            if isinstance(img_bytes, str):
-                                img_data = base64.b64decode(img_bytes)
-                            else:
-                                img_data = img_bytes
-
-                            with open(final_path, "wb") as f:
-                                f.write(img_data)
-                            image_saved = True
-
-            if image_saved:
-                self.log(f"OK: {filename}")
-            else:
-                self.log(f"Pas d'image retournée pour {filename}")
-                print(response)
+    def trigger_generation(self, filename, prompt_add, cue_color=None):
+        if not self.check_ready():
+            return
 
-        except Exception as e:
-            self.log(f"ERREUR: {e}")
+        self.enqueue(filename, prompt_add, cue_color)
 
-    def trigger_generation(self, filename, prompt_add):
+    def check_ready(self):
         if not self.reference_image_path:
             messagebox.showerror("Erreur", "Chargez l'image d'abord !")
-            return
-        if not self.api_entry.get().strip():
+            return False
+        api_key = self.api_entry.get().strip()
+        if not api_key:
             messagebox.showerror("Erreur", "Clé API manquante !")
-            return
-
-        threading.Thread(target=self.generate_task, args=(filename, prompt_add)).start()
+            return False
+        # Lue ici, sur le thread Tk : les workers n'accèdent jamais au widget
+        self.engine.set_api_key(api_key)
+        return True
+
+    def generate_group(self, group, title):
+        """Lance toutes les variantes d'un groupe (cf. variants.py)"""
+        variants = select_variants(INCITY, groups=[group])
+        self.log(f"Génération batch {title} ({len(variants)} images)...")
+        derived = {}
+        if self.derive_led:
+            variants, derived = plan_derivations(INCITY.matrix, variants)
+        for variant in variants:
+            self.enqueue(variant.filename, variant.prompt, variant.cue, derived.get(variant.filename))
 
     # --- BUTTONS FACTORY ---
-    def add_group(self, title, color="#2563EB"):
-        lbl = ctk.CTkLabel(
-            self.main_panel,
-            text=title,
-            font=ctk.CTkFont(size=16, weight="bold"),
-            anchor="w",
-            text_color=color
-        )
-        lbl.pack(fill="x", pady=(25, 10))
-        frame = ctk.CTkFrame(self.main_panel)
-        frame.pack(fill="x", pady=5)
-        return frame
-
-    def add_btn(self, parent, text, filename, prompt_add, color=None):
+    def add_group(self, title, build, color="#2563EB"):
+        """Groupe repliable ; `build(cadre)` le remplit au premier dépliage (les premiers : dès l'ouverture)"""
+        section = LazySection(self.main_panel, title, build, color, pady=(25, 10),
+                              expanded=len(self.sections) < OPEN_SECTIONS)
+        self.sections.append(section)
+        return section
+
+    def add_btn(self, parent, text, filename, prompt_add, color=None, cue=None):
         btn_color = color if color else "#2563EB"
         btn = ctk.CTkButton(
             parent,
@@ -217,326 +380,31 @@ class IncityGeneratorApp(ctk.CTk):
             height=45,
             fg_color=btn_color,
             hover_color="#1E40AF",
-            command=lambda: self.trigger_generation(filename, prompt_add)
+            command=lambda: self.trigger_generation(filename, prompt_add, cue)
         )
         btn.pack(side="left", padx=5, pady=8, expand=True, fill="x")
 
     def create_buttons(self):
-        # ============================================
-        # A. MÉTÉO JOUR (6 images)
-        # ============================================
-        f1 = self.add_group("A. MÉTÉO JOUR (6 variations)", "#F59E0B")
-
-        # Row 1: Clear weather
-        row1 = ctk.CTkFrame(f1, fg_color="transparent")
-        row1.pack(fill="x", pady=5)
-
-        self.add_btn(
-            row1,
-            "Golden Hour",
-            "incity_clear_golden.png",
-            "Golden hour lighting, warm orange and pink sunset sky, "
-            "soft golden light reflecting on the tower glass facade, "
-            "dramatic long shadows, romantic warm atmosphere, "
-            "the tower lit by beautiful sunset colors",
-            color="#F97316"
-        )
-
-        self.add_btn(
-            row1,
-            "Jour Ensoleillé",
-            "incity_clear_day.png",
-            "Bright sunny midday, clear vivid blue sky, "
-            "strong direct sunlight, sharp shadows on the tower, "
-            "bright cheerful atmosphere, summer vibes, "
-            "the glass facade reflecting the blue sky",
-            color="#3B82F6"
-        )
-
-        # Row 2: Partly Cloudy & Cloudy
-        row2 = ctk.CTkFrame(f1, fg_color="transparent")
-        row2.pack(fill="x", pady=5)
-
-        self.add_btn(
-            row2,
-            "Partiellement Nuageux",
-            "incity_partly_cloudy_day.png",
-            "Partly cloudy sky, mix of blue sky and white fluffy clouds, "
-            "sun visible between clouds, dynamic lighting with soft shadows, "
-            "pleasant weather, some clouds drifting across the sky, "
-            "the tower with alternating sun and cloud shadows",
-            color="#60A5FA"
-        )
-
-        self.add_btn(
-            row2,
-            "Nuageux",
-            "incity_cloudy_day.png",
-            "Overcast grey sky, flat diffused lighting, "
-            "no direct shadows, soft grey clouds covering the sky, "
-            "muted colors, typical Lyon grey day atmosphere, "
-            "the tower under cloudy weather",
-            color="#6B7280"
-        )
-
-        # Row 3: Rain
-        row3 = ctk.CTkFrame(f1, fg_color="transparent")
-        row3.pack(fill="x", pady=5)
-
-        self.add_btn(
-            row3,
-            "Pluie",
-            "incity_rain_day.png",
-            "Rainy weather, dark grey stormy clouds, "
-            "visible rain drops falling, wet reflections on surfaces, "
-            "puddles on the ground, moody rainy atmosphere, "
-            "the tower during rainfall with glistening wet facade",
-            color="#1E40AF"
-        )
-
-        # Row 4: Snow & Storm
-        row4 = ctk.CTkFrame(f1, fg_color="transparent")
-        row4.pack(fill="x", pady=5)
-
-        self.add_btn(
-            row4,
-            "Neige",
-            "incity_snow_day.png",
-            "Snowy winter day, white overcast sky, "
-            "snow falling gently, snow accumulation on surfaces, "
-            "cold blue-white atmosphere, winter wonderland, "
-            "the tower covered with snow on ledges",
-            color="#94A3B8"
-        )
-
-        self.add_btn(
-            row4,
-            "Orage",
-            "incity_storm_day.png",
-            "Dramatic thunderstorm, very dark ominous clouds, "
-            "lightning bolt visible in the sky, intense atmosphere, "
-            "dramatic contrast between dark sky and occasional light, "
-            "the tower during a powerful storm",
-            color="#4C1D95"
-        )
-
-        # ============================================
-        # B. EASTER EGGS - JOUR (décorations discrètes)
-        # ============================================
-        f2 = self.add_group("B. EASTER EGGS - JOUR (6 événements)", "#10B981")
-
-        easter_eggs_day = [
-            (
-                "Fête des Lumières",
-                "incity_fete_lumieres_day.png",
-                "Early december day, pale winter sunlight, "
-                "sky with subtle purple and blue gradient hues, "
-                "the tower with faint colorful LED lights visible on facade even in daylight, "
-                "magical anticipation atmosphere, crisp cold air feeling",
-                "#7B68EE"
-            ),
-            (
-                "Noël",
-                "incity_noel_day.png",
-                "Christmas day, soft golden winter light, light snow falling, "
-                "sky with warm peachy pink winter clouds, "
-                "the tower with subtle green and red LED lights glowing softly on facade, "
-                "cozy magical Christmas morning atmosphere",
-                "#228B22"
-            ),
-            (
-                "Nouvel An",
-                "incity_nouvel_an_day.png",
-                "New Year's day morning, bright crisp winter light, "
-                "sky with golden and champagne colored clouds, "
-                "the tower with faint golden sparkle LED lights on facade, "
-                "fresh hopeful new beginning atmosphere",
-                "#FFD700"
-            ),
-            (
-                "14 Juillet",
-                "incity_14_juillet_day.png",
-                "Bastille Day, bright summer sun, "
-                "vivid blue sky with subtle white clouds forming tricolor effect, "
-                "the tower with faint blue white red LED accent lights on facade, "
-                "patriotic celebratory summer atmosphere",
-                "#0055A4"
-            ),
-            (
-                "Halloween",
-                "incity_halloween_day.png",
-                "Halloween day, dramatic orange and purple sunset sky, "
-                "moody clouds with eerie autumn colors, "
-                "the tower with faint orange and purple LED lights glowing on facade, "
-                "mysterious spooky but fun atmosphere",
-                "#FF7518"
-            ),
-            (
-                "Saint-Valentin",
-                "incity_saint_valentin_day.png",
-                "Valentine's day, soft romantic pink golden hour light, "
-                "sky with delicate pink and rose colored clouds, "
-                "the tower with subtle pink heart-shaped LED patterns glowing softly on facade, "
-                "romantic dreamy love atmosphere",
-                "#FF69B4"
-            ),
-        ]
-
-        for event_name, filename, prompt, color in easter_eggs_day:
-            row = ctk.CTkFrame(f2, fg_color="transparent")
-            row.pack(fill="x", pady=3)
-
-            self.add_btn(
-                row,
-                f"{event_name}",
-                filename,
-                prompt,
-                color=color
-            )
-
-        # ============================================
-        # C. EASTER EGGS - NUIT AVEC LED SPÉCIALES (6 images)
-        # ============================================
-        f3 = self.add_group("C. EASTER EGGS - NUIT AVEC LED (6 événements)", "#EC4899")
-
-        easter_eggs = [
-            (
-                "Fête des Lumières",
-                "incity_fete_lumieres_night.png",
-                "Night scene, dark blue sky with stars, "
-                "the Incity tower displaying SPECTACULAR COLORFUL LED LIGHT SHOW, "
-                "animated rainbow colors flowing on the facade, purple blue pink lights, "
-                "artistic light projections, Lyon Festival of Lights celebration, "
-                "magical luminous atmosphere, the tower as a beacon of colored lights",
-                "#8B5CF6"
-            ),
-            (
-                "Noël",
-                "incity_noel_night.png",
-                "Christmas night, dark starry sky, light snow falling, "
-                "the Incity tower displaying FESTIVE RED AND GREEN LED LIGHTS, "
-                "Christmas tree pattern made of green LEDs, red accents, "
-                "warm golden fairy lights, holiday spirit, "
-                "magical cozy Christmas atmosphere on the tower",
-                "#DC2626"
-            ),
-            (
-                "Nouvel An",
-                "incity_nouvel_an_night.png",
-                "New Year's Eve night, fireworks exploding in the sky, "
-                "the Incity tower displaying GOLDEN AND WHITE SPARKLING LED ANIMATION, "
-                "shimmering golden lights cascading down the facade, "
-                "champagne gold and silver sparkles, celebratory atmosphere, "
-                "the tower glowing with festive golden light",
-                "#FBBF24"
-            ),
-            (
-                "14 Juillet",
-                "incity_14_juillet_night.png",
-                "Bastille Day night, fireworks in the background, "
-                "the Incity tower displaying FRENCH FLAG COLORS in LED lights, "
-                "blue white red vertical stripes illuminating the facade, "
-                "patriotic tricolor lighting, national celebration, "
-                "the tower proudly showing bleu blanc rouge",
-                "#1D4ED8"
-            ),
-            (
-                "Halloween",
-                "incity_halloween_night.png",
-                "Halloween night, full moon visible, spooky atmosphere, "
-                "the Incity tower displaying ORANGE AND PURPLE LED LIGHTS, "
-                "jack-o-lantern face pattern in orange LEDs, purple accents, "
-                "eerie glow, bats silhouettes near the tower, "
-                "spooky but fun Halloween lighting",
-                "#EA580C"
-            ),
-            (
-                "Saint-Valentin",
-                "incity_saint_valentin_night.png",
-                "Valentine's night, romantic starry sky, "
-                "the Incity tower displaying PINK AND RED HEART-SHAPED LED PATTERNS, "
-                "multiple hearts made of pink LEDs flowing up the facade, "
-                "romantic rose-colored glow, love atmosphere, "
-                "the tower as a symbol of love with heart lights",
-                "#DB2777"
-            ),
-        ]
-
-        for event_name, filename, prompt, color in easter_eggs:
-            row = ctk.CTkFrame(f3, fg_color="transparent")
-            row.pack(fill="x", pady=3)
-
-            self.add_btn(
-                row,
-                f"{event_name}",
-                filename,
-                prompt,
-                color=color
-            )
-
-        # ============================================
-        # D. NUIT - 5 COULEURS LED QUALITÉ AIR
-        # ============================================
-        f4 = self.add_group("D. NUIT - LED Qualité Air (5 couleurs)", "#0EA5E9")
-
-        # Base prompt pour la nuit (structure identique à l'image de référence)
-        night_base = (
-            "Night scene, dark blue night sky with soft 3D claymorphism clouds, "
-            "crescent moon visible in the sky, "
-            "the Incity tower with its rectangular top section displaying HORIZONTAL LED LIGHT LINES, "
-            "the cylindrical lower section with warm orange lit windows, "
-            "calm peaceful night atmosphere"
-        )
-
-        night_colors = [
-            ("Cyan (Bon)", "incity_night_cyan.png", "#50F0E6", "bright cyan turquoise"),
-            ("Vert (Moyen)", "incity_night_green.png", "#50CCAA", "mint green teal"),
-            ("Jaune (Dégradé)", "incity_night_yellow.png", "#F0E641", "bright yellow"),
-            ("Rouge (Mauvais)", "incity_night_red.png", "#E63A52", "vivid red coral"),
-            ("Violet (Très Mauvais)", "incity_night_purple.png", "#872181", "deep purple magenta"),
-        ]
-
-        row_night = ctk.CTkFrame(f4, fg_color="transparent")
-        row_night.pack(fill="x", pady=5)
-
-        for color_name, filename, btn_color, led_color in night_colors:
-            prompt = f"{night_base}, the LED lines glowing in {led_color} color"
-            self.add_btn(row_night, color_name, filename, prompt, color=btn_color)
-
-        # ============================================
-        # E. PLEINE LUNE - 5 COULEURS LED QUALITÉ AIR
-        # ============================================
-        f5 = self.add_group("E. PLEINE LUNE - LED Qualité Air (5 couleurs)", "#8B5CF6")
-
-        # Base prompt pour pleine lune
-        fullmoon_base = (
-            "Night scene, dark blue night sky with soft 3D claymorphism clouds, "
-            "LARGE BRIGHT FULL MOON prominently visible in the sky casting silver moonlight, "
-            "the Incity tower with its rectangular top section displaying HORIZONTAL LED LIGHT LINES, "
-            "the cylindrical lower section with warm orange lit windows, "
-            "magical mystical full moon night atmosphere, moon reflecting on tower surface"
-        )
-
-        fullmoon_colors = [
-            ("Cyan (Bon)", "incity_fullmoon_cyan.png", "#50F0E6", "bright cyan turquoise"),
-            ("Vert (Moyen)", "incity_fullmoon_green.png", "#50CCAA", "mint green teal"),
-            ("Jaune (Dégradé)", "incity_fullmoon_yellow.png", "#F0E641", "bright yellow"),
-            ("Rouge (Mauvais)", "incity_fullmoon_red.png", "#E63A52", "vivid red coral"),
-            ("Violet (Très Mauvais)", "incity_fullmoon_purple.png", "#872181", "deep purple magenta"),
-        ]
-
-        row_fullmoon = ctk.CTkFrame(f5, fg_color="transparent")
-        row_fullmoon.pack(fill="x", pady=5)
-
-        for color_name, filename, btn_color, led_color in fullmoon_colors:
-            prompt = f"{fullmoon_base}, the LED lines glowing in {led_color} color"
-            self.add_btn(row_fullmoon, color_name, filename, prompt, color=btn_color)
-
+        # Seuls les en-têtes existent à l'ouverture ; le premier groupe est rempli juste après,
+        # les autres (repliés, sous la ligne de flottaison) à leur premier dépliage
+        self.sections = []
+        # Groupes A à E : décrits par GEN/matrices/incity.json
+        for group in INCITY.matrix.groups:
+            self.add_group(group.title, lambda frame, group=group: self.build_group(frame, group), group.title_color)
+        self.add_group("F. GÉNÉRATION GROUPÉE", self.build_batch_buttons, "#6366F1")
+        build_progressively(self, self.sections)
+
+    def build_group(self, frame, group):
+        for _, variants in group.rows():
+            row = ctk.CTkFrame(frame, fg_color="transparent")
+            row.pack(fill="x", pady=5)
+            for variant in variants:
+                self.add_btn(row, variant.label, variant.filename, variant.prompt, color=variant.color, cue=variant.cue)
+
+    def build_batch_buttons(self, f6):
         # ============================================
         # F. GÉNÉRATION GROUPÉE
         # ============================================
-        f6 = self.add_group("F. GÉNÉRATION GROUPÉE", "#6366F1")
-
         row_batch1 = ctk.CTkFrame(f6, fg_color="transparent")
         row_batch1.pack(fill="x", pady=5)
 
@@ -605,124 +473,32 @@ class IncityGeneratorApp(ctk.CTk):
 
     def generate_all_day(self):
         """Génère toutes les images météo jour"""
-        if not self.reference_image_path:
-            messagebox.showerror("Erreur", "Chargez l'image d'abord !")
-            return
-        if not self.api_entry.get().strip():
-            messagebox.showerror("Erreur", "Clé API manquante !")
-            return
-
-        day_configs = [
-            ("incity_clear_golden.png", "Golden hour lighting, warm orange and pink sunset sky, soft golden light reflecting on the tower glass facade, dramatic long shadows, romantic warm atmosphere, the tower lit by beautiful sunset colors"),
-            ("incity_clear_day.png", "Bright sunny midday, clear vivid blue sky, strong direct sunlight, sharp shadows on the tower, bright cheerful atmosphere, summer vibes, the glass facade reflecting the blue sky"),
-            ("incity_partly_cloudy_day.png", "Partly cloudy sky, mix of blue sky and white fluffy clouds, sun visible between clouds, dynamic lighting with soft shadows, pleasant weather, some clouds drifting across the sky, the tower with alternating sun and cloud shadows"),
-            ("incity_cloudy_day.png", "Overcast grey sky, flat diffused lighting, no direct shadows, soft grey clouds covering the sky, muted colors, typical Lyon grey day atmosphere, the tower under cloudy weather"),
-            ("incity_rain_day.png", "Rainy weather, dark grey stormy clouds, visible rain drops falling, wet reflections on surfaces, puddles on the ground, moody rainy atmosphere, the tower during rainfall with glistening wet facade"),
-            ("incity_snow_day.png", "Snowy winter day, white overcast sky, snow falling gently, snow accumulation on surfaces, cold blue-white atmosphere, winter wonderland, the tower covered with snow on ledges"),
-            ("incity_storm_day.png", "Dramatic thunderstorm, very dark ominous clouds, lightning bolt visible in the sky, intense atmosphere, dramatic contrast between dark sky and occasional light, the tower during a powerful storm"),
-        ]
-
-        self.log("Génération batch MÉTÉO JOUR (7 images)...")
-        for filename, prompt in day_configs:
-            threading.Thread(target=self.generate_task, args=(filename, prompt)).start()
+        if self.check_ready():
+            self.generate_group("day", "MÉTÉO JOUR")
 
     def generate_all_easter_day(self):
         """Génère tous les easter eggs jour"""
-        if not self.reference_image_path:
-            messagebox.showerror("Erreur", "Chargez l'image d'abord !")
-            return
-        if not self.api_entry.get().strip():
-            messagebox.showerror("Erreur", "Clé API manquante !")
-            return
-
-        easter_day_configs = [
-            ("incity_fete_lumieres_day.png", "Early december day, pale winter sunlight, sky with subtle purple and blue gradient hues, the tower with faint colorful LED lights visible on facade even in daylight, magical anticipation atmosphere, crisp cold air feeling"),
-            ("incity_noel_day.png", "Christmas day, soft golden winter light, light snow falling, sky with warm peachy pink winter clouds, the tower with subtle green and red LED lights glowing softly on facade, cozy magical Christmas morning atmosphere"),
-            ("incity_nouvel_an_day.png", "New Year's day morning, bright crisp winter light, sky with golden and champagne colored clouds, the tower with faint golden sparkle LED lights on facade, fresh hopeful new beginning atmosphere"),
-            ("incity_14_juillet_day.png", "Bastille Day, bright summer sun, vivid blue sky with subtle white clouds forming tricolor effect, the tower with faint blue white red LED accent lights on facade, patriotic celebratory summer atmosphere"),
-            ("incity_halloween_day.png", "Halloween day, dramatic orange and purple sunset sky, moody clouds with eerie autumn colors, the tower with faint orange and purple LED lights glowing on facade, mysterious spooky but fun atmosphere"),
-            ("incity_saint_valentin_day.png", "Valentine's day, soft romantic pink golden hour light, sky with delicate pink and rose colored clouds, the tower with subtle pink heart-shaped LED patterns glowing softly on facade, romantic dreamy love atmosphere"),
-        ]
-
-        self.log("Génération batch EASTER EGGS JOUR (6 images)...")
-        for filename, prompt in easter_day_configs:
-            threading.Thread(target=self.generate_task, args=(filename, prompt)).start()
+        if self.check_ready():
+            self.generate_group("easter_day", "EASTER EGGS JOUR")
 
     def generate_all_easter_night(self):
         """Génère tous les easter eggs nuit"""
-        if not self.reference_image_path:
-            messagebox.showerror("Erreur", "Chargez l'image d'abord !")
-            return
-        if not self.api_entry.get().strip():
-            messagebox.showerror("Erreur", "Clé API manquante !")
-            return
-
-        easter_night_configs = [
-            ("incity_fete_lumieres_night.png", "Night scene, dark blue sky with stars, the Incity tower displaying SPECTACULAR COLORFUL LED LIGHT SHOW, animated rainbow colors flowing on the facade, purple blue pink lights, artistic light projections, Lyon Festival of Lights celebration, magical luminous atmosphere, the tower as a beacon of colored lights"),
-            ("incity_noel_night.png", "Christmas night, dark starry sky, light snow falling, the Incity tower displaying FESTIVE RED AND GREEN LED LIGHTS, Christmas tree pattern made of green LEDs, red accents, warm golden fairy lights, holiday spirit, magical cozy Christmas atmosphere on the tower"),
-            ("incity_nouvel_an_night.png", "New Year's Eve night, fireworks exploding in the sky, the Incity tower displaying GOLDEN AND WHITE SPARKLING LED ANIMATION, shimmering golden lights cascading down the facade, champagne gold and silver sparkles, celebratory atmosphere, the tower glowing with festive golden light"),
-            ("incity_14_juillet_night.png", "Bastille Day night, fireworks in the background, the Incity tower displaying FRENCH FLAG COLORS in LED lights, blue white red vertical stripes illuminating the facade, patriotic tricolor lighting, national celebration, the tower proudly showing bleu blanc rouge"),
-            ("incity_halloween_night.png", "Halloween night, full moon visible, spooky atmosphere, the Incity tower displaying ORANGE AND PURPLE LED LIGHTS, jack-o-lantern face pattern in orange LEDs, purple accents, eerie glow, bats silhouettes near the tower, spooky but fun Halloween lighting"),
-            ("incity_saint_valentin_night.png", "Valentine's night, romantic starry sky, the Incity tower displaying PINK AND RED HEART-SHAPED LED PATTERNS, multiple hearts made of pink LEDs flowing up the facade, romantic rose-colored glow, love atmosphere, the tower as a symbol of love with heart lights"),
-        ]
-
-        self.log("Génération batch EASTER EGGS NUIT (6 images)...")
-        for filename, prompt in easter_night_configs:
-            threading.Thread(target=self.generate_task, args=(filename, prompt)).start()
+        if self.check_ready():
+            self.generate_group("easter_night", "EASTER EGGS NUIT")
 
     def generate_all_night(self):
         """Génère toutes les images nuit avec LED couleurs"""
-        if not self.reference_image_path:
-            messagebox.showerror("Erreur", "Chargez l'image d'abord !")
-            return
-        if not self.api_entry.get().strip():
-            messagebox.showerror("Erreur", "Clé API manquante !")
-            return
-
-        night_base = "Night scene, dark blue night sky with soft 3D claymorphism clouds, crescent moon visible in the sky, the Incity tower with its rectangular top section displaying HORIZONTAL LED LIGHT LINES, the cylindrical lower section with warm orange lit windows, calm peaceful night atmosphere"
-
-        night_configs = [
-            ("incity_night_cyan.png", f"{night_base}, the LED lines glowing in bright cyan turquoise color"),
-            ("incity_night_green.png", f"{night_base}, the LED lines glowing in mint green teal color"),
-            ("incity_night_yellow.png", f"{night_base}, the LED lines glowing in bright yellow color"),
-            ("incity_night_red.png", f"{night_base}, the LED lines glowing in vivid red coral color"),
-            ("incity_night_purple.png", f"{night_base}, the LED lines glowing in deep purple magenta color"),
-        ]
-
-        self.log("Génération batch NUIT LED (5 images)...")
-        for filename, prompt in night_configs:
-            threading.Thread(target=self.generate_task, args=(filename, prompt)).start()
+        if self.check_ready():
+            self.generate_group("night", "NUIT LED")
 
     def generate_all_fullmoon(self):
         """Génère toutes les images pleine lune avec LED couleurs"""
-        if not self.reference_image_path:
-            messagebox.showerror("Erreur", "Chargez l'image d'abord !")
-            return
-        if not self.api_entry.get().strip():
-            messagebox.showerror("Erreur", "Clé API manquante !")
-            return
-
-        fullmoon_base = "Night scene, dark blue night sky with soft 3D claymorphism clouds, LARGE BRIGHT FULL MOON prominently visible in the sky casting silver moonlight, the Incity tower with its rectangular top section displaying HORIZONTAL LED LIGHT LINES, the cylindrical lower section with warm orange lit windows, magical mystical full moon night atmosphere, moon reflecting on tower surface"
-
-        fullmoon_configs = [
-            ("incity_fullmoon_cyan.png", f"{fullmoon_base}, the LED lines glowing in bright cyan turquoise color"),
-            ("incity_fullmoon_green.png", f"{fullmoon_base}, the LED lines glowing in mint green teal color"),
-            ("incity_fullmoon_yellow.png", f"{fullmoon_base}, the LED lines glowing in bright yellow color"),
-            ("incity_fullmoon_red.png", f"{fullmoon_base}, the LED lines glowing in vivid red coral color"),
-            ("incity_fullmoon_purple.png", f"{fullmoon_base}, the LED lines glowing in deep purple magenta color"),
-        ]
-
-        self.log("Génération batch PLEINE LUNE (5 images)...")
-        for filename, prompt in fullmoon_configs:
-            threading.Thread(target=self.generate_task, args=(filename, prompt)).start()
+        if self.check_ready():
+            self.generate_group("fullmoon", "PLEINE LUNE")
 
     def generate_all_everything(self):
         """Génère TOUTES les 29 images"""
-        if not self.reference_image_path:
-            messagebox.showerror("Erreur", "Chargez l'image d'abord !")
-            return
-        if not self.api_entry.get().strip():
-            messagebox.showerror("Erreur", "Clé API manquante !")
+        if not self.check_ready():
             return
 
         self.log("Génération TOTALE (29 images)...")
@@ -1,12 +1,23 @@
 import customtkinter as ctk
-from tkinter import filedialog, messagebox
 from PIL import Image
+from tkinter import filedialog, messagebox
 import os
+import sys
 import threading
-from google import genai
-from google.genai import types
+
+# Permet de lancer le script directement (python lyon_generator.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from GEN.engine import LYON, GenerationEngine
+from GEN.async_engine import AsyncGenerationEngine
+from GEN.cache import ResultCache
+from GEN.events import EventBus, run_log_path
+from GEN.postprocess import PostProcessor
+from GEN.scheduler import DEFAULT_MAX_IN_FLIGHT, GenerationScheduler
+from GEN.sections import OPEN_SECTIONS, LazySection, build_progressively
+from GEN.trace import Tracer
 
 # --- CONFIGURATION ---
+LOG_INTERVAL_MS = 100
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
@@ -19,6 +30,26 @@ class LyonGeminiV3App(ctk.CTk):
         
         self.reference_image_path = None
         self.pil_image = None
+        # Les workers publient sur le bus ; la boucle Tk vide la file par lots
+        self.events = EventBus(run_log=run_log_path(LYON.name))
+        # Mesures par étape (cf. trace.py), résumées dans le journal chaque fois que la file se vide
+        self.tracer = Tracer()
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+        self.engine = GenerationEngine(LYON, api_key=None, log=self.log, cache=ResultCache(), events=self.events,
+                                       tracer=self.tracer)
+        self.scheduler = GenerationScheduler(max_in_flight=DEFAULT_MAX_IN_FLIGHT)
+        self.async_engine = AsyncGenerationEngine(self.engine, max_in_flight=DEFAULT_MAX_IN_FLIGHT)
+        self.use_async = False
+        self.best_of = 1
+        self.postprocessor = None
+        # Galerie des sorties : le chargeur de miniatures (et son LRU) survit à la fenêtre
+        self.gallery = None
+        self.thumbnails = None
+        # Aperçu local : un clic étalonne la référence ; la génération se confirme ensuite
+        self.previewer = None
+        self.preview_mode = False
+        self.pending_variant = None
         
         # --- LAYOUT ---
         self.grid_columnconfigure(1, weight=1)
@@ -42,18 +73,84 @@ class LyonGeminiV3App(ctk.CTk):
         ctk.CTkLabel(self.sidebar, text="Image Source (Lyon):", anchor="w").pack(fill="x", padx=15, pady=(20,0))
         self.load_btn = ctk.CTkButton(self.sidebar, text="Charger Image Référence", command=self.load_image, fg_color="#E37400", hover_color="#A95700")
         self.load_btn.pack(pady=10, padx=15, fill="x")
+        self.gallery_btn = ctk.CTkButton(self.sidebar, text="Galerie des images générées", command=self.open_gallery,
+                                         fg_color="transparent", border_width=1)
+        self.gallery_btn.pack(pady=(0, 5), padx=15, fill="x")
         
         self.img_preview = ctk.CTkLabel(self.sidebar, text="[Aucune image]", width=250, height=140, fg_color="#1a1a1a", corner_radius=8)
         self.img_preview.pack(pady=10, padx=15)
 
+        self.preview_check = ctk.CTkCheckBox(self.sidebar, text="Aperçu local (sans appel API)", command=self.toggle_preview)
+        self.preview_check.pack(pady=(0, 5), padx=15, anchor="w")
+        self.preview_info = ctk.CTkLabel(self.sidebar, text="", anchor="w")
+        self.preview_info.pack(fill="x", padx=15)
+        self.confirm_btn = ctk.CTkButton(self.sidebar, text="Générer cette variante", command=self.confirm_preview,
+                                         state="disabled", fg_color="#E37400", hover_color="#A95700")
+        self.confirm_btn.pack(pady=5, padx=15, fill="x")
+
         # Options Modèle
         self.settings_frame = ctk.CTkFrame(self.sidebar)
         self.settings_frame.pack(pady=20, padx=15, fill="x")
         ctk.CTkLabel(self.settings_frame, text="Paramètres Modèle", font=ctk.CTkFont(weight="bold")).pack(pady=5)
         ctk.CTkLabel(self.settings_frame, text="Modèle: gemini-3-pro-image-preview").pack(pady=2)
-        ctk.CTkLabel(self.settings_frame, text="Résolution: 2K (High Res)").pack(pady=2)
+        profile = self.engine.target.profile
+        ctk.CTkLabel(self.settings_frame, text=f"Résolution: {self.engine.image_size} -> {profile.width}x{profile.height}").pack(pady=2)
         ctk.CTkLabel(self.settings_frame, text="Ratio: 16:9").pack(pady=2)
 
+        # Parallélisme : nombre maximum d'appels API simultanés
+        ctk.CTkLabel(self.settings_frame, text="Appels simultanés:").pack(pady=(8, 2))
+        self.concurrency_menu = ctk.CTkSegmentedButton(
+            self.settings_frame,
+            values=["1", "2", "4", "8"],
+            command=self.set_concurrency
+        )
+        self.concurrency_menu.set(str(DEFAULT_MAX_IN_FLIGHT))
+        self.concurrency_menu.pack(pady=(0, 8))
+
+        # Best-of-N : N candidats par image, le plus fidèle est gardé
+        ctk.CTkLabel(self.settings_frame, text="Candidats par image:").pack(pady=(0, 2))
+        self.best_of_menu = ctk.CTkSegmentedButton(
+            self.settings_frame,
+            values=["1", "2", "3", "4"],
+            command=self.set_best_of
+        )
+        self.best_of_menu.set("1")
+        self.best_of_menu.pack(pady=(0, 8))
+
+        # Moteur : un thread par appel en vol, ou une seule boucle asyncio
+        ctk.CTkLabel(self.settings_frame, text="Moteur:").pack(pady=(0, 2))
+        self.engine_menu = ctk.CTkSegmentedButton(
+            self.settings_frame,
+            values=["Threads", "Asyncio"],
+            command=self.set_engine_mode
+        )
+        self.engine_menu.set("Threads")
+        self.engine_menu.pack(pady=(0, 8))
+
+        # Cache : les variantes inchangées sont relues depuis le disque
+        self.force_check = ctk.CTkCheckBox(
+            self.settings_frame,
+            text="Forcer (ignorer le cache)",
+            command=self.toggle_force
+        )
+        self.force_check.pack(pady=(0, 8))
+
+        # Réduction locale à la taille réellement affichée par le widget
+        self.downscale_check = ctk.CTkCheckBox(
+            self.settings_frame,
+            text=f"Réduire à {profile.width}x{profile.height}",
+            command=self.toggle_downscale
+        )
+        self.downscale_check.pack(pady=(0, 8))
+
+        # Post-traitement : redimensionnement + encodage au budget du widget
+        self.postprocess_check = ctk.CTkCheckBox(
+            self.settings_frame,
+            text=f"Post-traitement ({profile.format}, {profile.max_bytes // 1024} Ko max)",
+            command=self.toggle_postprocess
+        )
+        self.postprocess_check.pack(pady=(0, 8))
+
         # Console
         ctk.CTkLabel(self.sidebar, text="Logs:", anchor="w").pack(fill="x", padx=15, side="bottom", pady=(0,5))
         self.log_box = ctk.CTkTextbox(self.sidebar, height=180, font=("Consolas", 11))
@@ -64,12 +161,153 @@ class LyonGeminiV3App(ctk.CTk):
         self.main_panel.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
 
         self.create_buttons()
-        self.log("Système prêt. SDK 'google-genai' chargé.")
+        self.drain_logs()
+        self.log("Système prêt. SDK 'google-genai' chargé à la première génération.")
         self.log("En attente de l'image de référence...")
 
     def log(self, message):
-        self.log_box.insert("end", f"> {message}\n")
-        self.log_box.see("end")
+        # Appelable depuis n'importe quel thread : rien ne touche Tk ici
+        self.events.log(message)
+
+    def drain_logs(self):
+        events = self.events.drain()
+        lines = "".join(f"> {event.message}\n" for event in events)
+        if lines:
+            self.log_box.insert("end", lines)
+            self.log_box.see("end")
+        self.after(LOG_INTERVAL_MS, self.drain_logs)
+
+    def set_concurrency(self, value):
+        self.scheduler.set_max_in_flight(int(value))
+        self.async_engine.set_max_in_flight(int(value))
+        self.log(f"Appels simultanés : {value}")
+
+    def set_best_of(self, value):
+        self.best_of = int(value)
+        self.log(f"Candidats par image : {value}")
+
+    def set_engine_mode(self, value):
+        self.use_async = value == "Asyncio"
+        self.log(f"Moteur : {value}")
+
+    def enqueue(self, filename, prompt_details, cue_color=None):
+        """Place une génération dans la file du moteur choisi"""
+        self.track(1)
+        if self.use_async:
+            self.async_engine.submit(filename, prompt_details, on_complete=self.on_generation_done,
+                                     best_of=self.best_of, cue_color=cue_color)
+            return
+        if self.best_of > 1:
+            future = self.engine.submit_best_of(self.scheduler, filename, prompt_details, self.best_of, cue_color)
+        else:
+            future = self.scheduler.submit(self.engine.generate, filename, prompt_details)
+        future.add_done_callback(lambda f: self.on_generation_done(filename, f.result()))
+
+    def on_generation_done(self, filename, path):
+        # Appelé depuis un worker ou la boucle asyncio : self.log passe par le bus
+        if path is None:
+            self.log(f"Échec : {filename}")
+        elif self.postprocessor is not None:
+            try:
+                future = self.postprocessor.submit(path)
+            except RuntimeError:
+                # Post-traitement décoché pendant la génération
+                self.log(f"Post-traitement ignoré : {filename}")
+            else:
+                future.add_done_callback(self.on_postprocess_done)
+        self.track(-1)
+
+    def track(self, count):
+        """Sorties attendues (+) ou reçues (-) ; file vidée : résumé des mesures dans le journal"""
+        with self.pending_lock:
+            self.pending += count
+            if self.pending == 0:
+                # Sous le verrou : une génération lancée entre-temps n'est pas effacée du tracer
+                self.log(f"File vidée, mesures par étape :\n{self.tracer.summary()}")
+                self.tracer.clear()
+
+    def on_postprocess_done(self, future):
+        try:
+            processed = future.result()
+        except Exception as e:
+            self.log(f"ERREUR post-traitement: {e}")
+            return
+        self.engine.manifest.update_output(os.path.basename(processed.source), processed.path)
+        self.log(f"Post: {os.path.basename(processed.path)} ({processed.size // 1024} Ko)")
+
+    def toggle_postprocess(self):
+        if self.postprocess_check.get():
+            self.postprocessor = PostProcessor(self.engine.target.profile)
+        else:
+            if self.postprocessor is not None:
+                self.postprocessor.shutdown()
+            self.postprocessor = None
+
+    def toggle_preview(self):
+        self.preview_mode = bool(self.preview_check.get())
+        if not self.preview_mode:
+            self.pending_variant = None
+            self.confirm_btn.configure(state="disabled")
+            self.preview_info.configure(text="")
+            if self.pil_image is not None:
+                self.show_image(self.pil_image)
+
+    def show_preview(self, variant):
+        """Affiche l'ambiance approchée de la variante ; rien n'est envoyé à l'API"""
+        if self.previewer is None:
+            messagebox.showerror("Erreur", "Chargez l'image d'abord !")
+            return
+        grades = LYON.matrix.group(variant.group).preview_grades(variant)
+        image, elapsed = self.previewer.render(grades)
+        self.show_image(image)
+        self.pending_variant = variant
+        self.confirm_btn.configure(state="normal", text=f"Générer {variant.filename}")
+        self.preview_info.configure(text=f"{' + '.join(grades) or 'référence'} ({elapsed * 1000:.0f} ms)")
+
+    def confirm_preview(self):
+        variant = self.pending_variant
+        if variant is not None:
+            self.trigger_generation(variant.filename, variant.prompt, variant.cue)
+
+    def show_image(self, image):
+        aspect = image.width / image.height
+        h = 140
+        w = int(h * aspect)
+        preview_img = ctk.CTkImage(light_image=image, dark_image=image, size=(w, h))
+        self.img_preview.configure(image=preview_img, text="")
+
+    def open_gallery(self):
+        """Miniatures des images du dossier de sortie, dans l'ordre de la matrice"""
+        if self.gallery is not None and self.gallery.winfo_exists():
+            self.gallery.reload()
+            self.gallery.focus()
+            return
+        # Galerie et miniatures ne sont importées qu'à la première ouverture
+        from GEN.gallery import GalleryWindow
+        from GEN.thumbnails import ThumbnailLoader
+
+        if self.thumbnails is None:
+            self.thumbnails = ThumbnailLoader()
+        order = [os.path.splitext(variant.filename)[0] for variant in LYON.matrix.variants()]
+        self.gallery = GalleryWindow(self, self.engine.output_dir, order, on_select=self.show_output,
+                                     loader=self.thumbnails)
+
+    def show_output(self, path):
+        # Clic dans la galerie : l'image générée remplace l'aperçu de la barre latérale
+        try:
+            with Image.open(path) as img:
+                image = img.convert("RGB")
+        except OSError as e:
+            self.log(f"ERREUR LECTURE: {e}")
+            return
+        self.show_image(image)
+        self.log(f"Sortie : {os.path.basename(path)}")
+
+    def toggle_force(self):
+        self.engine.force = bool(self.force_check.get())
+
+    def toggle_downscale(self):
+        self.engine.downscale = bool(self.downscale_check.get())
 
     def load_image(self):
         try:
@@ -81,316 +319,78 @@ class LyonGeminiV3App(ctk.CTk):
             if not file_path: return
 
             self.reference_image_path = file_path
-            self.pil_image = Image.open(file_path).convert('RGB')
+            self.pil_image = self.engine.load_reference(file_path)
+            # NumPy n'est chargé qu'avec la première référence
+            from GEN.preview import Previewer
+            self.previewer = Previewer(self.pil_image)
             
             # Preview
-            aspect = self.pil_image.width / self.pil_image.height
-            h = 140
-            w = int(h * aspect)
-            preview_img = ctk.CTkImage(light_image=self.pil_image, dark_image=self.pil_image, size=(w, h))
-            self.img_preview.configure(image=preview_img, text="")
+            self.show_image(self.pil_image)
             self.log(f"Image chargée : {os.path.basename(file_path)}")
 
         except Exception as e:
             self.log(f"ERREUR CHARGEMENT: {e}")
 
-    def generate_task(self, filename, prompt_details):
-        """La fonction qui s'exécute en arrière-plan pour ne pas figer l'interface"""
-        api_key = self.api_entry.get().strip()
-        
-        # --- 1. SETUP CLIENT (NOUVEAU SDK) ---
-        try:
-            client = genai.Client(api_key=api_key)
-        except Exception as e:
-            self.log(f"❌ Erreur Client: {e}")
-            return
-
-        # --- 2. CONSTRUCTION DU PROMPT (Editing Strategy) ---
-        # Selon la doc : "Using the provided image, change..."
-        base_prompt = (
-            "Using the provided image of Lyon city, modify the scene to match this weather condition: "
-            f"{prompt_details}. "
-            "Keep the exact same buildings geometry, camera angle, and claymorphism style. "
-            "Only change the lighting, sky, ground texture, and foliage colors."
-        )
-
-        self.log(f"⏳ Gemini 3 Pro travaille sur : {filename}...")
-
-        output_dir = os.path.join(os.getcwd(), "output_lyon_gemini3")
-        os.makedirs(output_dir, exist_ok=True)
-        final_path = os.path.join(output_dir, filename)
-
-        try:
-            # --- 3. APPEL API (DOCUMENTATION EXACTE) ---
-            # Modèle: gemini-3-pro-image-preview (Nano Banana Pro)
-            # Contents: [Prompt Text, PIL Image]
-            
-            response = client.models.generate_content(
-                model="gemini-3-pro-image-preview",
-                contents=[base_prompt, self.pil_image],
-                config=types.GenerateContentConfig(
-                    response_modalities=['IMAGE'], # On veut juste l'image
-                    image_config=types.ImageConfig(
-                        aspect_ratio="16:9",
-                        image_size="2K" # Haute résolution comme demandé
-                    )
-                )
-            )
-
-            # --- 4. RÉCUPÉRATION ---
-            image_saved = False
-            
-            if response.parts:
-                for part in response.parts:
-                    # Le SDK peut renvoyer l'image directement via inline_data ou une méthode helper
-                    if part.inline_data:
-                        # Conversion manuelle si besoin, ou via helper
-                        img_bytes = part.inline_data.data # C'est déjà des bytes déchiffrés souvent
-                        
-                        # Si c'est un objet Image PIL direct (feature du SDK):
-                        try:
-                            # Tentative via la méthode pratique si disponible dans cette version
-                            if hasattr(part, "as_image"):
-                                img = part.as_image()
-                                img.save(final_path)
-                                image_saved = True
-                                break
-                        except:
-                             pass
-                             
-                        # Sauvegarde brute si méthode helper absente
-                        if not image_saved:
-                            import base64
-                            # Parfois c'est du raw bytes, parfois b64 string
-                            if isinstance(img_bytes, str):
-                                img_data = base64.b64decode(img_bytes)
-                            else:
-                                img_data = img_bytes
-                                
-                            with open(final_path, "wb") as f:
-                                f.write(img_data)
-                            image_saved = True
-
-            if image_saved:
-                self.log(f"✅ SUCCÈS : {filename} sauvegardé (2K) !")
-            else:
-                self.log(f"⚠️ API a répondu mais pas d'image. Vérifiez la console.")
-                print(response)
-
-        except Exception as e:
-            self.log(f"❌ ERREUR API : {e}")
-
-    def trigger_generation(self, filename, prompt_add):
+    def trigger_generation(self, filename, prompt_add, cue_color=None):
         if not self.reference_image_path:
             messagebox.showerror("Erreur", "Chargez l'image d'abord !")
             return
-        if not self.api_entry.get().strip():
+        api_key = self.api_entry.get().strip()
+        if not api_key:
             messagebox.showerror("Erreur", "Clé API manquante !")
             return
+        # Lue ici, sur le thread Tk : les workers n'accèdent jamais au widget
+        self.engine.set_api_key(api_key)
 
-        # Lancer dans un thread pour ne pas bloquer l'interface (Mac friendly)
-        threading.Thread(target=self.generate_task, args=(filename, prompt_add)).start()
+        # File d'attente partagée : au plus N appels API en parallèle (Mac friendly)
+        self.enqueue(filename, prompt_add, cue_color)
 
     # --- BUTTONS FACTORY ---
-    def add_group(self, title):
-        lbl = ctk.CTkLabel(self.main_panel, text=title, font=ctk.CTkFont(size=16, weight="bold"), anchor="w", text_color="#E37400")
-        lbl.pack(fill="x", pady=(25, 5))
-        frame = ctk.CTkFrame(self.main_panel)
-        frame.pack(fill="x", pady=5)
-        return frame
-
-    def add_btn(self, parent, text, filename, prompt_add, color=None):
+    def add_group(self, title, build):
+        """Groupe repliable ; `build(cadre)` le remplit au premier dépliage (les premiers : dès l'ouverture)"""
+        section = LazySection(self.main_panel, title, build, "#E37400",
+                              expanded=len(self.sections) < OPEN_SECTIONS)
+        self.sections.append(section)
+        return section
+
+    def add_btn(self, parent, text, filename, prompt_add, color=None, variant=None, cue=None):
         btn_color = color if color else ["#E37400", "#A95700"]
         btn = ctk.CTkButton(parent, text=text, height=35, fg_color=btn_color, 
-                            command=lambda: self.trigger_generation(filename, prompt_add))
+                            command=lambda: self.on_button(filename, prompt_add, cue, variant))
         btn.pack(side="left", padx=5, pady=8, expand=True, fill="x")
 
-    def create_buttons(self):
-        # 1. BEAU TEMPS
-        f1 = self.add_group("A. BEAU TEMPS (Ciel Dégagé)")
-        seasons = [
-            ("Printemps", "spring, light green trees, pink cherry blossoms, flowers", "spring"),
-            ("Été", "summer, vibrant dark green trees, blue sky", "summer"),
-            ("Automne", "autumn, orange red yellow trees, fall foliage", "autumn"),
-            ("Hiver", "winter, naked trees, brown branches", "winter")
-        ]
-        times = [
-            ("Jour", "bright sunlight, clear blue sky, sharp shadows", "day"),
-            ("Golden", "golden hour sunset, warm orange sky", "golden"),
-            ("Nuit", "night time, dark blue sky, street lights glowing", "night")
-        ]
-        for s_name, s_p, s_f in seasons:
-            row = ctk.CTkFrame(f1, fg_color="transparent")
-            row.pack(fill="x", pady=2)
-            ctk.CTkLabel(row, text=s_name, width=80).pack(side="left")
-            for t_name, t_p, t_f in times:
-                self.add_btn(row, t_name, f"A_{s_f}_{t_f}.png", f"{s_p}, {t_p}")
-
-        # 2. GRIS
-        f2 = self.add_group("B. GRIS / NUAGEUX")
-        for s_name, s_p, s_f in seasons:
-            row = ctk.CTkFrame(f2, fg_color="transparent")
-            row.pack(fill="x", pady=2)
-            ctk.CTkLabel(row, text=s_name, width=80).pack(side="left")
-            self.add_btn(row, "Jour", f"B_{s_f}_grey_day.png", f"{s_p}, overcast grey sky, flat lighting", color="gray")
-            self.add_btn(row, "Nuit", f"B_{s_f}_grey_night.png", f"{s_p}, night, cloudy sky", color="#333")
-
-        # 3. PLUIE
-        f3 = self.add_group("C. PLUIE")
-        for s_name, s_p, s_f in seasons:
-            row = ctk.CTkFrame(f3, fg_color="transparent")
-            row.pack(fill="x", pady=2)
-            ctk.CTkLabel(row, text=s_name, width=80).pack(side="left")
-            self.add_btn(row, "Jour", f"C_{s_f}_rain_day.png", f"{s_p}, rainy weather, wet ground reflections", color="#4285F4")
-            self.add_btn(row, "Nuit", f"C_{s_f}_rain_night.png", f"{s_p}, rainy night, wet streets", color="#0F3678")
-
-        # 4. NEIGE & AUTRES
-        f4 = self.add_group("D. NEIGE & AUTRES")
-        row_s = ctk.CTkFrame(f4, fg_color="transparent")
-        row_s.pack(fill="x")
-        ctk.CTkLabel(row_s, text="Neige:", width=80).pack(side="left")
-        
-        snow_p = "heavy snow covering the city, white roof tops, frozen river, winter"
-        self.add_btn(row_s, "Jour", "D_snow_day.png", f"{snow_p}, daylight", color="#AEC6CF")
-        self.add_btn(row_s, "Golden", "D_snow_golden.png", f"{snow_p}, sunset light", color="#D4AF37")
-        self.add_btn(row_s, "Nuit", "D_snow_night.png", f"{snow_p}, night time", color="#2C3E50")
-
-        # Orages
-        row_o = ctk.CTkFrame(f4, fg_color="transparent")
-        row_o.pack(fill="x", pady=5)
-        ctk.CTkLabel(row_o, text="Orages:", width=80).pack(side="left")
-        for s_name, s_p, s_f in seasons:
-             self.add_btn(row_o, s_name[:3], f"E_storm_{s_f}.png", f"{s_p}, thunderstorm, lightning, dark sky", color="#5E35B1")
-
-        # ============================================
-        # F. EASTER EGGS - ÉVÉNEMENTS SPÉCIAUX LYON
-        # ============================================
-        f5 = self.add_group("F. EASTER EGGS - ÉVÉNEMENTS SPÉCIAUX")
-
-        easter_eggs = [
-            # (Nom affiché, nom_fichier, prompt_jour, prompt_nuit, couleur_jour, couleur_nuit)
-            (
-                "✨ Fête des Lumières (8-11 déc)",
-                "fete_lumieres",
-                # JOUR: Préparatifs, installations visibles, ciel d'hiver dégagé, PAS DE NEIGE
-                "early december, clear pale blue winter sky, bright cold daylight, "
-                "no snow on ground, bare trees, festive banners hanging on lampposts, "
-                "colorful light installations visible on buildings but turned off during day, "
-                "projection screens being set up, anticipation atmosphere, crisp winter air",
-                # NUIT: Le spectacle ! Projections, lumières partout
-                "winter night, spectacular light projections on Basilique de Fourvière, "
-                "colorful artistic illuminations on buildings, glowing light installations, "
-                "purple blue pink lights reflecting on Saône river, magical atmosphere, "
-                "Lyon Fête des Lumières festival, no snow",
-                "#7B68EE",  # Medium slate blue (jour)
-                "#4B0082"   # Indigo (nuit)
-            ),
-            (
-                "🎄 Noël (24-25 déc)",
-                "noel",
-                # JOUR: Ambiance hivernale festive, décorations, marchés
-                "winter, light snow on rooftops, clear cold sky, bright winter sun, "
-                "Christmas decorations on streets, festive garlands, "
-                "Christmas market stalls with red roofs, decorated Christmas trees, "
-                "warm cozy atmosphere, holiday spirit",
-                # NUIT: Magie de Noël, lumières chaudes
-                "Christmas Eve night, clear starry sky, gentle snow falling, "
-                "warm glowing Christmas lights on buildings, illuminated Christmas trees, "
-                "golden fairy lights garlands, cozy warm windows glowing, "
-                "magical peaceful Christmas atmosphere, stars twinkling",
-                "#228B22",  # Forest green (jour)
-                "#8B0000"   # Dark red (nuit)
-            ),
-            (
-                "🎆 Nouvel An (31 déc - 1er jan)",
-                "nouvel_an",
-                # JOUR: Dernier jour de l'année, préparatifs
-                "winter, clear bright sky, festive decorations still up, "
-                "New Year preparations, champagne bottles visible, "
-                "party atmosphere building up, end of year vibes, "
-                "people preparing celebrations",
-                # NUIT: Feux d'artifice, célébrations
-                "New Year's Eve midnight, spectacular fireworks over Fourvière, "
-                "colorful explosions in clear night sky, golden sparkles, "
-                "confetti falling, champagne celebration, "
-                "crowds cheering, Bonne Année banners, magical night",
-                "#FFD700",  # Gold (jour)
-                "#FF4500"   # Orange red (nuit)
-            ),
-            (
-                "🇫🇷 14 Juillet (Fête Nationale)",
-                "14_juillet",
-                # JOUR: Défilé, drapeaux, fête nationale
-                "summer, bright sunny day, clear blue sky, "
-                "French tricolor flags bleu blanc rouge everywhere, "
-                "Bastille Day celebration, military parade atmosphere, "
-                "patriotic decorations, festive national holiday",
-                # NUIT: Feux d'artifice tricolores
-                "Bastille Day night, spectacular fireworks in blue white red colors, "
-                "French flag colors illuminating the sky over Lyon, "
-                "tricolor lights on buildings, national celebration, "
-                "clear summer night, crowds watching fireworks",
-                "#0055A4",  # French blue (jour)
-                "#EF4135"   # French red (nuit)
-            ),
-            (
-                "🎃 Halloween (31 oct)",
-                "halloween",
-                # JOUR: Ambiance automnale mystérieuse, décorations
-                "late autumn, overcast mysterious sky with dramatic clouds, "
-                "orange and brown fall colors, Halloween decorations, "
-                "carved pumpkins on doorsteps, spider webs, "
-                "eerie but playful atmosphere, bare trees",
-                # NUIT: Nuit d'Halloween, lune, ambiance spooky
-                "Halloween night, full moon in clear dark sky, "
-                "spooky orange glow from jack-o-lanterns, "
-                "mysterious fog in streets, bats silhouettes, "
-                "purple and orange lights, haunted atmosphere but whimsical",
-                "#FF7518",  # Pumpkin orange (jour)
-                "#2D1B4E"   # Dark purple (nuit)
-            ),
-            (
-                "💕 Saint-Valentin (14 fév)",
-                "saint_valentin",
-                # JOUR: Romantique, décorations ville, PAS DE PERSONNAGES EN GROS PLAN
-                "mid february, soft romantic winter light, clear pale blue sky, "
-                "Valentine's Day decorations on streets, red and pink heart garlands "
-                "hanging between buildings, heart-shaped balloons tied to lampposts, "
-                "flower shop displays with red roses, no people close-up, "
-                "romantic city atmosphere, soft warm feeling",
-                # NUIT: Soirée romantique, lumières douces, décorations ville
-                "Valentine's night, clear starry sky with soft pink hue, "
-                "romantic pink and red fairy lights on bridges over Saône river, "
-                "heart-shaped light decorations on buildings, "
-                "warm glowing restaurant windows in distance, "
-                "rose petals on ground, love atmosphere, no people close-up",
-                "#FF69B4",  # Hot pink (jour)
-                "#C71585"   # Medium violet red (nuit)
-            ),
-        ]
-
-        for event_name, filename_base, prompt_day, prompt_night, color_day, color_night in easter_eggs:
-            row = ctk.CTkFrame(f5, fg_color="transparent")
-            row.pack(fill="x", pady=3)
-            ctk.CTkLabel(row, text=event_name, width=220, anchor="w").pack(side="left", padx=5)
-
-            # Bouton JOUR
-            self.add_btn(
-                row,
-                "☀️ Jour",
-                f"F_{filename_base}_day.png",
-                prompt_day,
-                color=color_day
-            )
+    def on_button(self, filename, prompt_add, cue=None, variant=None):
+        if self.preview_mode and variant is not None:
+            self.show_preview(variant)
+        else:
+            self.trigger_generation(filename, prompt_add, cue)
 
-            # Bouton NUIT
-            self.add_btn(
-                row,
-                "🌙 Nuit",
-                f"F_{filename_base}_night.png",
-                prompt_night,
-                color=color_night
-            )
+    def create_buttons(self):
+        # Groupes décrits par GEN/matrices/lyon.json ; un groupe sans titre
+        # s'ajoute au cadre précédent (ex: les orages sous « D. NEIGE & AUTRES »)
+        blocks = []
+        for group in LYON.matrix.groups:
+            if group.title or not blocks:
+                blocks.append((group.title or group.id, []))
+            blocks[-1][1].append(group)
+        # Seuls les en-têtes existent à l'ouverture ; le premier groupe est rempli juste après,
+        # les autres (repliés, sous la ligne de flottaison) à leur premier dépliage
+        self.sections = []
+        for title, groups in blocks:
+            self.add_group(title, lambda frame, groups=groups: self.build_groups(frame, groups))
+        build_progressively(self, self.sections)
+
+    def build_groups(self, frame, groups):
+        for group in groups:
+            for row_label, variants in group.rows():
+                row = ctk.CTkFrame(frame, fg_color="transparent")
+                row.pack(fill="x", pady=2)
+                if row_label:
+                    anchor = "w" if group.row_label_width > 80 else "center"
+                    ctk.CTkLabel(row, text=row_label, width=group.row_label_width, anchor=anchor).pack(side="left")
+                for variant in variants:
+                    self.add_btn(row, variant.label, variant.filename, variant.prompt, color=variant.color, variant=variant,
+                                 cue=variant.cue)
 
 if __name__ == "__main__":
     app = LyonGeminiV3App()
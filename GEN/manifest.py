@@ -0,0 +1,142 @@
+"""Manifeste de génération : ce qui a produit chaque fichier d'un dossier de sortie.
+
+Un fichier `generation.lock.json` par dossier de sortie, une entrée par
+variante : empreintes du prompt et de la référence, modèle, ratio, taille,
+horodatage, puis somme de contrôle et taille du fichier écrit. Comme un
+lockfile, il est trié et stable d'une écriture à l'autre.
+
+`plan` compare le manifeste aux variantes actuelles (cf. variants.py) et
+classe chaque image : à jour, manquante, périmée (entrée modifiée),
+corrompue (fichier différent de celui enregistré) ou non suivie (présente
+sans entrée). Seules les manquantes, périmées et corrompues sont à refaire.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from .fsutil import write_atomic
+
+MANIFEST_NAME = "generation.lock.json"
+MANIFEST_VERSION = 1
+
+# Ce qui détermine une image : comparé champ par champ pour expliquer une péremption
+Inputs = namedtuple("Inputs", ["prompt_sha256", "reference_sha256", "model", "aspect_ratio", "image_size"])
+
+INPUT_LABELS = {
+    "prompt_sha256": "prompt",
+    "reference_sha256": "référence",
+    "model": "modèle",
+    "aspect_ratio": "ratio",
+    "image_size": "taille",
+}
+
+OK, MISSING, STALE, CORRUPT, UNTRACKED = "ok", "missing", "stale", "corrupt", "untracked"
+# Statuts qui appellent une nouvelle génération
+TO_BUILD = (MISSING, STALE, CORRUPT)
+
+# Une ligne du plan
+PlanItem = namedtuple("PlanItem", ["variant", "status", "reason"])
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_inputs(prompt, reference_bytes, model, aspect_ratio, image_size):
+    """Inputs d'une génération ; sans référence chargée, son empreinte reste inconnue (None)"""
+    return Inputs(
+        prompt_sha256=sha256_bytes(prompt.encode("utf-8")),
+        reference_sha256=sha256_bytes(reference_bytes) if reference_bytes is not None else None,
+        model=model,
+        aspect_ratio=aspect_ratio,
+        image_size=image_size,
+    )
+
+
+class Manifest:
+    """Lecture / mise à jour du manifeste d'un dossier, sûre depuis les workers.
+
+    Chaque mise à jour réécrit le fichier (écriture atomique) : un run
+    interrompu garde la trace de tout ce qui a été produit.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._assets = None
+
+    def _load(self):
+        if self._assets is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._assets = json.load(f).get("assets", {})
+            except FileNotFoundError:
+                self._assets = {}
+        return self._assets
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        data = json.dumps({"version": MANIFEST_VERSION, "assets": self._assets},
+                          indent=2, sort_keys=True, ensure_ascii=False) + "\n"
+        write_atomic(self.path, data)
+
+    def get(self, filename):
+        with self._lock:
+            entry = self._load().get(filename)
+            return dict(entry) if entry is not None else None
+
+    def record(self, filename, path, inputs, source, **extra):
+        """Enregistre le fichier `path` produit pour la variante `filename`"""
+        entry = dict(inputs._asdict())
+        entry.update(extra)
+        entry.update(
+            file=os.path.basename(path),
+            source=source,
+            generated_at=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            sha256=sha256_file(path),
+            bytes=os.path.getsize(path),
+        )
+        with self._lock:
+            self._load()[filename] = entry
+            self._save()
+
+    def update_output(self, filename, path):
+        """Le fichier a été réécrit après coup (post-traitement, réduction) : nouvelle somme de contrôle"""
+        with self._lock:
+            entry = self._load().get(filename)
+            if entry is None:
+                return
+            entry.update(file=os.path.basename(path), sha256=sha256_file(path), bytes=os.path.getsize(path))
+            self._save()
+
+    def status(self, variant, inputs, derived_from=None):
+        """PlanItem d'une variante, `inputs` étant ceux qu'elle aurait aujourd'hui"""
+        entry = self.get(variant.filename)
+        if entry is None:
+            exists = os.path.exists(os.path.join(self.directory, variant.filename))
+            return PlanItem(variant, UNTRACKED if exists else MISSING, None)
+        path = os.path.join(self.directory, entry["file"])
+        if not os.path.exists(path):
+            return PlanItem(variant, MISSING, None)
+        if os.path.getsize(path) != entry["bytes"] or sha256_file(path) != entry["sha256"]:
+            return PlanItem(variant, CORRUPT, "somme de contrôle")
+
+        changed = [INPUT_LABELS[field] for field, value in inputs._asdict().items()
+                   if value is not None and entry.get(field) != value]
+        if (derived_from or None) != entry.get("derived_from"):
+            changed.append("dérivation")
+        if changed:
+            return PlanItem(variant, STALE, "modifié : " + ", ".join(changed))
+        return PlanItem(variant, OK, None)
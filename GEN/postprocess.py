@@ -0,0 +1,115 @@
+import io
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from .fsutil import write_atomic
+from .profiles import EXTENSIONS
+
+# Résultat du post-traitement d'un fichier
+Processed = namedtuple("Processed", ["source", "path", "size", "quality"])
+
+# Bornes de la recherche de qualité (JPEG / WebP)
+MIN_QUALITY = 40
+MAX_QUALITY = 95
+
+
+def output_path(source, profile, dest_dir=None):
+    """Même nom que la source, extension correspondant au format du profil"""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(dest_dir or os.path.dirname(source), stem + EXTENSIONS[profile.format])
+
+
+def encode(img, img_format, quality=None):
+    buf = io.BytesIO()
+    if img_format == "PNG":
+        img.save(buf, format="PNG", optimize=True)
+    else:
+        img.save(buf, format=img_format, quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def encode_within_budget(img, img_format, max_bytes):
+    """Encode avec la meilleure qualité qui tient dans `max_bytes`.
+
+    JPEG/WebP : recherche dichotomique sur la qualité. PNG : compression
+    maximale, puis palette 256 couleurs si le budget n'est pas tenu.
+    Retourne (octets, qualité) ; au pire la version la plus compacte.
+    """
+    if img_format == "PNG":
+        data = encode(img, "PNG")
+        if max_bytes and len(data) > max_bytes:
+            data = encode(img.quantize(256, method=Image.Quantize.MEDIANCUT), "PNG")
+        return data, None
+
+    best = None
+    low, high = MIN_QUALITY, MAX_QUALITY
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode(img, img_format, quality)
+        if not max_bytes or len(data) <= max_bytes:
+            best = (data, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+    if best is None:
+        best = (encode(img, img_format, MIN_QUALITY), MIN_QUALITY)
+    return best
+
+
+def process_asset(source, profile, dest_dir=None):
+    """Redimensionne, ré-encode au format du profil et respecte le budget.
+
+    S'exécute dans un processus du pool : fonction de module, arguments
+    sérialisables.
+    """
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.size != (profile.width, profile.height):
+            img = ImageOps.fit(img, (profile.width, profile.height), method=Image.LANCZOS)
+        if profile.format == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+        data, quality = encode_within_budget(img, profile.format, profile.max_bytes)
+
+    dest = output_path(source, profile, dest_dir)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    write_atomic(dest, data)
+
+    # La source brute (souvent du JPEG nommé .png) est remplacée
+    if os.path.abspath(dest) != os.path.abspath(source) and dest_dir is None:
+        os.unlink(source)
+    return Processed(source, dest, len(data), quality)
+
+
+class PostProcessor:
+    """Pool de processus qui post-traite les images au fil de leur génération"""
+
+    def __init__(self, profile, max_workers=None, dest_dir=None):
+        self.profile = profile
+        self.dest_dir = dest_dir
+        self.max_workers = max_workers
+        self._pool = None
+        self._closed = False
+
+    def submit(self, source):
+        """Planifie le post-traitement d'un fichier. Retourne un Future[Processed].
+
+        Lève RuntimeError après `shutdown` (sinon un nouveau pool serait créé et jamais fermé).
+        """
+        if self._closed:
+            raise RuntimeError("post-traitement arrêté")
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool.submit(process_asset, source, self.profile, self.dest_dir)
+
+    def process_all(self, sources):
+        futures = [self.submit(source) for source in sources]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        self._closed = True
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
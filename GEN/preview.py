@@ -0,0 +1,86 @@
+"""Aperçu local instantané : l'ambiance d'une variante approchée sur la référence, sans appel API.
+
+Chaque étalonnage (golden hour, nuit, temps couvert, hiver) est une courbe
+par canal — lift, gamma, gain — compilée en table de 256 entrées, suivie
+d'un réglage de saturation. L'application est une indexation NumPy sur
+une copie réduite de la référence : quelques millisecondes par aperçu.
+
+Les étalonnages d'une variante viennent de la matrice (champ `preview`
+des groupes et des valeurs d'axe, cf. variants.py) et s'appliquent dans
+l'ordre : ex. hiver puis nuit pour A_winter_night.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+# Grand côté de la copie de travail (l'aperçu de la barre latérale fait ~250 px)
+PREVIEW_SIZE = 480
+
+# Courbe par canal (R, G, B) : sortie = lift + (gain - lift) * entrée ** gamma
+Grade = namedtuple("Grade", ["lift", "gamma", "gain", "saturation"])
+
+GRADES = {
+    # Lumière rasante chaude : hautes lumières orangées, ombres un peu denses
+    "golden": Grade(lift=(0.05, 0.02, 0.0), gamma=(0.9, 1.05, 1.4), gain=(1.1, 0.88, 0.62), saturation=1.15),
+    # Nuit : tons moyens très sombres et bleutés, les lumières (hautes valeurs) restent lisibles
+    "night": Grade(lift=(0.01, 0.015, 0.04), gamma=(2.1, 1.9, 1.45), gain=(0.75, 0.72, 0.85), saturation=0.65),
+    # Couvert : contraste écrasé, couleurs ternes, léger voile gris-bleu
+    "overcast": Grade(lift=(0.08, 0.08, 0.09), gamma=(1.1, 1.1, 1.05), gain=(0.82, 0.83, 0.86), saturation=0.5),
+    # Hiver : dominante froide, ombres relevées (neige, brume), végétation désaturée
+    "winter": Grade(lift=(0.06, 0.07, 0.1), gamma=(1.0, 0.97, 0.9), gain=(0.95, 0.98, 1.04), saturation=0.6),
+}
+
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def build_lut(grade):
+    """Table (3, 256) uint8 : une courbe par canal"""
+    x = np.linspace(0.0, 1.0, 256, dtype=np.float32)
+    lut = np.empty((3, 256), dtype=np.uint8)
+    for channel in range(3):
+        lift, gamma, gain = grade.lift[channel], grade.gamma[channel], grade.gain[channel]
+        y = lift + (gain - lift) * x ** gamma
+        lut[channel] = np.clip(np.rint(y * 255), 0, 255).astype(np.uint8)
+    return lut
+
+
+_LUTS = {name: build_lut(grade) for name, grade in GRADES.items()}
+_CHANNELS = np.arange(3)
+
+
+def apply_grade(array, name):
+    """Étalonne un tableau RGB uint8 (H, W, 3). Retourne un nouveau tableau."""
+    grade = GRADES[name]
+    out = _LUTS[name][_CHANNELS, array]
+    if grade.saturation != 1.0:
+        rgb = out.astype(np.float32)
+        luma = rgb @ LUMA
+        rgb = luma[..., None] + (rgb - luma[..., None]) * grade.saturation
+        out = np.clip(rgb, 0, 255).astype(np.uint8)
+    return out
+
+
+class Previewer:
+    """Copie réduite de la référence, préparée une fois ; aperçus mis en cache par combinaison"""
+
+    def __init__(self, image, size=PREVIEW_SIZE):
+        image = image.convert("RGB")
+        image.thumbnail((size, size), Image.BILINEAR)
+        self.base = np.asarray(image)
+        self._cache = {}
+
+    def render(self, grades):
+        """Image PIL de l'aperçu et durée de calcul (s) ; `grades` : noms appliqués dans l'ordre"""
+        grades = tuple(grades)
+        if grades in self._cache:
+            return self._cache[grades], 0.0
+        start = time.perf_counter()
+        array = self.base
+        for name in grades:
+            array = apply_grade(array, name)
+        image = Image.fromarray(array)
+        elapsed = time.perf_counter() - start
+        self._cache[grades] = image
+        return image, elapsed
@@ -0,0 +1,56 @@
+import io
+from collections import namedtuple
+
+from PIL import Image, ImageOps
+
+from .fsutil import write_atomic
+
+# Un profil = ce que le widget affiche réellement : ratio, taille finale en
+# pixels, format d'encodage et budget en octets par fichier (les extensions
+# de widget ont une limite mémoire serrée).
+OutputProfile = namedtuple("OutputProfile", ["name", "aspect_ratio", "width", "height", "format", "max_bytes"])
+
+INCITY_PROFILE = OutputProfile("incity", "1:1", 600, 600, "JPEG", 120 * 1024)
+LYON_PROFILE = OutputProfile("lyon", "16:9", 800, 446, "JPEG", 150 * 1024)
+
+PROFILES = {p.name: p for p in (INCITY_PROFILE, LYON_PROFILE)}
+
+# Extension de fichier de chaque format d'encodage
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+# Tailles proposées par gemini-3-pro-image-preview, de la moins chère à la plus chère
+IMAGE_SIZES = ("1K", "2K", "4K")
+
+# Résolution effectivement renvoyée par le modèle pour chaque (ratio, taille)
+MODEL_RESOLUTIONS = {
+    "1:1": {"1K": (1024, 1024), "2K": (2048, 2048), "4K": (4096, 4096)},
+    "16:9": {"1K": (1376, 768), "2K": (2752, 1536), "4K": (5504, 3072)},
+    "9:16": {"1K": (768, 1376), "2K": (1536, 2752), "4K": (3072, 5504)},
+    "4:3": {"1K": (1200, 896), "2K": (2400, 1792), "4K": (4800, 3584)},
+    "3:4": {"1K": (896, 1200), "2K": (1792, 2400), "4K": (3584, 4800)},
+}
+
+
+def pick_image_size(profile):
+    """Plus petite taille modèle dont la sortie couvre la taille finale du profil"""
+    resolutions = MODEL_RESOLUTIONS[profile.aspect_ratio]
+    for size in IMAGE_SIZES:
+        width, height = resolutions[size]
+        if width >= profile.width and height >= profile.height:
+            return size
+    return IMAGE_SIZES[-1]
+
+
+def downscale(path, profile):
+    """Réduit l'image sur place à la taille du profil (Lanczos, recadrage centré)"""
+    with Image.open(path) as img:
+        img_format = img.format
+        if img.size == (profile.width, profile.height):
+            return path
+        resized = ImageOps.fit(img, (profile.width, profile.height), method=Image.LANCZOS)
+    save_kwargs = {"quality": 95} if img_format == "JPEG" else {}
+    buf = io.BytesIO()
+    resized.save(buf, format=img_format, **save_kwargs)
+    # La galerie ou l'export peuvent lire le fichier pendant la réduction
+    write_atomic(path, buf.getvalue())
+    return path
@@ -0,0 +1,157 @@
+"""Contrôle de dérive géométrique : l'image générée garde-t-elle le bâtiment de la référence ?
+
+Les deux images sont réduites (ANALYSIS_SIZE), passées en niveaux de gris
+puis normalisées localement : l'éclairage (nuit, golden hour, neige)
+change les intensités mais pas les contours. On mesure la part des
+contours de la référence, dans le masque du bâtiment, qui retrouvent un
+contour de la sortie à `tolerance` pixels près. La dérive vaut 1 - cette
+part ; au-delà du seuil, l'image est rejetée.
+
+Tout est vectorisé (NumPy) : quelques millisecondes par image, calculées
+dans le worker qui a reçu la réponse.
+
+`score_candidate` sert au mode best-of-N : fidélité géométrique combinée à
+un indice de couleur propre à la variante (teinte des LED, de l'événement).
+"""
+import colorsys
+import io
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image, ImageColor
+
+ANALYSIS_SIZE = 256
+# Part des pixels considérés comme contours (percentile du gradient, par image)
+EDGE_PERCENTILE = 85.0
+# Sorties correctes : < 0.13 ; autre cadrage ou autre bâtiment : > 0.17
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_TOLERANCE = 2
+
+# Indice de couleur : tolérance de teinte (sur 256) et couverture visée
+CUE_HUE_TOLERANCE = 14  # ~20°
+CUE_COVERAGE = 0.04
+FIDELITY_WEIGHT = 0.7
+
+# Résultat du contrôle d'une image
+DriftReport = namedtuple("DriftReport", ["drift", "threshold", "passed"])
+
+# Note d'un candidat best-of-N (plus haut = meilleur)
+Score = namedtuple("Score", ["total", "fidelity", "cue"])
+
+
+def _load_gray(source, size):
+    """Image (chemin, octets ou PIL) -> tableau float32 en niveaux de gris, `size` pixels"""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    img = source if isinstance(source, Image.Image) else Image.open(source)
+    # Pour un JPEG, draft décode directement à une échelle réduite
+    img.draft("L", size)
+    img = img.convert("L").resize(size, Image.BILINEAR)
+    return np.asarray(img, dtype=np.float32)
+
+
+def _box_mean(a, radius):
+    """Moyenne glissante (fenêtre carrée 2r+1) par sommes cumulées"""
+    k = 2 * radius + 1
+    padded = np.pad(a, radius + 1, mode="edge")
+    c = padded.cumsum(0).cumsum(1)
+    s = c[k:, k:] - c[:-k, k:] - c[k:, :-k] + c[:-k, :-k]
+    return s[:a.shape[0], :a.shape[1]] / (k * k)
+
+
+def _dilate(mask, radius):
+    """Dilatation binaire par un carré de côté 2r+1 (max des décalages)"""
+    if radius <= 0:
+        return mask
+    h, w = mask.shape
+    padded = np.pad(mask, radius)
+    out = np.zeros_like(mask)
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            out |= padded[dy:dy + h, dx:dx + w]
+    return out
+
+
+def edge_map(gray):
+    """Contours d'une image normalisée localement (robuste aux changements d'éclairage)"""
+    mean = _box_mean(gray, 8)
+    var = _box_mean(gray * gray, 8) - mean * mean
+    norm = (gray - mean) / np.sqrt(np.maximum(var, 1.0) + 25.0)
+    gx = np.zeros_like(norm)
+    gy = np.zeros_like(norm)
+    gx[:, 1:-1] = norm[:, 2:] - norm[:, :-2]
+    gy[1:-1, :] = norm[2:, :] - norm[:-2, :]
+    magnitude = np.hypot(gx, gy)
+    return magnitude > np.percentile(magnitude, EDGE_PERCENTILE)
+
+
+def building_mask(edges):
+    """Masque du bâtiment déduit de la référence : zones denses en contours, élargies.
+
+    Le ciel et les aplats (où le modèle est libre de changer la météo)
+    n'ont presque pas de contours et en sont exclus.
+    """
+    density = _box_mean(edges.astype(np.float32), 6)
+    return _dilate(density > 0.12, 4)
+
+
+class GeometryGate:
+    """Compare chaque sortie à la référence chargée une fois"""
+
+    def __init__(self, reference, threshold=DEFAULT_THRESHOLD, tolerance=DEFAULT_TOLERANCE, mask=None):
+        """`reference` : chemin ou octets ; `mask` : image optionnelle (blanc = bâtiment)"""
+        self.threshold = threshold
+        self.tolerance = tolerance
+        if isinstance(reference, (bytes, bytearray)):
+            reference = io.BytesIO(reference)
+        with Image.open(reference) as img:
+            # Même ratio que la référence, grand côté ANALYSIS_SIZE
+            scale = ANALYSIS_SIZE / max(img.size)
+            self.size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            self.reference_edges = edge_map(_load_gray(img, self.size))
+        if mask is not None:
+            self.mask = _load_gray(mask, self.size) > 127
+        else:
+            self.mask = building_mask(self.reference_edges)
+        self._reference_points = self.reference_edges & self.mask
+        self._reference_count = max(1, int(self._reference_points.sum()))
+
+    def measure(self, image):
+        """Dérive (0 = contours identiques, 1 = aucun contour retrouvé) d'une sortie"""
+        edges = _dilate(edge_map(_load_gray(image, self.size)), self.tolerance)
+        matched = np.count_nonzero(self._reference_points & edges)
+        return 1.0 - float(matched) / self._reference_count
+
+    def check(self, image):
+        """Sans seuil, l'image passe toujours (la dérive reste mesurée)"""
+        drift = self.measure(image)
+        return DriftReport(drift, self.threshold, self.threshold is None or drift <= self.threshold)
+
+
+def colour_cue(image, color, size=(128, 128)):
+    """Présence de la teinte `color` (ex: "#50F0E6") parmi les pixels vifs, de 0 à 1.
+
+    None si la couleur est neutre (gris, noir) : pas d'indice exploitable.
+    """
+    r, g, b = ImageColor.getrgb(color)[:3]
+    hue, saturation, _ = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+    if saturation < 0.35:
+        return None
+    if isinstance(image, (bytes, bytearray)):
+        image = io.BytesIO(image)
+    with Image.open(image) as img:
+        img.draft("RGB", size)
+        hsv = np.asarray(img.convert("RGB").resize(size, Image.BILINEAR).convert("HSV"), dtype=np.int16)
+    distance = np.abs(hsv[..., 0] - round(hue * 255))
+    distance = np.minimum(distance, 256 - distance)
+    hits = (distance <= CUE_HUE_TOLERANCE) & (hsv[..., 1] > 90) & (hsv[..., 2] > 90)
+    return min(1.0, float(hits.mean()) / CUE_COVERAGE)
+
+
+def score_candidate(image, gate=None, cue_color=None):
+    """Note d'un candidat : fidélité à la référence (1 - dérive) et indice de couleur"""
+    fidelity = 1.0 - gate.measure(image) if gate is not None else 1.0
+    cue = colour_cue(image, cue_color) if cue_color else None
+    if cue is None:
+        return Score(fidelity, fidelity, None)
+    return Score(FIDELITY_WEIGHT * fidelity + (1 - FIDELITY_WEIGHT) * cue, fidelity, cue)
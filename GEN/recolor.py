@@ -0,0 +1,94 @@
+"""Déclinaison locale des couleurs de LED : une image de base, N couleurs sans appel API.
+
+Les lignes LED de la base (ex: cyan) sont repérées par leur teinte, leur
+saturation et leur luminosité ; un masque progressif couvre aussi le halo.
+Dans ce masque, la teinte est remplacée par celle de la couleur cible et
+la saturation/luminosité ajustées ; le reste de l'image est inchangé, au
+pixel près, d'une couleur à l'autre.
+"""
+import colorsys
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageColor, ImageFilter
+
+from .fsutil import write_atomic
+
+# Écart de teinte (sur 256) pleinement / partiellement pris dans le masque
+HUE_CORE = 14
+HUE_FALLOFF = 28
+MIN_SATURATION = 60
+MIN_VALUE = 70
+
+
+def _hsv(color):
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+
+
+def led_mask(hsv, source_color):
+    """Masque flou (0..1) des pixels de la couleur des LED : lignes et halo"""
+    hue = round(_hsv(source_color)[0] * 255)
+    distance = np.abs(hsv[..., 0] - hue)
+    distance = np.minimum(distance, 256 - distance)
+    hue_weight = np.clip((HUE_FALLOFF - distance) / (HUE_FALLOFF - HUE_CORE), 0.0, 1.0)
+    sat_weight = np.clip((hsv[..., 1] - MIN_SATURATION) / 60.0, 0.0, 1.0)
+    val_weight = np.clip((hsv[..., 2] - MIN_VALUE) / 60.0, 0.0, 1.0)
+    mask = hue_weight * sat_weight * val_weight
+    # Le ciel bleu nuit frôle parfois la teinte cyan : on ignore les traces
+    mask[mask < 0.15] = 0.0
+    # Adoucit les bords du masque pour ne pas créer de liseré
+    mask_img = Image.fromarray((mask * 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1))
+    return np.asarray(mask_img, dtype=np.float32) / 255.0
+
+
+def recolor(image, source_color, target_color, mask=None):
+    """Image PIL RGB dont les LED `source_color` passent en `target_color`"""
+    hsv = np.asarray(image.convert("HSV"), dtype=np.float32)
+    if mask is None:
+        mask = led_mask(hsv, source_color)
+    src_h, src_s, src_v = _hsv(source_color)
+    dst_h, dst_s, dst_v = _hsv(target_color)
+
+    out = hsv.copy()
+    # Teinte : remplacée (interpolation sur le cercle pour les bords du masque)
+    delta = ((dst_h - src_h) * 256 + 128) % 256 - 128
+    out[..., 0] = (hsv[..., 0] + delta * mask) % 256
+    # Saturation et luminosité : mises à l'échelle du rapport cible / source
+    s_ratio = dst_s / max(src_s, 1e-3)
+    v_ratio = dst_v / max(src_v, 1e-3)
+    out[..., 1] = np.clip(hsv[..., 1] * (1 + (s_ratio - 1) * mask), 0, 255)
+    out[..., 2] = np.clip(hsv[..., 2] * (1 + (v_ratio - 1) * mask), 0, 255)
+
+    recolored = Image.fromarray(np.rint(out).astype(np.uint8), "HSV").convert("RGB")
+    # Hors masque, les pixels d'origine sont repris tels quels (pas d'aller-retour HSV)
+    alpha = Image.fromarray((np.clip(mask, 0, 1) * 255).astype(np.uint8))
+    return Image.composite(recolored, image.convert("RGB"), alpha)
+
+
+def derive_all(base_path, derivations, output_dir, quality=95):
+    """Écrit chaque dérivation (variants.Derivation) à côté de la base. Retourne [(variante, chemin)].
+
+    Le masque est calculé une seule fois pour toutes les couleurs.
+    """
+    if not derivations:
+        return []
+    with Image.open(base_path) as img:
+        img_format = img.format or "PNG"
+        base = img.convert("RGB")
+    hsv = np.asarray(base.convert("HSV"), dtype=np.float32)
+    masks = {}
+    results = []
+    for derivation in derivations:
+        if derivation.source_color not in masks:
+            masks[derivation.source_color] = led_mask(hsv, derivation.source_color)
+        img = recolor(base, derivation.source_color, derivation.target_color, masks[derivation.source_color])
+        buf = io.BytesIO()
+        save_kwargs = {"quality": quality} if img_format == "JPEG" else {}
+        # Même format que la base (souvent du JPEG dans un .png, comme le renvoie le modèle)
+        img.save(buf, format=img_format, **save_kwargs)
+        path = os.path.join(output_dir, derivation.variant.filename)
+        write_atomic(path, buf.getvalue())
+        results.append((derivation.variant, path))
+    return results
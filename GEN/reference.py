@@ -0,0 +1,73 @@
+import hashlib
+import io
+import os
+from collections import namedtuple
+
+from PIL import Image, ImageOps
+
+from .fsutil import write_atomic
+
+DEFAULT_REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "references")
+
+# Qualité JPEG des références préparées (photos : visuellement sans perte)
+REFERENCE_QUALITY = 92
+
+# Référence prête à envoyer au modèle
+PreparedReference = namedtuple("PreparedReference", ["data", "mime_type", "width", "height", "source_size"])
+
+# Formats renvoyés tels quels quand aucune transformation n'est nécessaire
+PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+def _has_exif(img):
+    return "exif" in img.info or bool(img.getexif())
+
+
+def prepare_reference(path, max_side, cache_dir=DEFAULT_REFERENCE_DIR):
+    """Normalise une image de référence pour l'envoi au modèle.
+
+    Oriente selon l'EXIF puis le retire, réduit le grand côté à `max_side`
+    (au-delà, le modèle n'en tire rien) et encode en RGB. Le résultat est
+    gardé dans `cache_dir`, indexé par l'empreinte de la source et des
+    paramètres : une session suivante relit directement le fichier préparé.
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    h = hashlib.sha256(source)
+    h.update(f"{max_side}:{REFERENCE_QUALITY}".encode("ascii"))
+    digest = h.hexdigest()
+
+    if cache_dir:
+        for mime_type, ext in (("image/jpeg", ".jpg"), ("image/png", ".png")):
+            cached = os.path.join(cache_dir, digest + ext)
+            if os.path.exists(cached):
+                with open(cached, "rb") as f:
+                    data = f.read()
+                with Image.open(io.BytesIO(data)) as img:
+                    return PreparedReference(data, mime_type, img.width, img.height, len(source))
+
+    with Image.open(io.BytesIO(source)) as img:
+        img_format = img.format
+        untouched = (img_format in PASSTHROUGH_FORMATS and img.mode == "RGB"
+                     and max(img.size) <= max_side and not _has_exif(img))
+        if untouched:
+            return PreparedReference(source, PASSTHROUGH_FORMATS[img_format], img.width, img.height, len(source))
+
+        img = ImageOps.exif_transpose(img)
+        if max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+        img = img.convert("RGB")
+        buf = io.BytesIO()
+        # Les PNG (rendus 3D, captures) restent sans perte ; les photos passent en JPEG
+        if img_format == "PNG":
+            img.save(buf, format="PNG", optimize=True)
+            mime_type, ext = "image/png", ".png"
+        else:
+            img.save(buf, format="JPEG", quality=REFERENCE_QUALITY, optimize=True)
+            mime_type, ext = "image/jpeg", ".jpg"
+        data = buf.getvalue()
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_atomic(os.path.join(cache_dir, digest + ext), data)
+    return PreparedReference(data, mime_type, img.width, img.height, len(source))
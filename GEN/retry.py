@@ -0,0 +1,221 @@
+import asyncio
+import email.utils
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+
+# --- Classes d'erreurs ---
+RATE_LIMIT = "rate_limit"    # 429 / RESOURCE_EXHAUSTED
+SERVER = "server"            # 5xx, connexion coupée
+TIMEOUT = "timeout"          # délai réseau dépassé (408, 504, httpx timeout)
+SAFETY = "safety"            # prompt ou image bloqués par les filtres
+NO_IMAGE = "no_image"        # réponse valide mais sans image
+DRIFT = "drift"              # image reçue mais géométrie trop éloignée de la référence
+FATAL = "fatal"              # clé invalide, requête mal formée... inutile de réessayer
+
+# Les classes qui signalent un service dégradé (comptent pour le disjoncteur)
+DEGRADED = (RATE_LIMIT, SERVER, TIMEOUT)
+
+# finish_reason / block_reason qui indiquent un blocage de sécurité
+SAFETY_REASONS = {
+    "SAFETY", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII", "IMAGE_SAFETY",
+    "IMAGE_PROHIBITED_CONTENT", "MODEL_ARMOR", "JAILBREAK",
+}
+
+
+class GenerationError(Exception):
+    """Échec de génération déjà classé (cf. constantes ci-dessus)"""
+    kind = FATAL
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SafetyBlockError(GenerationError):
+    kind = SAFETY
+
+
+class NoImageError(GenerationError):
+    kind = NO_IMAGE
+
+
+class GeometryDriftError(GenerationError):
+    kind = DRIFT
+
+
+def check_response(response):
+    """Lève SafetyBlockError ou NoImageError pour une réponse sans image"""
+    feedback = getattr(response, "prompt_feedback", None)
+    block_reason = getattr(feedback, "block_reason", None)
+    if block_reason is not None and _reason_name(block_reason) in SAFETY_REASONS:
+        raise SafetyBlockError(f"prompt bloqué ({_reason_name(block_reason)})")
+    for candidate in getattr(response, "candidates", None) or []:
+        reason = _reason_name(getattr(candidate, "finish_reason", None))
+        if reason in SAFETY_REASONS:
+            raise SafetyBlockError(f"image bloquée ({reason})")
+    raise NoImageError("la réponse ne contient pas d'image")
+
+
+def _reason_name(reason):
+    if reason is None:
+        return None
+    return getattr(reason, "name", None) or str(reason).split(".")[-1]
+
+
+def classify(exc):
+    """Retourne (classe, retry_after en secondes ou None) pour une exception"""
+    import httpx
+    from google.genai import errors
+
+    if isinstance(exc, GenerationError):
+        return exc.kind, exc.retry_after
+    if isinstance(exc, errors.APIError):
+        retry_after = _retry_after(exc)
+        if exc.code == 429 or exc.status == "RESOURCE_EXHAUSTED":
+            return RATE_LIMIT, retry_after
+        if exc.code in (408, 504) or exc.status == "DEADLINE_EXCEEDED":
+            return TIMEOUT, retry_after
+        if exc.code and exc.code >= 500:
+            return SERVER, retry_after
+        return FATAL, None
+    if isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return TIMEOUT, None
+    if isinstance(exc, (httpx.TransportError, ConnectionError)):
+        return SERVER, None
+    return FATAL, None
+
+
+def _retry_after(exc):
+    """Délai demandé par le serveur : en-tête Retry-After ou RetryInfo.retryDelay"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                date = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                date = None
+            if date is not None:
+                return max(0.0, date.timestamp() - time.time())
+    details = exc.details.get("error", exc.details) if isinstance(exc.details, dict) else {}
+    for detail in details.get("details", None) or []:
+        delay = isinstance(detail, dict) and detail.get("retryDelay")
+        match = re.fullmatch(r"([\d.]+)s", delay) if isinstance(delay, str) else None
+        if match:
+            return float(match.group(1))
+    return None
+
+
+# --- Politiques de réessai ---
+RetryPolicy = namedtuple("RetryPolicy", ["max_retries", "base_delay", "max_delay"])
+
+DEFAULT_POLICIES = {
+    RATE_LIMIT: RetryPolicy(max_retries=6, base_delay=5.0, max_delay=120.0),
+    SERVER: RetryPolicy(max_retries=4, base_delay=2.0, max_delay=60.0),
+    TIMEOUT: RetryPolicy(max_retries=3, base_delay=2.0, max_delay=30.0),
+    # Le modèle est stochastique : un second tirage passe souvent
+    SAFETY: RetryPolicy(max_retries=1, base_delay=1.0, max_delay=1.0),
+    NO_IMAGE: RetryPolicy(max_retries=2, base_delay=1.0, max_delay=5.0),
+    DRIFT: RetryPolicy(max_retries=2, base_delay=0.0, max_delay=0.0),
+    FATAL: RetryPolicy(max_retries=0, base_delay=0.0, max_delay=0.0),
+}
+
+
+def retry_delay(kind, attempt, retry_after=None, policies=DEFAULT_POLICIES):
+    """Délai avant le réessai n° `attempt` (0 = premier), ou None s'il faut abandonner.
+
+    Backoff exponentiel avec jitter complet ; un Retry-After du serveur sert
+    de plancher.
+    """
+    policy = policies.get(kind, policies[FATAL])
+    if attempt >= policy.max_retries:
+        return None
+    delay = random.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class CircuitBreaker:
+    """Disjoncteur partagé par tous les travaux d'un moteur.
+
+    Après `threshold` échecs « service dégradé » consécutifs, le circuit
+    s'ouvre : plus aucun appel ne part pendant `cooldown` secondes, ce qui
+    met toute la file en pause. Ensuite un seul appel d'essai passe
+    (semi-ouvert) ; s'il réussit le circuit se referme, sinon il se rouvre
+    avec un délai doublé.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=5, cooldown=30.0, max_cooldown=300.0):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self._cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Secondes à attendre avant d'appeler l'API (0 = autorisé)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now < self._open_until:
+                    return self._open_until - now
+                self.state = self.HALF_OPEN
+            if self._trial_in_flight:
+                return 1.0
+            self._trial_in_flight = True
+            return 0.0
+
+    def wait(self):
+        """Bloque le thread appelant tant que le circuit est ouvert"""
+        while True:
+            delay = self.delay()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    async def wait_async(self):
+        while True:
+            delay = self.delay()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._cooldown = self.base_cooldown
+            self._trial_in_flight = False
+
+    def record_failure(self, kind, retry_after=None):
+        """Enregistre un échec. Retourne la durée d'ouverture si le circuit vient de s'ouvrir."""
+        with self._lock:
+            if kind not in DEGRADED:
+                # Erreur propre à la requête : ne dit rien de l'état du service
+                if self.state == self.HALF_OPEN:
+                    self._trial_in_flight = False
+                return None
+            self._failures += 1
+            if self.state == self.HALF_OPEN:
+                self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+            elif self._failures < self.threshold or self.state == self.OPEN:
+                return None
+            cooldown = max(self._cooldown, retry_after or 0.0)
+            self.state = self.OPEN
+            self._open_until = time.monotonic() + cooldown
+            self._trial_in_flight = False
+            return cooldown
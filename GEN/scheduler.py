@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Nombre d'appels API simultanés par défaut : assez pour masquer la latence
+# réseau, assez peu pour ne pas déclencher les 429 du quota Gemini.
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+class GenerationScheduler:
+    """File d'attente partagée avec un nombre borné d'appels en vol.
+
+    Les travaux soumis sont exécutés dans l'ordre par au plus `max_in_flight`
+    threads. `requests_per_minute` espace les démarrages pour rester sous le
+    quota de l'API (None = pas de limite).
+    """
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT, requests_per_minute=None):
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._workers = 0
+        self._in_flight = 0
+        self._next_start = 0.0
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.requests_per_minute = requests_per_minute
+
+    @property
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    @property
+    def in_flight(self):
+        with self._cond:
+            return self._in_flight
+
+    def set_max_in_flight(self, value):
+        """Change le parallélisme à chaud (les travaux en cours continuent)"""
+        with self._cond:
+            self.max_in_flight = max(1, int(value))
+            self._spawn_workers()
+            self._cond.notify_all()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with self._cond:
+            self._queue.append((future, fn, args, kwargs))
+            self._spawn_workers()
+            self._cond.notify()
+        return future
+
+    def join(self):
+        """Attend que la file soit vide et qu'aucun travail ne soit en vol"""
+        with self._cond:
+            while self._queue or self._in_flight:
+                self._cond.wait()
+
+    def _spawn_workers(self):
+        # Appelé sous self._cond
+        while self._workers < min(self.max_in_flight, len(self._queue) + self._in_flight):
+            self._workers += 1
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _wait_start_slot(self):
+        if not self.requests_per_minute:
+            return
+        interval = 60.0 / self.requests_per_minute
+        with self._cond:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and self._workers <= self.max_in_flight:
+                    # Pas de travail : le worker se termine après un délai d'inactivité
+                    if not self._cond.wait(timeout=30):
+                        break
+                if not self._queue or self._workers > self.max_in_flight:
+                    self._workers -= 1
+                    self._cond.notify_all()
+                    return
+                future, fn, args, kwargs = self._queue.popleft()
+                self._in_flight += 1
+
+            if future.set_running_or_notify_cancel():
+                self._wait_start_slot()
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
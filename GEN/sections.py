@@ -0,0 +1,67 @@
+"""Groupes de boutons repliables, construits après l'ouverture de la fenêtre.
+
+Les deux générateurs affichent des dizaines de CTkButton ; les créer tous
+avant la première image retarde l'apparition de la fenêtre. Chaque groupe
+est donc un en-tête (un seul widget) et un cadre vide. Seuls les
+OPEN_SECTIONS premiers groupes (visibles sans défiler) sont dépliés à
+l'ouverture et construits juste après le premier affichage
+(`build_progressively`) ; les autres restent repliés et ne sont construits
+qu'à leur premier dépliage.
+"""
+import customtkinter as ctk
+
+BUILD_INTERVAL_MS = 10
+# Groupes dépliés à l'ouverture : ceux qui tiennent dans la fenêtre
+OPEN_SECTIONS = 1
+HEADER_HOVER = "#2b2b2b"
+
+
+class LazySection:
+    """En-tête cliquable (replier / déplier) et cadre rempli par `build(cadre)` à la demande"""
+
+    def __init__(self, parent, title, build, color, pady=(25, 5), expanded=False):
+        self.title = title
+        self.build = build
+        self.built = False
+        self.expanded = expanded
+        self.header = ctk.CTkButton(parent, text=self._label(), command=self.toggle, anchor="w",
+                                    font=ctk.CTkFont(size=16, weight="bold"), text_color=color,
+                                    fg_color="transparent", hover_color=HEADER_HOVER)
+        self.header.pack(fill="x", pady=pady)
+        self.frame = ctk.CTkFrame(parent)
+        if expanded:
+            self.frame.pack(fill="x", pady=5)
+
+    def _label(self):
+        return f"{'▾' if self.expanded else '▸'} {self.title}"
+
+    def materialize(self):
+        if not self.built:
+            self.built = True
+            self.build(self.frame)
+
+    def toggle(self):
+        self.expanded = not self.expanded
+        if self.expanded:
+            self.materialize()
+            self.frame.pack(fill="x", pady=5, after=self.header)
+        else:
+            self.frame.pack_forget()
+        self.header.configure(text=self._label())
+
+
+def build_progressively(widget, sections, interval_ms=BUILD_INTERVAL_MS):
+    """Construit les sections dépliées une à une, après le premier affichage de `widget`"""
+    pending = list(sections)
+
+    def step():
+        while pending:
+            section = pending.pop(0)
+            if section.expanded and not section.built:
+                section.materialize()
+                break
+        if pending:
+            widget.after(interval_ms, step)
+
+    # Les tâches « idle » déjà en file (géométrie, dessin de la fenêtre) passent avant
+    widget.after_idle(lambda: widget.after(interval_ms, step))
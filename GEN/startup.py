@@ -0,0 +1,139 @@
+"""Benchmark de démarrage à froid des deux générateurs et de la CLI.
+
+Chaque mesure part d'un nouveau processus Python (aucun module déjà
+importé) et relève, depuis le début du script :
+
+  - `import`  : import du module de l'app (customtkinter, moteur, PIL...) ;
+  - `fenêtre` : app construite et premier affichage (`update()`) ;
+  - `prête`   : groupes dépliés à l'ouverture construits (cf. sections.py ;
+                les groupes repliés ne sont construits qu'au dépliage).
+
+Le SDK google-genai ne doit pas être chargé au démarrage : il l'est à la
+première génération (cf. engine.create_client). La médiane de `fenêtre`
+(ou de `import` pour la CLI) est comparée à STARTUP_TARGETS ; sans
+affichage (pas de $DISPLAY, customtkinter absent), les apps sont ignorées.
+
+    python -m GEN.startup
+    python -m GEN.startup lyon --runs 10 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Objectifs (s, médiane) sur la phase qui compte pour l'utilisateur
+STARTUP_TARGETS = {"lyon": 0.8, "incity": 0.8, "cli": 0.1}
+APPS = {"lyon": ("GEN.lyon_generator", "LyonGeminiV3App"), "incity": ("GEN.incity_generator", "IncityGeneratorApp")}
+SDK_MODULE = "google.genai"
+
+StartupResult = namedtuple("StartupResult", ["scenario", "runs", "process", "imports", "window", "ready",
+                                             "sdk_loaded", "target", "error"])
+
+# Exécuté dans un processus neuf : phases mesurées depuis sa première ligne
+CHILD = """
+import importlib, json, sys, time
+start = time.perf_counter()
+scenario, module_name, class_name = sys.argv[1:4]
+phases = {}
+try:
+    module = importlib.import_module(module_name)
+    phases["imports"] = time.perf_counter() - start
+    if class_name:
+        app = getattr(module, class_name)()
+        app.update()
+        phases["window"] = time.perf_counter() - start
+        while not all(section.built for section in app.sections if section.expanded):
+            app.update()
+            time.sleep(0.001)
+        phases["ready"] = time.perf_counter() - start
+        phases["sdk_loaded"] = "%s" in sys.modules
+        app.destroy()
+    else:
+        phases["sdk_loaded"] = "%s" in sys.modules
+except Exception as e:
+    phases["error"] = f"{type(e).__name__}: {e}"
+print(json.dumps(phases))
+""" % (SDK_MODULE, SDK_MODULE)
+
+
+def measure_once(scenario):
+    """Phases d'un démarrage dans un nouveau processus, plus sa durée totale (interpréteur compris)"""
+    module_name, class_name = APPS.get(scenario, ("GEN.generate", ""))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", CHILD, scenario, module_name, class_name],
+                               cwd=REPO_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"error": (completed.stderr.strip().splitlines() or ["échec"])[-1]}
+    phases = json.loads(lines[-1])
+    phases["process"] = elapsed
+    return phases
+
+
+def measure(scenario, runs):
+    samples = []
+    for _ in range(runs):
+        phases = measure_once(scenario)
+        if "error" in phases:
+            return StartupResult(scenario, 0, None, None, None, None, None, STARTUP_TARGETS[scenario],
+                                 phases["error"])
+        samples.append(phases)
+
+    def median(key):
+        values = [s[key] for s in samples if key in s]
+        return statistics.median(values) if values else None
+
+    return StartupResult(scenario, runs, median("process"), median("imports"), median("window"), median("ready"),
+                         any(s["sdk_loaded"] for s in samples), STARTUP_TARGETS[scenario], None)
+
+
+def key_phase(result):
+    """Durée comparée à l'objectif : la fenêtre pour les apps, l'import pour la CLI"""
+    return result.window if result.scenario in APPS else result.imports
+
+
+def format_results(results):
+    def seconds(value):
+        return f"{value:7.3f}s" if value is not None else f"{'-':>8}"
+
+    lines = [f"{'scénario':8} {'runs':>4} {'process':>8} {'import':>8} {'fenêtre':>8} {'prête':>8} "
+             f"{'objectif':>8}  {'SDK':4} verdict"]
+    for r in results:
+        if r.error:
+            lines.append(f"{r.scenario:8} ignoré : {r.error}")
+            continue
+        ok = key_phase(r) <= r.target and not r.sdk_loaded
+        lines.append(f"{r.scenario:8} {r.runs:4d} {seconds(r.process)} {seconds(r.imports)} {seconds(r.window)} "
+                     f"{seconds(r.ready)} {seconds(r.target)}  {'oui' if r.sdk_loaded else 'non':4} "
+                     f"{'ok' if ok else 'TROP LENT' if key_phase(r) > r.target else 'SDK chargé'}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m GEN.startup", description="Mesure le démarrage à froid.")
+    parser.add_argument("scenario", nargs="*", help=f"parmi {', '.join(STARTUP_TARGETS)} (défaut: tous)")
+    parser.add_argument("--runs", type=int, default=5, help="processus lancés par scénario (médiane)")
+    parser.add_argument("--json", metavar="FICHIER", help="écrit les résultats en JSON (suivi entre versions)")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenario) - set(STARTUP_TARGETS)
+    if unknown:
+        parser.error(f"scénario(s) inconnu(s) : {', '.join(sorted(unknown))}")
+
+    results = [measure(scenario, args.runs) for scenario in args.scenario or STARTUP_TARGETS]
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([r._asdict() for r in results], f, indent=2)
+    measured = [r for r in results if not r.error]
+    return 1 if any(key_phase(r) > r.target or r.sdk_loaded for r in measured) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
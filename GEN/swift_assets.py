@@ -0,0 +1,269 @@
+"""Assets exigés par le widget, déduits des sources Swift.
+
+Les services Swift (IncityBackgroundService, WeatherBackgroundService)
+construisent les noms d'images à partir de littéraux, parfois interpolés :
+`"incity_\\(fileBaseName)_day"`, `"A_\\(season.rawValue)_golden"`. Le
+scanner relève ces littéraux (sans compiler ni analyser tout Swift) puis
+développe chaque interpolation quand sa valeur est énumérable :
+
+  - propriété calculée `var nom: String { switch self { ... return "x" } }` ;
+  - `x.rawValue` d'une énumération `enum Nom: String` (type trouvé par
+    `x: Nom` ou `for x in Nom.allCases`) ;
+  - constante `let nom = condition ? "a" : "b"` ou alias `let nom = x.rawValue`.
+
+Les motifs dont une partie n'est connue qu'à l'exécution (variable
+affectée dans un `switch`) sont ignorés et signalés ; seuls les noms
+correspondant au motif de la cible (`swift_assets.pattern` de la matrice)
+sont retenus.
+
+    python -m GEN.swift_assets lyon
+    python -m GEN.swift_assets incity --output output_incity
+"""
+import argparse
+import itertools
+import os
+import re
+import sys
+from collections import namedtuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Noms exigés et motifs écartés (avec la raison)
+ScanResult = namedtuple("ScanResult", ["names", "skipped"])
+
+_IDENT = re.compile(r"^[A-Za-z_]\w*$")
+_TYPE_BLOCK = re.compile(r"\b(?:enum|struct|class|extension)\s+(\w+)[^{]*\{")
+
+
+def _skip_comment(text, i):
+    """Position après le commentaire commençant en i, ou i s'il n'y en a pas"""
+    if text.startswith("//", i):
+        end = text.find("\n", i)
+        return len(text) if end < 0 else end
+    if text.startswith("/*", i):
+        end = text.find("*/", i + 2)
+        return len(text) if end < 0 else end + 2
+    return i
+
+
+def string_literals(text):
+    """Littéraux chaîne d'une source Swift : [(position, [texte ou ("expr", code)])]"""
+    literals = []
+    i = 0
+    while i < len(text):
+        j = _skip_comment(text, i)
+        if j != i:
+            i = j
+            continue
+        if text[i] != '"':
+            i += 1
+            continue
+        start, i, parts, buf = i, i + 1, [], []
+        while i < len(text) and text[i] not in '"\n':
+            if text.startswith("\\(", i):
+                depth, k = 1, i + 2
+                while k < len(text) and depth:
+                    depth += {"(": 1, ")": -1}.get(text[k], 0)
+                    k += 1
+                if buf:
+                    parts.append("".join(buf))
+                    buf = []
+                parts.append(("expr", text[i + 2:k - 1].strip()))
+                i = k
+            elif text[i] == "\\":
+                buf.append(text[i:i + 2])
+                i += 2
+            else:
+                buf.append(text[i])
+                i += 1
+        if buf:
+            parts.append("".join(buf))
+        literals.append((start, parts))
+        i += 1
+    return literals
+
+
+def _block_end(text, open_brace):
+    """Position de l'accolade fermante correspondant à `open_brace`"""
+    depth = 0
+    for i in range(open_brace, len(text)):
+        if text[i] == "{":
+            depth += 1
+        elif text[i] == "}":
+            depth -= 1
+            if not depth:
+                return i
+    return len(text)
+
+
+class SwiftSource:
+    """Une source Swift indexée : types, énumérations String, propriétés et constantes"""
+
+    def __init__(self, text):
+        self.text = text
+        self.literals = string_literals(text)
+        self.blocks = []  # [(nom, début, fin)]
+        for match in _TYPE_BLOCK.finditer(text):
+            self.blocks.append((match.group(1), match.start(), _block_end(text, match.end() - 1)))
+        self.enums = {}
+        for match in re.finditer(r"\benum\s+(\w+)\s*:\s*String\b[^{]*\{", text):
+            body = text[match.end():_block_end(text, match.end() - 1)]
+            raw_values = []
+            for case in re.finditer(r"^\s*case\s+([A-Za-z_][^\n:]*?)\s*(?://.*)?$", body, re.M):
+                for item in case.group(1).split(","):
+                    name, _, raw = item.partition("=")
+                    raw_values.append(raw.strip().strip('"') if raw else name.strip())
+            self.enums[match.group(1)] = raw_values
+
+    def _literal_values(self, start, end):
+        """Littéraux simples (sans interpolation) entre deux positions"""
+        return [parts[0] if parts else "" for pos, parts in self.literals
+                if start <= pos < end and all(isinstance(p, str) for p in parts)]
+
+    def _scopes(self, position):
+        """Blocs de type contenant `position`, du plus proche au fichier entier"""
+        scopes = sorted(((start, end) for _, start, end in self.blocks if start <= position <= end),
+                        key=lambda scope: scope[1] - scope[0])
+        return scopes + [(0, len(self.text))]
+
+    def _enum_of(self, variable, position):
+        for start, end in self._scopes(position):
+            scope = self.text[start:end]
+            match = (re.search(rf"\b{variable}\s*:\s*(\w+)", scope)
+                     or re.search(rf"\bfor\s+{variable}\s+in\s+(\w+)\.allCases", scope))
+            if match and match.group(1) in self.enums:
+                return match.group(1)
+        return None
+
+    def resolve(self, expr, position):
+        """Valeurs possibles d'une interpolation, ou None si elle n'est pas énumérable"""
+        if expr.endswith(".rawValue"):
+            enum = self._enum_of(expr[:-len(".rawValue")], position)
+            return self.enums.get(enum) if enum else None
+        if not _IDENT.match(expr):
+            return None
+        for start, end in self._scopes(position):
+            scope = self.text[start:end]
+            # Propriété calculée : les littéraux retournés par son switch
+            match = re.search(rf"\bvar\s+{expr}\s*:\s*String\s*\{{", scope)
+            if match:
+                body_start = start + match.end() - 1
+                body_end = _block_end(self.text, body_start)
+                values = self._literal_values(body_start, body_end)
+                if values and not any(isinstance(p, tuple) for pos, parts in self.literals
+                                      if body_start <= pos < body_end for p in parts):
+                    return values
+                return None
+            match = re.search(rf"\blet\s+{expr}\s*=\s*[^\n?]+\?\s*\"([^\"]*)\"\s*:\s*\"([^\"]*)\"", scope)
+            if match:
+                return [match.group(1), match.group(2)]
+            match = re.search(rf"\blet\s+{expr}\s*=\s*([\w.]+\.rawValue)\b", scope)
+            if match:
+                return self.resolve(match.group(1), start + match.start())
+        return None
+
+    def asset_names(self, pattern):
+        """ScanResult des noms de la source correspondant à `pattern` (regex)"""
+        pattern = re.compile(pattern)
+        names, skipped = set(), []
+        for position, parts in self.literals:
+            if not parts:
+                continue
+            template = "".join(p if isinstance(p, str) else "\\(" + p[1] + ")" for p in parts)
+            # Un nom d'asset ne contient ni espace ni ponctuation
+            if not re.fullmatch(r"[\w\\().]+", template):
+                continue
+            pools, unresolved = [], None
+            for part in parts:
+                values = [part] if isinstance(part, str) else self.resolve(part[1], position)
+                if values is None:
+                    unresolved = part[1]
+                    break
+                pools.append(values)
+            if unresolved is None:
+                names.update(n for n in ("".join(combo) for combo in itertools.product(*pools))
+                             if pattern.match(n))
+                continue
+            # Signalé seulement s'il pourrait s'agir d'un asset de la cible
+            lead = parts[0] if isinstance(parts[0], str) else ""
+            if not lead or pattern.match(lead):
+                line = self.text.count("\n", 0, position) + 1
+                skipped.append((line, template, f"interpolation non énumérable : {unresolved}"))
+        return ScanResult(names, skipped)
+
+
+def scan(paths, pattern):
+    """Noms exigés par un ensemble de sources Swift"""
+    names, skipped = set(), []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            result = SwiftSource(f.read()).asset_names(pattern)
+        names |= result.names
+        skipped += [(os.path.relpath(path, REPO_DIR), line, template, reason) for line, template, reason in result.skipped]
+    return ScanResult(names, skipped)
+
+
+def required_assets(target):
+    """ScanResult de la cible, d'après `swift_assets` de sa matrice ; None sans configuration"""
+    config = target.matrix.swift_assets
+    if not config:
+        return None
+    return scan([os.path.join(REPO_DIR, path) for path in config["sources"]], config["pattern"])
+
+
+def produced_names(target):
+    """Noms (sans extension) des variantes que la matrice sait générer"""
+    return {os.path.splitext(variant.filename)[0] for variant in target.matrix.variants()}
+
+
+def present_names(directory):
+    """Noms disponibles dans un dossier de sortie (fichiers) ou un catalogue (.imageset)"""
+    try:
+        entries = os.listdir(directory)
+    except FileNotFoundError:
+        return set()
+    return {os.path.splitext(entry)[0] for entry in entries if not entry.startswith(".")}
+
+
+def main(argv=None):
+    from .engine import TARGETS
+    from .xcassets import DEFAULT_CATALOG
+
+    parser = argparse.ArgumentParser(prog="python -m GEN.swift_assets",
+                                     description="Vérifie que les images exigées par le widget existent.")
+    parser.add_argument("target", nargs="*", help=f"cibles parmi {', '.join(sorted(TARGETS))} (défaut: toutes)")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help="catalogue d'assets à vérifier")
+    parser.add_argument("--output", help="vérifie plutôt un dossier de sortie du générateur")
+    parser.add_argument("--list", action="store_true", help="affiche les noms exigés")
+    args = parser.parse_args(argv)
+    unknown = set(args.target) - set(TARGETS)
+    if unknown:
+        parser.error(f"cible(s) inconnue(s) : {', '.join(sorted(unknown))}")
+
+    status = 0
+    for name in args.target or sorted(TARGETS):
+        target = TARGETS[name]
+        result = required_assets(target)
+        if result is None:
+            print(f"{name} : pas de sources Swift configurées (swift_assets)")
+            continue
+        location = args.output or args.catalog
+        not_generated = sorted(result.names - produced_names(target))
+        absent = sorted(result.names - present_names(location))
+        print(f"{name} : {len(result.names)} image(s) exigée(s) par le widget")
+        if args.list:
+            for asset in sorted(result.names):
+                print(f"  {asset}")
+        for path, line, template, reason in result.skipped:
+            print(f"  ignoré {path}:{line} \"{template}\" ({reason})")
+        for asset in not_generated:
+            print(f"  ERREUR {asset} : aucune variante de la matrice ne le produit")
+        for asset in absent:
+            print(f"  ERREUR {asset} : absent de {location}")
+        if not_generated or absent:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
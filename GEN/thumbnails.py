@@ -0,0 +1,203 @@
+"""Miniatures des images générées : décodage en arrière-plan, deux niveaux de cache.
+
+La galerie (cf. gallery.py) ne demande que les miniatures des cellules
+visibles. Chaque demande part dans un petit pool de threads, qui :
+
+  - identifie le fichier par son empreinte SHA-256 (mémorisée par
+    chemin, taille et date de modification : un fichier inchangé n'est
+    pas relu) ;
+  - relit la miniature du cache disque `<clé>.jpg` si elle existe ;
+  - sinon décode l'image en réduction (`Image.draft` pour le JPEG : le
+    décodeur saute directement à 1/2, 1/4 ou 1/8), la réduit et l'écrit
+    dans le cache disque.
+
+Les miniatures décodées restent en mémoire dans un LRU borné en octets ;
+les résultats sont mis en file et vidés par la boucle Tk (`drain`), comme
+le bus d'événements. Une demande pour une cellule sortie de l'écran avant
+son tour est annulée.
+"""
+import hashlib
+import io
+import os
+import queue
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .fsutil import write_atomic
+
+DEFAULT_THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "thumbnails")
+THUMBNAIL_SIZE = 160
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024  # 32 Mo, soit ~400 miniatures RGB de 160 px
+DEFAULT_WORKERS = 4
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Une miniature prête : chemin de l'image source, image PIL (None si illisible)
+Thumbnail = namedtuple("Thumbnail", ["path", "image"])
+
+
+def list_images(directory, order=()):
+    """Images d'un dossier de sortie : d'abord dans l'ordre `order` (noms sans extension), puis par nom.
+
+    Les sous-dossiers (candidats, rejets, état batch) et fichiers cachés sont ignorés.
+    """
+    try:
+        entries = [e for e in os.scandir(directory)
+                   if e.is_file() and not e.name.startswith(".") and e.name.lower().endswith(IMAGE_EXTENSIONS)]
+    except FileNotFoundError:
+        return []
+    rank = {name: i for i, name in enumerate(order)}
+    entries.sort(key=lambda e: (rank.get(os.path.splitext(e.name)[0], len(rank)), e.name))
+    return [e.path for e in entries]
+
+
+class MemoryLRU:
+    """Miniatures décodées, les moins récemment affichées évincées au-delà de `max_bytes`"""
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(image):
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key):
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            if key in self._items:
+                self.bytes -= self._size(self._items.pop(key))
+            self._items[key] = image
+            self.bytes += self._size(image)
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= self._size(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ThumbnailLoader:
+    """Pool de décodage des miniatures, avec cache mémoire (LRU) et cache disque"""
+
+    def __init__(self, size=THUMBNAIL_SIZE, cache_dir=DEFAULT_THUMBNAIL_DIR,
+                 memory_bytes=DEFAULT_MEMORY_BYTES, max_workers=DEFAULT_WORKERS):
+        self.size = size
+        self.cache_dir = cache_dir
+        self.memory = MemoryLRU(memory_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumb")
+        self._pending = {}  # chemin -> Future
+        self._hashes = {}  # chemin -> ((taille, mtime), empreinte)
+        self._lock = threading.Lock()
+        self._done = queue.SimpleQueue()
+
+    def cached(self, path):
+        """Miniature déjà en mémoire pour ce fichier (tel qu'il est sur le disque), ou None"""
+        key = self._known_key(path)
+        return self.memory.get(key) if key is not None else None
+
+    def request(self, path):
+        """Demande la miniature de `path` ; elle arrivera par `drain`. Sans effet si déjà demandée."""
+        with self._lock:
+            if path in self._pending:
+                return
+            future = self._executor.submit(self._load, path)
+            self._pending[path] = future
+        future.add_done_callback(lambda f: self._finish(path, f))
+
+    def cancel(self, path):
+        """Abandonne une demande pas encore commencée (cellule sortie de l'écran)"""
+        with self._lock:
+            future = self._pending.get(path)
+        if future is not None:
+            future.cancel()
+
+    def drain(self):
+        """Miniatures prêtes depuis le dernier appel (à appeler depuis le thread Tk)"""
+        ready = []
+        while True:
+            try:
+                ready.append(self._done.get_nowait())
+            except queue.Empty:
+                return ready
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Workers ---
+    def _finish(self, path, future):
+        with self._lock:
+            if self._pending.get(path) is future:
+                del self._pending[path]
+        if future.cancelled():
+            return
+        try:
+            image = future.result()
+        except Exception:
+            image = None
+        self._done.put(Thumbnail(path, image))
+
+    def _known_key(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            known = self._hashes.get(path)
+        if known is not None and known[0] == (stat.st_size, stat.st_mtime_ns):
+            return known[1]
+        return None
+
+    def key(self, path):
+        """Clé de cache : empreinte du contenu et taille de miniature"""
+        key = self._known_key(path)
+        if key is not None:
+            return key
+        stat = os.stat(path)
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        key = f"{h.hexdigest()}-{self.size}"
+        with self._lock:
+            self._hashes[path] = ((stat.st_size, stat.st_mtime_ns), key)
+        return key
+
+    def _load(self, path):
+        key = self.key(path)
+        image = self.memory.get(key)
+        if image is not None:
+            return image
+        disk_path = os.path.join(self.cache_dir, key + ".jpg")
+        try:
+            with Image.open(disk_path) as img:
+                image = img.convert("RGB")
+        except (FileNotFoundError, OSError):
+            image = self._decode(path)
+            self._write(disk_path, image)
+        self.memory.put(key, image)
+        return image
+
+    def _decode(self, path):
+        with Image.open(path) as img:
+            # JPEG : décodage directement à l'échelle réduite la plus proche
+            img.draft("RGB", (self.size, self.size))
+            image = img.convert("RGB")
+        image.thumbnail((self.size, self.size), Image.BILINEAR)
+        return image
+
+    def _write(self, disk_path, image):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=85)
+        write_atomic(disk_path, buf.getvalue())
@@ -0,0 +1,111 @@
+"""Mesure du temps passé dans chaque étape d'une génération.
+
+Chaque travail est découpé en spans (queue, prepare, cache, request,
+save...) ; `export_chrome` écrit un fichier lisible dans chrome://tracing
+ou https://ui.perfetto.dev (une ligne par image), `summary` donne les
+percentiles par étape et le débit en images/minute.
+"""
+import contextlib
+import json
+import math
+import threading
+import time
+from collections import namedtuple
+
+# Un intervalle mesuré (secondes, horloge perf_counter)
+Span = namedtuple("Span", ["name", "job", "start", "end", "args"])
+
+# Percentiles d'une étape
+StageStats = namedtuple("StageStats", ["name", "count", "total", "p50", "p95", "p99"])
+
+
+def percentile(sorted_values, q):
+    """Percentile par rang le plus proche (q entre 0 et 100)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Tracer:
+    """Collecte des spans, depuis n'importe quel thread ou coroutine"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def record(self, name, job, start, end, **args):
+        with self._lock:
+            self._spans.append(Span(name, job, start, end, args))
+
+    @contextlib.contextmanager
+    def span(self, name, job=None, **args):
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.record(name, job, start, time.perf_counter(), **args)
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans = []
+        self.origin = time.perf_counter()
+
+    def export_chrome(self, path):
+        """Écrit les spans au format Trace Event (événements « X »), une ligne par travail"""
+        spans = self.spans()
+        lanes = {}
+        events = []
+        for span in spans:
+            if span.job not in lanes:
+                lanes[span.job] = len(lanes) + 1
+                events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": lanes[span.job],
+                               "args": {"name": span.job or "moteur"}})
+            events.append({
+                "ph": "X",
+                "name": span.name,
+                "cat": "generation",
+                "pid": 1,
+                "tid": lanes[span.job],
+                "ts": round((span.start - self.origin) * 1e6, 1),
+                "dur": round((span.end - span.start) * 1e6, 1),
+                "args": span.args,
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        return path
+
+    def stage_stats(self):
+        """StageStats par étape, dans l'ordre de première apparition"""
+        durations = {}
+        for span in self.spans():
+            durations.setdefault(span.name, []).append(span.end - span.start)
+        stats = []
+        for name, values in durations.items():
+            values.sort()
+            stats.append(StageStats(name, len(values), sum(values),
+                                    percentile(values, 50), percentile(values, 95), percentile(values, 99)))
+        return stats
+
+    def summary(self, images=None):
+        """Tableau texte : percentiles par étape et débit (images/minute)"""
+        spans = self.spans()
+        if not spans:
+            return "Aucune mesure."
+        lines = [f"{'étape':14} {'n':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'total':>9}"]
+        for stats in self.stage_stats():
+            lines.append(f"{stats.name:14} {stats.count:4d} {stats.p50:7.2f}s {stats.p95:7.2f}s "
+                         f"{stats.p99:7.2f}s {stats.total:8.1f}s")
+        wall = max(s.end for s in spans) - min(s.start for s in spans)
+        if images is None:
+            # Images reçues de l'API, plus celles dérivées localement (couleurs de LED)
+            images = sum(1 for s in spans if s.name == "job" and s.args.get("ok"))
+            images += sum(s.args.get("written", 0) for s in spans if s.name == "derive")
+        if wall > 0:
+            lines.append(f"{images} image(s) en {wall:.1f}s : {images * 60 / wall:.1f} images/min")
+        return "\n".join(lines)
@@ -0,0 +1,269 @@
+"""Matrices de variantes déclaratives (GEN/matrices/*.json).
+
+Un fichier de matrice décrit une cible :
+  - `base_prompt` : le prompt d'édition, avec `{details}` ;
+  - `fragments` : morceaux de prompt réutilisables (`{fragments[night]}`) ;
+  - `axes` : listes de valeurs partagées (saisons, moments, couleurs LED...),
+    chaque valeur ayant une `key` et des champs libres (label, prompt, color) ;
+  - `derive` (dans un groupe) : `{"axis": "led", "from": "cyan"}` ; seule
+    la valeur `from` est demandée à l'API, les autres valeurs de l'axe en
+    sont dérivées localement (champ `color` de chaque valeur) ;
+  - `preview` (groupe ou valeur d'axe) : étalonnage(s) de l'aperçu local
+    (cf. preview.py), ex. `"night"` ou `["overcast", "winter"]` ;
+  - `swift_assets` : sources Swift du widget et motif des noms d'images,
+    pour vérifier que tout ce que l'app demande existe ;
+  - `geometry_gate` : seuil (et masque optionnel) du contrôle de dérive ;
+  - `groups` : un groupe de boutons = un produit cartésien d'axes, avec ses
+    gabarits `filename`, `prompt`, `label` et `color` (couleur du bouton) ;
+  - `cue` (dans un groupe) : couleur que le prompt nomme (LED, palette
+    d'événement), ex. `"{led.color}"` ; sert à départager les candidats
+    best-of (cf. quality.py). Sans champ, ou si la valeur d'axe n'en
+    déclare pas pour la cellule, la variante n'a pas d'indice (None).
+
+Un champ de valeur peut dépendre d'un autre axe de la cellule :
+`"prompt": {"day": "...", "night": "..."}` prend l'entrée dont la clé figure
+dans la cellule. Les textes longs peuvent être écrits en liste de lignes.
+
+Ajouter une saison ou un événement = ajouter une valeur d'axe ; les boutons
+Tk, la CLI et le planificateur suivent.
+"""
+import itertools
+import json
+import os
+from collections import namedtuple
+
+MATRICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "matrices")
+
+# Une variante = une cellule de la matrice, prête à générer
+Variant = namedtuple("Variant", ["group", "filename", "prompt", "label", "color", "cell", "cue"],
+                     defaults=(None, None, None, None))
+
+# Variante obtenue localement depuis une autre (cf. recolor.py) : couleur de la base -> couleur voulue
+Derivation = namedtuple("Derivation", ["variant", "source_color", "target_color"])
+
+
+def _text(value):
+    return "".join(value) if isinstance(value, list) else value
+
+
+class AxisValue:
+    """Une valeur d'axe : s'affiche comme sa clé, expose ses champs en attributs"""
+
+    def __init__(self, data):
+        self.key = data["key"]
+        self.fields = {k: _text(v) if not isinstance(v, dict) else {kk: _text(vv) for kk, vv in v.items()}
+                       for k, v in data.items()}
+
+    def __str__(self):
+        return self.key
+
+    def __repr__(self):
+        return f"AxisValue({self.key!r})"
+
+
+class _Bound:
+    """Valeur d'axe vue depuis une cellule : résout les champs dépendant d'un autre axe"""
+
+    def __init__(self, value, cell_keys):
+        self._value = value
+        self._cell_keys = cell_keys
+
+    def __str__(self):
+        return self._value.key
+
+    def __format__(self, spec):
+        return format(self._value.key, spec)
+
+    def __getattr__(self, name):
+        try:
+            field = self._value.fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        if isinstance(field, dict):
+            for key in self._cell_keys:
+                if key in field:
+                    return field[key]
+            raise AttributeError(f"{self._value.key}.{name}: aucune entrée pour {self._cell_keys}")
+        return field
+
+
+class Group:
+    def __init__(self, data, matrix):
+        self.matrix = matrix
+        self.id = data["id"]
+        self.title = data.get("title")
+        self.title_color = data.get("title_color")
+        self.filename = data["filename"]
+        self.prompt = _text(data["prompt"])
+        self.label_template = data.get("label")
+        self.color_template = data.get("color")
+        self.cue_template = data.get("cue")
+        self.row_label = data.get("row_label")
+        self.row_label_width = data.get("row_label_width", 80)
+        self.per_row = data.get("per_row")
+        self.row_sizes = data.get("row_sizes")
+        self.derive = data.get("derive")
+        self.preview = data.get("preview")
+        self.axes = []  # [(nom, [AxisValue])]
+        for axis in data["axes"]:
+            if isinstance(axis, str):
+                axis = {"name": axis}
+            name = axis["name"]
+            if "values" in axis:
+                values = [AxisValue(v) for v in axis["values"]]
+            else:
+                values = matrix.axes[name]
+            if "only" in axis:
+                values = [v for v in values if v.key in axis["only"]]
+            self.axes.append((name, values))
+
+    @property
+    def axis_names(self):
+        return [name for name, _ in self.axes]
+
+    def cells(self, where=None):
+        """Produit cartésien paresseux des axes, restreint par `where` {axe: [clés]}"""
+        where = where or {}
+        pools = []
+        for name, values in self.axes:
+            if name in where:
+                values = [v for v in values if v.key in where[name]]
+            pools.append(values)
+        for combo in itertools.product(*pools):
+            yield dict(zip(self.axis_names, combo))
+
+    def render(self, cell):
+        keys = [value.key for value in cell.values()]
+        context = {name: _Bound(value, keys) for name, value in cell.items()}
+        context["fragments"] = self.matrix.fragments
+
+        def fmt(template):
+            return template.format(**context) if template else None
+
+        try:
+            cue = fmt(self.cue_template)
+        except AttributeError:
+            # Indice déclaré pour certaines cellules seulement (ex: la nuit d'un événement)
+            cue = None
+        return Variant(
+            group=self.id,
+            filename=fmt(self.filename),
+            prompt=fmt(self.prompt),
+            label=fmt(self.label_template),
+            color=fmt(self.color_template),
+            cell={name: value.key for name, value in cell.items()},
+            cue=cue,
+        )
+
+    def variants(self, where=None):
+        for cell in self.cells(where):
+            yield self.render(cell)
+
+    def derivation(self, variant):
+        """(variante de base, Derivation) si `variant` se dérive localement, sinon None"""
+        if not self.derive:
+            return None
+        axis, base_key = self.derive["axis"], self.derive["from"]
+        if variant.cell.get(axis) in (None, base_key):
+            return None
+        cell = self.values(variant)
+        target = cell[axis]
+        cell[axis] = next(v for v in dict(self.axes)[axis] if v.key == base_key)
+        return self.render(cell), Derivation(variant, cell[axis].fields["color"], target.fields["color"])
+
+    def values(self, variant):
+        """Cellule d'une variante : {axe: AxisValue}"""
+        values = dict(self.axes)
+        return {name: next(v for v in values[name] if v.key == key) for name, key in variant.cell.items()}
+
+    def preview_grades(self, variant):
+        """Étalonnages de l'aperçu local : ceux du groupe, puis ceux des valeurs de la cellule"""
+        grades = []
+        for source in [self.preview] + [value.fields.get("preview") for value in self.values(variant).values()]:
+            if source:
+                grades.extend([source] if isinstance(source, str) else source)
+        # L'étalonnage de moment (nuit, golden) s'applique en dernier, sur l'ambiance déjà posée
+        return sorted(dict.fromkeys(grades), key=lambda name: name in ("golden", "night"))
+
+    def rows(self):
+        """Disposition des boutons : [(libellé de ligne ou None, [Variant])]"""
+        variants = list(self.variants())
+        if len(self.axes) >= 2 and not (self.per_row or self.row_sizes):
+            # Une ligne par valeur du premier axe (ex: une ligne par saison)
+            first_name, first_values = self.axes[0]
+            return [(value.fields.get("label", value.key), [v for v in variants if v.cell[first_name] == value.key])
+                    for value in first_values]
+        sizes = self.row_sizes or ([self.per_row] * -(-len(variants) // self.per_row) if self.per_row else [len(variants)])
+        rows, start = [], 0
+        for size in sizes:
+            rows.append((self.row_label, variants[start:start + size]))
+            start += size
+        return rows
+
+
+class Matrix:
+    def __init__(self, data):
+        self.name = data["name"]
+        self.title = data.get("title", self.name)
+        self.profile = data["profile"]
+        self.output_dir = data["output_dir"]
+        self.base_prompt = _text(data["base_prompt"])
+        self.fragments = {k: _text(v) for k, v in data.get("fragments", {}).items()}
+        self.axes = {name: [AxisValue(v) for v in values] for name, values in data.get("axes", {}).items()}
+        self.groups = [Group(g, self) for g in data["groups"]]
+        # Contrôle de dérive géométrique (cf. quality.py) : {"threshold": ..., "mask": ...}
+        self.geometry_gate = data.get("geometry_gate")
+        # Sources Swift qui nomment les images exigées (cf. swift_assets.py) : {"sources": [...], "pattern": ...}
+        self.swift_assets = data.get("swift_assets")
+
+    def group(self, group_id):
+        for group in self.groups:
+            if group.id == group_id:
+                return group
+        raise KeyError(group_id)
+
+    def variants(self, groups=None, where=None):
+        """Toutes les variantes (générateur), éventuellement filtrées par groupe et par axe"""
+        for group in self.groups:
+            if groups and group.id not in groups:
+                continue
+            yield from group.variants(where)
+
+
+def plan_derivations(matrix, variants):
+    """Sépare les variantes à demander à l'API de celles à dériver localement.
+
+    Retourne (à générer, {nom de la base: [Derivation]}) ; une base est
+    ajoutée même si seules ses dérivées ont été sélectionnées.
+    """
+    groups = {group.id: group for group in matrix.groups}
+    to_generate, derived = [], {}
+    for variant in variants:
+        planned = groups[variant.group].derivation(variant)
+        if planned is None:
+            if variant.filename not in {v.filename for v in to_generate}:
+                to_generate.append(variant)
+            continue
+        base, derivation = planned
+        if base.filename not in {v.filename for v in to_generate}:
+            to_generate.append(base)
+        derived.setdefault(base.filename, []).append(derivation)
+    return to_generate, derived
+
+
+def load_matrix(name_or_path):
+    """Charge GEN/matrices/<nom>.json, ou un chemin explicite"""
+    path = name_or_path
+    if not os.path.exists(path):
+        path = os.path.join(MATRICES_DIR, f"{name_or_path}.json")
+    with open(path, encoding="utf-8") as f:
+        return Matrix(json.load(f))
+
+
+def parse_where(specs):
+    """["season=winter,autumn", "time=night"] -> {"season": [...], "time": [...]}"""
+    where = {}
+    for spec in specs or []:
+        axis, _, keys = spec.partition("=")
+        where.setdefault(axis.strip(), []).extend(k.strip() for k in keys.split(",") if k.strip())
+    return where
@@ -0,0 +1,197 @@
+"""Export des images générées vers le catalogue d'assets du widget.
+
+Chaque image devient `<nom>.imageset/` avec ses rendus @1x/@2x/@3x et un
+Contents.json généré ; la taille du profil correspond au rendu @3x. L'export
+est incrémental : un imageset n'est réécrit que si l'empreinte de sa source
+a changé.
+
+    python -m GEN.xcassets incity
+    python -m GEN.xcassets lyon --source output_lyon_gemini3 --catalog ../EcoLyonWidget/Assets.xcassets
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from .fsutil import write_atomic
+from .postprocess import encode_within_budget
+from .profiles import EXTENSIONS
+
+GEN_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CATALOG = os.path.join(os.path.dirname(GEN_DIR), "EcoLyonWidget", "Assets.xcassets")
+MANIFEST_DIR = os.path.join(GEN_DIR, ".cache", "xcassets")
+
+SCALES = (1, 2, 3)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+# Résultat de l'export d'un imageset
+Exported = namedtuple("Exported", ["name", "path", "source_hash", "skipped"])
+
+
+def source_hash(source, profile):
+    """Empreinte de la source et des paramètres de rendu"""
+    h = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    h.update(repr(tuple(profile)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def rendition_filename(name, scale, profile):
+    suffix = "" if scale == 1 else f"@{scale}x"
+    return f"{name}{suffix}{EXTENSIONS[profile.format]}"
+
+
+def contents_json(name, profile):
+    return {
+        "images": [
+            {"filename": rendition_filename(name, scale, profile), "idiom": "universal", "scale": f"{scale}x"}
+            for scale in SCALES
+        ],
+        "info": {"author": "xcode", "version": 1},
+    }
+
+
+def export_imageset(source, catalog, profile, name=None):
+    """Écrit `<nom>.imageset/` (rendus @1x/@2x/@3x + Contents.json) depuis une image.
+
+    Fonction de module : exécutée dans un processus du pool.
+    """
+    name = name or os.path.splitext(os.path.basename(source))[0]
+    imageset = os.path.join(catalog, f"{name}.imageset")
+    os.makedirs(imageset, exist_ok=True)
+
+    written = set()
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if profile.format == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+        for scale in SCALES:
+            size = (round(profile.width * scale / 3), round(profile.height * scale / 3))
+            rendition = ImageOps.fit(img, size, method=Image.LANCZOS)
+            data, _ = encode_within_budget(rendition, profile.format, profile.max_bytes)
+            filename = rendition_filename(name, scale, profile)
+            write_atomic(os.path.join(imageset, filename), data)
+            written.add(filename)
+
+    contents = json.dumps(contents_json(name, profile), indent=2, ensure_ascii=False) + "\n"
+    write_atomic(os.path.join(imageset, "Contents.json"), contents)
+    written.add("Contents.json")
+
+    # Anciens rendus (ex: A_autumn_day.png) : Xcode les signalerait comme non assignés
+    for entry in os.listdir(imageset):
+        if entry not in written and entry.lower().endswith(IMAGE_EXTENSIONS):
+            os.unlink(os.path.join(imageset, entry))
+    return imageset
+
+
+class CatalogExporter:
+    """Export parallèle et incrémental vers un catalogue .xcassets.
+
+    Les empreintes des sources déjà exportées sont conservées dans
+    GEN/.cache/xcassets/ (hors du catalogue, pour ne pas gêner Xcode).
+    """
+
+    def __init__(self, profile, catalog=DEFAULT_CATALOG, max_workers=None):
+        self.profile = profile
+        self.catalog = catalog
+        self.max_workers = max_workers
+        catalog_id = hashlib.sha256(os.path.abspath(catalog).encode("utf-8")).hexdigest()[:16]
+        self.manifest_path = os.path.join(MANIFEST_DIR, f"{catalog_id}.json")
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        os.makedirs(MANIFEST_DIR, exist_ok=True)
+        with self._lock:
+            data = json.dumps(self._manifest, indent=2, sort_keys=True).encode("utf-8")
+        write_atomic(self.manifest_path, data)
+
+    def is_current(self, name, digest):
+        imageset = os.path.join(self.catalog, f"{name}.imageset")
+        if self._manifest.get(name) != digest:
+            return False
+        return all(os.path.exists(os.path.join(imageset, rendition_filename(name, scale, self.profile)))
+                   for scale in SCALES)
+
+    def export(self, sources, force=False):
+        """Exporte les sources modifiées depuis le dernier export. Retourne la liste des Exported."""
+        results = []
+        pending = []
+        for source in sources:
+            name = os.path.splitext(os.path.basename(source))[0]
+            digest = source_hash(source, self.profile)
+            if not force and self.is_current(name, digest):
+                results.append(Exported(name, os.path.join(self.catalog, f"{name}.imageset"), digest, True))
+            else:
+                pending.append((source, name, digest))
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [(name, digest, pool.submit(export_imageset, source, self.catalog, self.profile, name))
+                           for source, name, digest in pending]
+                for name, digest, future in futures:
+                    path = future.result()
+                    with self._lock:
+                        self._manifest[name] = digest
+                    results.append(Exported(name, path, digest, False))
+            self._save_manifest()
+        return results
+
+
+def find_sources(output_dir, variants):
+    """Fichiers de `output_dir` correspondant aux variantes (quelle que soit l'extension)"""
+    sources = []
+    for variant in variants:
+        stem = os.path.splitext(variant.filename)[0]
+        for ext in IMAGE_EXTENSIONS:
+            path = os.path.join(output_dir, stem + ext)
+            if os.path.exists(path):
+                sources.append(path)
+                break
+    return sources
+
+
+def main(argv=None):
+    from .engine import TARGETS
+
+    parser = argparse.ArgumentParser(prog="python -m GEN.xcassets", description="Exporte les images générées vers Assets.xcassets.")
+    parser.add_argument("target", choices=sorted(TARGETS))
+    parser.add_argument("--source", help="dossier des images (défaut: dossier de sortie de la cible)")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help="catalogue .xcassets de destination")
+    parser.add_argument("--workers", type=int, help="processus d'export (défaut: nombre de CPU)")
+    parser.add_argument("--force", action="store_true", help="réécrit tous les imagesets")
+    args = parser.parse_args(argv)
+
+    target = TARGETS[args.target]
+    source_dir = args.source or os.path.join(os.getcwd(), target.output_subdir)
+    sources = find_sources(source_dir, target.matrix.variants())
+    if not sources:
+        print(f"Aucune image trouvée dans {source_dir}", file=sys.stderr)
+        return 1
+
+    exporter = CatalogExporter(target.profile, args.catalog, max_workers=args.workers)
+    results = exporter.export(sources, force=args.force)
+    written = [r for r in results if not r.skipped]
+    for result in written:
+        print(f"  {result.name}.imageset")
+    print(f"Export : {len(written)} imageset(s) écrit(s), {len(results) - len(written)} à jour -> {args.catalog}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())